@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Compares the time to rank all substitutions of edit n-grams with the NLTK collocation finders
+and with kilogram.association, on random counts stored in a temporary SQLite snapshot:
+./benchmark_association.py --substitutions 50 --ngrams 200 --measure pmi
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from nltk import BigramCollocationFinder, TrigramCollocationFinder
+from nltk.collocations import BigramAssocMeasures, TrigramAssocMeasures
+
+from kilogram import NgramService, ListPacker
+from kilogram.association import rank_substitutions
+from kilogram.ngram import EditNgram
+from kilogram.storage import SqliteBackend
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--substitutions', dest='num_substitutions', action='store', type=int, default=50,
+                    help='size of the substitution vocabulary')
+parser.add_argument('--ngrams', dest='num_ngrams', action='store', type=int, default=200,
+                    help='number of edit n-grams of every size')
+parser.add_argument('--measure', dest='measure', action='store', default='pmi',
+                    help='association measure')
+parser.add_argument('--repeat', dest='repeat', action='store', type=int, default=5,
+                    help='number of timed runs, the best one is reported')
+
+args = parser.parse_args()
+
+rnd = random.Random(0)
+substitutions = ['s%d' % i for i in range(args.num_substitutions)]
+words = ['w%d' % i for i in range(args.num_ngrams)]
+
+
+def random_counts(scale):
+    return ListPacker.pack_binary([(subst, rnd.randint(1, scale)) for subst in substitutions
+                                  if rnd.random() < 0.8])
+
+tmp_dir = tempfile.mkdtemp()
+backend = SqliteBackend(os.path.join(tmp_dir, 'kilogram.sqlite'))
+try:
+    edit_ngrams = []
+    typogram = {'SUB': random_counts(10 ** 9)}
+    ngrams = {}
+    for i, word in enumerate(words):
+        next_word = words[(i + 1) % len(words)]
+        ngrams[word] = str(rnd.randint(10 ** 6, 10 ** 9))
+        ngrams[word + ' ' + next_word] = str(rnd.randint(10 ** 3, 10 ** 6))
+        for ngram in ('SUB ' + word, word + ' SUB', 'SUB %s %s' % (word, next_word),
+                      '%s SUB %s' % (word, next_word)):
+            typogram[ngram] = random_counts(10 ** 6)
+        edit_ngrams.append(EditNgram([substitutions[0], word], 0))
+        edit_ngrams.append(EditNgram([word, substitutions[0], next_word], 1))
+    for table, rows in (('typogram', typogram), ('ngrams', ngrams)):
+        backend.create_table(table)
+        backend.put_many(table, rows.items(), 'ngram:value')
+    NgramService.configure(backend=backend)
+
+    # fetching is the same for both, only scoring is timed
+    freq_arrays = [edit_ngram._get_freq_arrays() for edit_ngram in edit_ngrams]
+
+    def nltk_rank(edit_ngram, ngrams_, freqs):
+        n = len(edit_ngram.ngram)
+        dists = [edit_ngram._array_freq_dist(ngrams_[:n], freqs[:n]),
+                 edit_ngram._array_freq_dist(ngrams_[n:n+1], freqs[n:n+1])]
+        if n == 2:
+            finder = BigramCollocationFinder(*dists)
+            measure = getattr(BigramAssocMeasures, args.measure)
+        else:
+            dists[1:1] = [edit_ngram._array_freq_dist(ngrams_[n+2:], freqs[n+2:]),
+                          edit_ngram._array_freq_dist(ngrams_[n+1:n+2], freqs[n+1:n+2])]
+            finder = TrigramCollocationFinder(*dists)
+            measure = getattr(TrigramAssocMeasures, args.measure)
+        return dict((x[0][edit_ngram.edit_pos], (i, x[1])) for i, x in enumerate(finder.score_ngrams(measure)))
+
+    def numpy_rank(edit_ngram, ngrams_, freqs):
+        return rank_substitutions(edit_ngram.subst_ngram, ngrams_, freqs, args.measure)
+
+    rankings = {}
+    for name, rank in (('nltk', nltk_rank), ('numpy', numpy_rank)):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.time()
+            rankings[name] = []
+            for edit_ngram, (ngrams_, freqs) in zip(edit_ngrams, freq_arrays):
+                try:
+                    collocs = rank(edit_ngram, ngrams_, freqs)
+                except Exception:
+                    # random counts are not always consistent, such as bigrams more frequent than words
+                    collocs = {}
+                rankings[name].append(sorted(collocs, key=lambda subst: collocs[subst][0]))
+            timings.append(time.time() - start)
+        print('%s: %.3f ms per n-gram' % (name, min(timings) * 1000 / len(edit_ngrams)))
+    print('Different rankings: %d of %d' % (sum(x != y for x, y in zip(rankings['nltk'], rankings['numpy'])),
+                                            len(edit_ngrams)))
+finally:
+    backend.close()
+    shutil.rmtree(tmp_dir)
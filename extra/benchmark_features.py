@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Compares the time to build edit features with pandas and with numpy on a sample edit file,
+and checks that both give the same feature vectors. Needs the POS tagger service, set
+KILOGRAM_REPLAY to serve n-gram counts from a recording instead of HBase:
+./benchmark_features.py --hbase-host diufpc304 --substitutions in,on,at,of,for edits.tsv
+"""
+import argparse
+import os
+import sys
+import time
+
+from kilogram import NgramService, extract_edits
+from kilogram.edit import Edit, EditCollection
+
+# the pandas implementation is kept as the reference of the unit tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tests.ngram_tests import pandas_single_feature
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--hbase-host', dest='hbase_host', action='store', default='localhost',
+                    help='HBase gateway host')
+parser.add_argument('--hbase-port', dest='hbase_port', action='store', type=int,
+                    default=9090, help='HBase gateway port')
+parser.add_argument('--subst-table', dest='subst_table', action='store', default='typogram',
+                    help='table of substitution counts')
+parser.add_argument('--substitutions', dest='substitutions', action='store', required=True,
+                    help='comma-separated substitutions to build features for')
+parser.add_argument('--limit', dest='limit', action='store', type=int, default=1000,
+                    help='maximum number of edits')
+parser.add_argument('edit_file', help='tab-separated file of original and edited sentences')
+
+args = parser.parse_args()
+
+NgramService.configure(hbase_host=(args.hbase_host, args.hbase_port), subst_table=args.subst_table)
+substitutions = args.substitutions.split(',')
+edits = [edit for edit in extract_edits(args.edit_file, substitutions) if edit.edit1 in substitutions]
+edits = edits[:args.limit]
+EditCollection(edits, substitutions)
+# lookups and association scores are the same for both, only feature building is timed
+EditCollection.prefetch(edits)
+
+
+def build_features(func):
+    features = []
+    for edit in edits:
+        try:
+            features.append(func(edit, substitutions))
+        except AssertionError:
+            features.append(None)
+    return features
+
+results = {}
+for name, func in (('pandas', pandas_single_feature), ('numpy', Edit.get_single_feature)):
+    start = time.time()
+    results[name] = build_features(func)
+    print('%s: %.3f ms per edit' % (name, (time.time() - start) * 1000 / len(edits)))
+print('Different features: %d of %d edits' % (sum(x != y for x, y in zip(results['pandas'], results['numpy'])),
+                                              len(edits)))
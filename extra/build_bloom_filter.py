@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+"""
+Builds a bloom filter with all row keys of a table from the files uploaded by hbase_upload_array.pig:
+./build_bloom_filter.py --error-rate 0.01 wiki_anchor_ngrams.bloom /user/roman/wiki_anchor_ngrams
+"""
+import argparse
+from kilogram.storage import BloomFilter
+from kilogram.storage.local import read_tsv
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('out_path',
+                    help='output bloom filter file')
+parser.add_argument('paths', nargs='+',
+                    help='TSV files or Spark output directories')
+parser.add_argument('--error-rate', dest='error_rate', action='store', type=float, default=0.01,
+                    help='false positive rate of the filter')
+
+args = parser.parse_args()
+
+capacity = sum(1 for _ in read_tsv(args.paths))
+bloom = BloomFilter.from_keys((label for label, _ in read_tsv(args.paths)), capacity, args.error_rate)
+bloom.save(args.out_path)
+print('Written filter for %d keys' % capacity)
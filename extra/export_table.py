@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""
+Exports an HBase table into a local snapshot, scanning its regions in parallel:
+./export_table.py --hbase-host diufpc304 --format sqlite wiki_anchor_ngrams kilogram.sqlite
+./export_table.py --hbase-host diufpc304 --format sstable ngrams ngrams.sst
+"""
+import argparse
+from kilogram.storage import ConnectionPool, export_table
+from kilogram.storage.export import FORMATS
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--hbase-host', dest='hbase_host', action='store', required=True,
+                    help='HBase gateway host')
+parser.add_argument('--hbase-port', dest='hbase_port', action='store', type=int,
+                    default=9090, help='HBase gateway port')
+parser.add_argument('--format', dest='fmt', action='store', choices=FORMATS, default='tsv',
+                    help='tsv directory of part files, sqlite database or sstable of counts')
+parser.add_argument('--workers', dest='num_workers', action='store', type=int, default=4,
+                    help='number of regions scanned in parallel')
+parser.add_argument('--batch-size', dest='batch_size', action='store', type=int, default=1000,
+                    help='number of rows fetched per scanner call')
+parser.add_argument('--repack', dest='repack', action='store_true', default=False,
+                    help='convert text lists to the binary packed format')
+parser.add_argument('table', help='name of the HBase table')
+parser.add_argument('out_path', help='output directory or file')
+
+args = parser.parse_args()
+
+pool = ConnectionPool(args.hbase_host, args.hbase_port, size=args.num_workers)
+print(export_table(pool, args.table, args.out_path, fmt=args.fmt, num_workers=args.num_workers,
+                   batch_size=args.batch_size, repack=args.repack))
+pool.close()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+"""
+Local counterpart of hbase_upload_array.pig, loads Spark output into a SQLite database:
+./local_upload_array.py --db kilogram.sqlite --table wiki_anchors /user/roman/wiki_anchors
+"""
+import argparse
+from kilogram.storage import SqliteBackend, load_tsv
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--db', dest='db_path', action='store', required=True,
+                    help='path to the SQLite database file')
+parser.add_argument('--table', dest='table', action='store', required=True,
+                    help='name of the table to load data into')
+parser.add_argument('paths', nargs='+',
+                    help='TSV files or Spark output directories')
+
+args = parser.parse_args()
+
+backend = SqliteBackend(args.db_path)
+load_tsv(backend, args.table, args.paths)
+backend.close()
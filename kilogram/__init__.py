@@ -1,6 +1,7 @@
 from .ngram import *
 from .ngram_service import *
-from .lang.edit_parser import extract_edits, extract_filtered
+from .async_service import AsyncNgramService
+from .lang.edit_parser import extract_edits, extract_filtered, iter_edits, iter_filtered
 
 DEBUG = True
 # Define host and port for Stanford POS tagger service
@@ -0,0 +1,343 @@
+"""
+Association measures of an edit n-gram computed for all substitutions at once, on the count arrays
+of ``NgramService.get_freq_arrays``.
+Scores follow the NLTK ``BigramAssocMeasures`` and ``TrigramAssocMeasures`` formulas step by step,
+so rankings are the same as those of the NLTK collocation finders.
+"""
+import atexit
+import cPickle
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from .ngram_service import NgramService, SUBSTITUTION_TOKEN
+from .storage import LookupCache
+
+_SMALL = 1e-20
+
+MEASURES = {
+    2: ('raw_freq', 'student_t', 'chi_sq', 'phi_sq', 'mi_like', 'pmi', 'likelihood_ratio',
+        'poisson_stirling', 'jaccard', 'dice'),
+    3: ('raw_freq', 'student_t', 'chi_sq', 'mi_like', 'pmi', 'likelihood_ratio',
+        'poisson_stirling', 'jaccard'),
+}
+
+
+def is_supported(n, measure):
+    """
+    :param n: n-gram size
+    :param measure: name of an NLTK association measure
+    """
+    return measure in MEASURES.get(n, ())
+
+
+def _log2(x):
+    # same as math.log(x, 2.0)
+    return np.log(x) / np.log(2.0)
+
+
+def _count(sources, key, index):
+    """
+    Count of ``key`` in the FreqDist that ``Ngram._array_freq_dist`` builds from ``sources``,
+    where later sources override earlier ones.
+    :param sources: list of (split n-gram, count), the count is an array for substituted n-grams
+    :param key: split n-gram, substituted or not
+    :param index: ``NgramService.get_substitution_index``
+    :returns: array of counts by substitution for a substituted key, otherwise a count
+    """
+    is_subst = SUBSTITUTION_TOKEN in key
+    res = np.zeros(len(index), dtype=np.int64) if is_subst else 0
+    for source_key, freq in sources:
+        if len(source_key) != len(key):
+            continue
+        # the substitution of the key and the substitution of the source that make them equal,
+        # None when any substitution does
+        key_subst = source_subst = None
+        for word, source_word in zip(key, source_key):
+            if word == SUBSTITUTION_TOKEN and source_word == SUBSTITUTION_TOKEN:
+                continue
+            if word == SUBSTITUTION_TOKEN:
+                key_subst = source_word
+            elif source_word == SUBSTITUTION_TOKEN:
+                source_subst = word
+            elif word != source_word:
+                break
+        else:
+            if key_subst is None and source_subst is None:
+                res = np.array(freq) if is_subst else freq
+                continue
+            if any(x is not None and x not in index for x in (key_subst, source_subst)):
+                continue
+            count = freq[index[source_subst]] if source_subst is not None else freq
+            if is_subst:
+                res[index[key_subst]] = count
+            else:
+                res = count
+    return res
+
+
+def _word_counts(ngram, sources, index):
+    """
+    :returns: (counts of the words of ``ngram``, total count of all words)
+    """
+    counts = [_count(sources, (word,), index) for word in ngram]
+    # every substitution is a word of the distribution, and so is every other word of the n-gram
+    other_counts = dict((word, count) for word, count in zip(ngram, counts)
+                        if word != SUBSTITUTION_TOKEN and word not in index)
+    total = long(_count(sources, (SUBSTITUTION_TOKEN,), index).sum()) + sum(other_counts.values())
+    return counts, total
+
+
+def marginals(subst_ngram, ngrams, freqs):
+    """
+    :param subst_ngram: n-gram with ``SUBSTITUTION_TOKEN`` at the edit position
+    :param ngrams: n-grams of ``EditNgram._freq_ngrams``
+    :param freqs: counts of ``ngrams`` returned by ``NgramService.get_freq_arrays``
+    :returns: marginals in the NLTK order for every substitution, as float arrays or scalars
+    """
+    index = NgramService.get_substitution_index()
+    n = len(subst_ngram)
+    sources = [(tuple(ngram.split()), freq) for ngram, freq in zip(ngrams, freqs)]
+    key = tuple(subst_ngram)
+    word_counts, total = _word_counts(key, sources[:n], index)
+    word_counts = tuple(np.asarray(x, dtype=np.float64) for x in word_counts)
+    whole = np.asarray(_count(sources[n:n+1], key, index), dtype=np.float64)
+    if n == 2:
+        return whole, word_counts, float(total)
+    bigram_sources = sources[n+2:]
+    wild = _count(sources[n+1:n+2], (key[0], key[2]), index)
+    pair_counts = (_count(bigram_sources, key[:2], index), wild, _count(bigram_sources, key[1:], index))
+    return whole, tuple(np.asarray(x, dtype=np.float64) for x in pair_counts), word_counts, float(total)
+
+
+def _product(values):
+    res = values[0]
+    for value in values[1:]:
+        res = res * value
+    return res
+
+
+def _sum(values):
+    # same order of additions as the builtin sum
+    res = values[0]
+    for value in values[1:]:
+        res = res + value
+    return res
+
+
+def _bigram_contingency(n_ii, n_ix_xi, n_xx):
+    n_ix, n_xi = n_ix_xi
+    n_oi = n_xi - n_ii
+    n_io = n_ix - n_ii
+    return n_ii, n_oi, n_io, n_xx - n_ii - n_oi - n_io
+
+
+def _bigram_expected_values(cont):
+    n_xx = _sum(cont)
+    return [(cont[i] + cont[i ^ 1]) * (cont[i] + cont[i ^ 2]) / n_xx for i in range(4)]
+
+
+def _trigram_contingency(n_iii, n_iix_tuple, n_ixx_tuple, n_xxx):
+    n_iix, n_ixi, n_xii = n_iix_tuple
+    n_ixx, n_xix, n_xxi = n_ixx_tuple
+    n_oii = n_xii - n_iii
+    n_ioi = n_ixi - n_iii
+    n_iio = n_iix - n_iii
+    n_ooi = n_xxi - n_iii - n_oii - n_ioi
+    n_oio = n_xix - n_iii - n_oii - n_iio
+    n_ioo = n_ixx - n_iii - n_ioi - n_iio
+    n_ooo = n_xxx - n_iii - n_oii - n_ioi - n_iio - n_ooi - n_oio - n_ioo
+    return n_iii, n_oii, n_ioi, n_ooi, n_iio, n_oio, n_ioo, n_ooo
+
+
+def _trigram_expected_values(cont):
+    n_all = _sum(cont)
+    bits = [1, 2, 4]
+    return [_product([_sum([cont[x] for x in range(8) if (x & j) == (i & j)]) for j in bits]) / n_all ** 2
+            for i in range(8)]
+
+
+def _contingency(n, marginals_):
+    if n == 2:
+        return _bigram_contingency(*marginals_)
+    return _trigram_contingency(*marginals_)
+
+
+def _expected_values(n, cont):
+    if n == 2:
+        return _bigram_expected_values(cont)
+    return _trigram_expected_values(cont)
+
+
+def _phi_sq(marginals_):
+    # names follow NLTK, which unpacks the contingency table in this order
+    n_ii, n_io, n_oi, n_oo = _bigram_contingency(*marginals_)
+    return (n_ii * n_oo - n_io * n_oi) ** 2 / ((n_ii + n_io) * (n_ii + n_oi) * (n_io + n_oo) * (n_oi + n_oo))
+
+
+def score(n, measure, marginals_):
+    """
+    :param n: n-gram size
+    :param marginals_: result of ``marginals``
+    :returns: array of scores by substitution, only valid where the n-gram count is not zero
+    :raises ValueError: for measures that ``is_supported`` rejects
+    """
+    if not is_supported(n, measure):
+        raise ValueError('Unsupported association measure %s for %d-grams' % (measure, n))
+    ngram_count, unigrams, total = marginals_[0], marginals_[-2], marginals_[-1]
+    if measure == 'raw_freq':
+        return ngram_count / total
+    if measure == 'student_t':
+        return (ngram_count - _product(unigrams) / total ** (n - 1)) / (ngram_count + _SMALL) ** 0.5
+    if measure == 'chi_sq':
+        if n == 2:
+            return total * _phi_sq(marginals_)
+        cont = _contingency(n, marginals_)
+        return _sum([(obs - exp) ** 2 / (exp + _SMALL) for obs, exp in zip(cont, _expected_values(n, cont))])
+    if measure == 'phi_sq':
+        return _phi_sq(marginals_)
+    if measure == 'mi_like':
+        return ngram_count ** 3 / _product(unigrams)
+    if measure == 'pmi':
+        return _log2(ngram_count * total ** (n - 1)) - _log2(_product(unigrams))
+    if measure == 'likelihood_ratio':
+        cont = _contingency(n, marginals_)
+        return n * _sum([obs * np.log(obs / (exp + _SMALL) + _SMALL)
+                         for obs, exp in zip(cont, _expected_values(n, cont))])
+    if measure == 'poisson_stirling':
+        exp = _product(unigrams) / total ** (n - 1)
+        return ngram_count * (_log2(ngram_count / exp) - 1)
+    if measure == 'jaccard':
+        cont = _contingency(n, marginals_)
+        return cont[0] / _sum(cont[:-1])
+    if measure == 'dice':
+        return 2 * ngram_count / (unigrams[0] + unigrams[1])
+    raise ValueError('Unsupported association measure %s for %d-grams' % (measure, n))
+
+
+def rank_substitutions(subst_ngram, ngrams, freqs, measure='pmi'):
+    """
+    Ranks the substitutions that occur in ``subst_ngram`` like ``score_ngrams`` of the NLTK
+    collocation finders: by decreasing score, then by substitution.
+    :param ngrams: n-grams of ``EditNgram._freq_ngrams``
+    :param freqs: counts of ``ngrams`` returned by ``NgramService.get_freq_arrays``
+    :returns: dict of substitution -> (rank, score)
+    :raises: ValueError if a score is not finite, where NLTK fails with a math error
+    """
+    n = len(subst_ngram)
+    marginals_ = marginals(subst_ngram, ngrams, freqs)
+    with np.errstate(all='ignore'):
+        scores = score(n, measure, marginals_)
+    positions = np.flatnonzero(marginals_[0])
+    scores = scores[positions]
+    if not np.isfinite(scores).all():
+        raise ValueError('Association measure %s is not defined for %s' % (measure, ' '.join(subst_ngram)))
+    # substitutions are sorted, a stable sort keeps them in order for equal scores
+    order = np.argsort(-scores, kind='mergesort')
+    substitutions = NgramService.get_substitutions()
+    return dict((substitutions[positions[i]], (rank, score_))
+                for rank, (i, score_) in enumerate(zip(order.tolist(), scores[order].tolist())))
+
+
+class AssociationCache(object):
+    """
+    Count arrays and association rankings of substituted n-grams, shared by all ``EditNgram``
+    instances of the process, since most edits have n-grams such as "SUB the" in common.
+    Entries are dropped when ``NgramService`` is configured again.
+    With a path, rankings are loaded from it on creation and saved to it by ``save`` and at exit.
+
+    The limit counts entries, not bytes. An entry of count arrays holds an int64 array per
+    substitution for each of the substituted n-grams it is scored from, 3 of its own for a trigram,
+    about 1.5 KB with 50 substitutions, so 100000 such entries take around 150 MB.
+    """
+
+    ARRAYS = 'freq_arrays'
+
+    def __init__(self, max_entries=100000, path=None):
+        """
+        :param max_entries: maximum number of cached arrays and rankings, None for no limit,
+        see the class description for the memory they take
+        :param path: file to keep rankings in between runs, None to keep them in memory only
+        """
+        self.cache = LookupCache(max_entries=max_entries)
+        self.path = path
+        self._tables = None
+        self._backend = None
+        self._changed = False
+        self._lock = threading.Lock()
+        if path is not None:
+            self._load()
+            atexit.register(self.save)
+
+    def _check_configuration(self):
+        tables = NgramService.subst_table, NgramService.ngram_table
+        backend = NgramService.h_backend
+        if tables == self._tables and backend is self._backend:
+            return
+        with self._lock:
+            # rankings loaded from a file stay valid for a backend of the same tables
+            if tables != self._tables or self._backend is not None and backend is not self._backend:
+                self.cache.clear()
+            self._tables = tables
+            self._backend = backend
+
+    def get(self, subst_ngram, edit_pos, measure):
+        """
+        :returns: (found, dict of substitution -> (rank, score))
+        """
+        self._check_configuration()
+        return self.cache.get(measure, u' '.join(subst_ngram), str(edit_pos))
+
+    def put(self, subst_ngram, edit_pos, measure, collocs):
+        self._check_configuration()
+        self.cache.put(measure, u' '.join(subst_ngram), str(edit_pos), collocs)
+        self._changed = True
+
+    def get_arrays(self, subst_ngram, edit_pos):
+        """
+        :returns: (found, (n-grams, ``get_freq_arrays`` counts))
+        """
+        return self.get(subst_ngram, edit_pos, self.ARRAYS)
+
+    def put_arrays(self, subst_ngram, edit_pos, ngrams_freqs):
+        self.put(subst_ngram, edit_pos, self.ARRAYS, ngrams_freqs)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            state = cPickle.load(f)
+        self._tables = state['tables']
+        for (measure, row, column), collocs in state['rankings']:
+            self.cache.put(measure, row, column, collocs)
+
+    def save(self):
+        """Saves the rankings, count arrays are only valid as long as the tables do not change"""
+        if self.path is None or not self._changed:
+            return
+        state = {'tables': self._tables,
+                 'rankings': [(key, value) for key, value in self.cache.items() if key[0] != self.ARRAYS]}
+        # a temporary file of its own, processes that save concurrently do not write to the same one
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                        prefix=os.path.basename(self.path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                cPickle.dump(state, f, cPickle.HIGHEST_PROTOCOL)
+            os.chmod(tmp_path, 0644)
+            os.rename(tmp_path, self.path)
+        except OSError:
+            # another process saved at the same time, the last rename wins
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._changed = False
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        """
+        :returns: dict with hit/miss counters, total and per measure
+        """
+        return self.cache.stats()
@@ -0,0 +1,80 @@
+"""
+Concurrent lookups for request handlers that need many HBase values at once.
+
+Python 2 has no asyncio, so lookups are offloaded to a thread pool and every getter
+returns a future (``multiprocessing.pool.AsyncResult``) instead of a coroutine.
+Collect futures with ``AsyncNgramService.gather``::
+
+    AsyncNgramService.configure(max_in_flight=256)
+    futures = [AsyncNgramService.hbase_raw(table, mention, column) for mention in mentions]
+    values = AsyncNgramService.gather(*futures)
+
+Lookups wait for a free connection of the ``NgramService`` pool, so ``pool_size`` of
+``NgramService.configure`` bounds the number of requests on the wire: configure it with
+at least ``max_in_flight`` connections.
+"""
+import warnings
+from multiprocessing.pool import ThreadPool
+
+from .ngram_service import NgramService
+
+# NgramService getters exposed as futures
+_GETTERS = ('hbase_raw', 'hbase_raw_many', 'hbase_count', 'get_freq', 'get_freq_many',
+            'get_uri_counts', 'get_anchor_counts', 'get_wiki_prob',
+            'get_wiki_edge_weights', 'get_wiki_edge_weights_many',
+            'get_wiki_title_pagelinks', 'get_wiki_title_pagelinks_many',
+            'get_wiki_links_cooccur', 'get_wiki_links_cooccur_many',
+            'get_wiki_link_mention_cooccur', 'get_wiki_link_mention_cooccur_many')
+
+
+class AsyncNgramService(object):
+    h_pool = None
+
+    @classmethod
+    def configure(cls, max_in_flight=64):
+        """
+        :param max_in_flight: number of lookups that run concurrently, the rest are queued.
+        Warns if the HBase connections of ``NgramService`` can not serve that many at once.
+        """
+        if NgramService.h_pool_size is not None and max_in_flight > NgramService.h_pool_size:
+            warnings.warn('max_in_flight of %d lookups is capped at the %d HBase connections of NgramService, '
+                          'configure it with a larger pool_size' % (max_in_flight, NgramService.h_pool_size))
+        if cls.h_pool is not None:
+            cls.h_pool.close()
+        cls.h_pool = ThreadPool(max_in_flight)
+
+    @classmethod
+    def is_configured(cls):
+        return cls.h_pool is not None
+
+    @classmethod
+    def submit(cls, func, *args, **kwargs):
+        """
+        Runs any function that does lookups, such as a ``CandidateEntity`` constructor.
+        :returns: future of the function result
+        """
+        if cls.h_pool is None:
+            raise Exception('AsyncNgramService is not configured')
+        return cls.h_pool.apply_async(func, args, kwargs)
+
+    @staticmethod
+    def gather(*futures, **kwargs):
+        """
+        Waits for all futures, re-raises the first lookup error.
+        :param timeout: seconds to wait for every future, None to wait forever
+        :returns: list of results aligned with ``futures``
+        """
+        timeout = kwargs.get('timeout')
+        return [future.get(timeout) for future in futures]
+
+
+def _async_getter(name):
+    def getter(cls, *args, **kwargs):
+        return cls.submit(getattr(NgramService, name), *args, **kwargs)
+    getter.__name__ = name
+    getter.__doc__ = 'Future of ``NgramService.%s``' % name
+    return classmethod(getter)
+
+
+for _name in _GETTERS:
+    setattr(AsyncNgramService, _name, _async_getter(_name))
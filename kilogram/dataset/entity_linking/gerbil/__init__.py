@@ -1,3 +1,4 @@
+from ....async_service import AsyncNgramService
 from ....entity_linking import CandidateEntity
 from ....lang import get_context, parse_entities
 
@@ -20,7 +21,13 @@ class DataSet(object):
         type_dict = dict([(e['text'], e['type']) for e in ner_list])
         for mention in self.mentions:
             context = get_context(mention['start'], mention['end'], self.text)
-            candidate = CandidateEntity(0, 0, mention['name'], e_type=type_dict.get(mention['name']),
-                                        context=context, ner=self.ner)
-            candidates.append(candidate)
+            args = (0, 0, mention['name'])
+            kwargs = {'e_type': type_dict.get(mention['name']), 'context': context, 'ner': self.ner}
+            if AsyncNgramService.is_configured():
+                # look up all mentions of the document concurrently
+                candidates.append(AsyncNgramService.submit(CandidateEntity, *args, **kwargs))
+            else:
+                candidates.append(CandidateEntity(*args, **kwargs))
+        if AsyncNgramService.is_configured():
+            candidates = AsyncNgramService.gather(*candidates)
         return candidates
@@ -1,7 +1,7 @@
 from __future__ import division
 import codecs
 from kilogram.entity_linking import CandidateEntity, Entity
-from kilogram.lang import parse_entities, parse_tweet_entities
+from kilogram.lang import parse_entities_many, parse_tweet_entities
 
 
 class DataSet(object):
@@ -33,12 +33,15 @@ class DataSet(object):
 
     def _parse_data(self):
         data = []
+        lines = []
         for line in codecs.open(self.dataset_file, 'r', 'utf-8'):
             line = line.strip().split('\t')
-            try:
-                datafile = DataFile(line[0], line[1])
-            except IndexError:
-                continue
+            if len(line) > 1:
+                lines.append(line)
+        # recognize entities of all tweets in one call to the NER server
+        ner_lists = parse_entities_many([line[1] for line in lines])
+        for line, ner_list in zip(lines, ner_lists):
+            datafile = DataFile(line[0], line[1])
             truth_data = dict(zip(line[2::2], [x.encode('utf-8').replace('http://dbpedia.org/resource/', '') for x in line[3::2]]))
             # fix the redirects
             for text, uri in truth_data.iteritems():
@@ -46,7 +49,6 @@ class DataSet(object):
 
             tweet_ne_list = parse_tweet_entities(datafile.text)
             tweet_ne_names = set([x['text'] for x in tweet_ne_list])
-            ner_list = parse_entities(datafile.text)
             ner_list = [x for x in ner_list if x['text'] not in tweet_ne_names] + tweet_ne_list
 
             visited = set()
@@ -2,7 +2,7 @@ from __future__ import division
 import os
 import re
 from ....entity_linking import CandidateEntity
-from ....lang import parse_entities
+from ....lang import parse_entities_many
 
 
 class DataSet(object):
@@ -47,14 +47,18 @@ class DataSet(object):
 
     def _parse_data(self):
         data = []
+        datafiles = []
         for filename in os.listdir(self.data_dir):
             if filename not in self.truth_data:
                 continue
             text = ' '.join(open(self.data_dir+filename).readlines()).replace('\n', ' ')
             text = re.sub(r'\s+', ' ', text)
             text = re.sub(r'\'s\b', '', text).decode('utf-8')
-            datafile = DataFile(filename, text)
-            ner_list = parse_entities(text)
+            datafiles.append(DataFile(filename, text))
+        # recognize entities of all files in one call to the NER server
+        ner_lists = parse_entities_many([datafile.text for datafile in datafiles])
+        for datafile, ner_list in zip(datafiles, ner_lists):
+            filename = datafile.filename
             visited = set()
             for values in ner_list:
                 candidate = CandidateEntity(0, 0, values['text'], e_type=values['type'],
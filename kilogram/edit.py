@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
 from __future__ import division
+from array import array
 from collections import defaultdict, Counter
 import functools
 import multiprocessing
+import threading
+import warnings
 
 from datetime import datetime
 
 import nltk
 from .lang import number_replace, strip_adjectives
 from .ngram import EditNgram
+from .ngram_service import NgramService
 
 
 def get_single_feature_classify(edit):
@@ -29,10 +33,6 @@ def get_single_feature_detect(edit):
         return None
 
 
-# ngram importance regressor
-NGRAM_REGRESSOR = None
-
-
 class EditCollection(object):
     """Collections of edit objects for Machine Learning and evaluation routines"""
     TOP_POS_TAGS = ['VB', 'NN', 'JJ', 'RB', 'DT', 'OTHER']
@@ -111,18 +111,87 @@ class EditCollection(object):
         print('2nd class', len([1 for x in labels if not x]))
         return data, labels, feature_names
 
+    @staticmethod
+    def prefetch(edits, size=3, measures=('pmi',), batch_size=5000):
+        """
+        Fetches the counts of all n-grams that the features of ``edits`` need in large batches
+        and scores their associations into the association cache, so that feature generation
+        runs from memory. Forked workers inherit the cache. Every substituted n-gram takes
+        ``len(measures) + 1`` entries, n-grams beyond the limit of the cache are not prefetched.
+        :param size: n-gram context size used by the features
+        :param measures: association measures to score
+        :param batch_size: number of n-grams fetched per batch
+        :returns: number of prefetched substituted n-grams
+        """
+        cache = EditNgram.association_cache
+        if cache is None:
+            return 0
+        # one n-gram for every substituted n-gram and edit position
+        edit_ngrams = {}
+        for edit in edits:
+            for ngrams in edit.ngram_context(size).values():
+                for ngram in ngrams:
+                    if ngram:
+                        edit_ngrams.setdefault((tuple(ngram.subst_ngram), ngram.edit_pos), ngram)
+        edit_ngrams = edit_ngrams.values()
+        max_entries = cache.cache.max_entries
+        if max_entries is not None and len(edit_ngrams) * (len(measures) + 1) > max_entries:
+            # later batches would evict the associations of earlier ones
+            warnings.warn('association cache of {0} entries holds {1} of {2} substituted n-grams, '
+                          'the others are scored on demand'.format(max_entries, max_entries // (len(measures) + 1),
+                                                                    len(edit_ngrams)))
+            edit_ngrams = edit_ngrams[:max_entries // (len(measures) + 1)]
+        batch = []
+        keys = set()
+        for ngram in edit_ngrams:
+            batch.append(ngram)
+            keys.update(ngram._freq_ngrams())
+            if len(keys) >= batch_size:
+                EditCollection._prefetch_batch(cache, batch, keys, measures)
+                batch = []
+                keys = set()
+        if batch:
+            EditCollection._prefetch_batch(cache, batch, keys, measures)
+        return len(edit_ngrams)
+
+    @staticmethod
+    def _prefetch_batch(cache, edit_ngrams, keys, measures):
+        keys = list(keys)
+        freqs = dict(zip(keys, NgramService.get_freq_arrays(keys)))
+        for ngram in edit_ngrams:
+            ngrams = ngram._freq_ngrams()
+            cache.put_arrays(ngram.subst_ngram, ngram.edit_pos, (ngrams, [freqs[key] for key in ngrams]))
+            for measure in measures:
+                ngram.association(measure)
+
+    def _prefetch(self, edits):
+        print('Started prefetching: {0:%H:%M:%S}'.format(datetime.now()))
+        num_ngrams = self.prefetch(edits)
+        print('Prefetched {0} n-grams: {1:%H:%M:%S}'.format(num_ngrams, datetime.now()))
+
+    @staticmethod
+    def _print_cache_stats():
+        # workers share the cache only if NgramService was configured with a SharedCache
+        stats = NgramService.cache_stats()
+        if stats is not None:
+            print('Lookup cache hit rate: {0:.1%} ({1} hits, {2} misses)'.format(
+                stats['hit_rate'], stats['hits'], stats['misses']))
+
     def get_feature_array(self, balanced_collection):
         features = []
         labels = []
         print('Generating features from raw data')
 
-        # multiprocessing association measures population
+        # associations are computed before forking, workers only read them
+        self._prefetch(balanced_collection)
         pool = multiprocessing.Pool(12)
         print('Started data loading: {0:%H:%M:%S}'.format(datetime.now()))
 
         get_single_feature1 = functools.partial(self.feature_func)
         collection = pool.map(get_single_feature1, balanced_collection)
+        pool.close()
         print('Finish data loading: {0:%H:%M:%S}'.format(datetime.now()))
+        self._print_cache_stats()
 
         for features_labels in collection:
             # avoid assertion errors
@@ -141,12 +210,15 @@ class EditCollection(object):
         self.test_false_errors = []
         self.test_correct_positions = []
 
+        self._prefetch(test_col)
         pool = multiprocessing.Pool(12)
         print('Started data loading: {0:%H:%M:%S}'.format(datetime.now()))
 
         get_single_feature1 = functools.partial(self.feature_func)
         test_collection = pool.map(get_single_feature1, test_col)
+        pool.close()
         print('Finish data loading: {0:%H:%M:%S}'.format(datetime.now()))
+        self._print_cache_stats()
 
         def predict_substitution(features, clf, correct_edit):
             if not features:
@@ -214,32 +286,146 @@ class EditCollection(object):
         return data
 
 
+class EditStore(object):
+    """
+    Sentences of edits, kept once as arrays of ids of a shared token vocabulary.
+    All edits extracted from the same sentence refer to one entry.
+    """
+
+    def __init__(self):
+        self.token_ids = {}
+        self.tokens = []
+        self.sentences = []
+        self.pos_sentences = []
+        self._last = None
+        self._last_decoded = None
+
+    def token_id(self, token):
+        token_id = self.token_ids.get(token)
+        if token_id is None:
+            token_id = self.token_ids[token] = len(self.tokens)
+            self.tokens.append(token)
+        return token_id
+
+    def add_sentence(self, tokens, pos_tokens=None):
+        """
+        :returns: id of the sentence, the last one if it was added with the same lists
+        """
+        if self._last is not None and self._last[0] is tokens and self._last[1] is pos_tokens:
+            return self._last[2]
+        self.sentences.append(array('i', [self.token_id(token) for token in tokens]))
+        self.pos_sentences.append(array('i', [self.token_id(tag) for tag in pos_tokens])
+                                  if pos_tokens else None)
+        self._last = (tokens, pos_tokens, len(self.sentences) - 1)
+        return self._last[2]
+
+    def sentence(self, sentence_id, start=None, stop=None):
+        """
+        :returns: list of tokens of the sentence between ``start`` and ``stop``
+        """
+        return [self.tokens[x] for x in self.sentences[sentence_id][start:stop]]
+
+    def pos_sentence(self, sentence_id, start=None, stop=None):
+        """
+        :returns: list of POS tags of the sentence between ``start`` and ``stop``, None if untagged
+        """
+        pos_ids = self.pos_sentences[sentence_id]
+        if pos_ids is None:
+            return None
+        return [self.tokens[x] for x in pos_ids[start:stop]]
+
+    def decoded(self, sentence_id):
+        """
+        :returns: (tokens, POS tags) of the sentence, the same lists for consecutive calls
+        with one sentence, so that pickled edits of a sentence share them
+        """
+        if self._last_decoded is None or self._last_decoded[0] != sentence_id:
+            self._last_decoded = (sentence_id, self.sentence(sentence_id), self.pos_sentence(sentence_id))
+        return self._last_decoded[1:]
+
+    def __len__(self):
+        return len(self.sentences)
+
+
 class Edit(object):
+    """
+    Edit of a sentence, tokens are kept in an ``EditStore`` and contexts built on access.
+
+    Edits refer to the store they are created with, edits of the same sentence should share one.
+    Edits created without a store get one of their own, so that no store outlives its edits.
+    Unpickled edits are added to a store of the unpickling thread, which is replaced
+    after ``UNPICKLE_STORE_SIZE`` sentences.
+    """
+    __slots__ = ('store', 'sentence_id', 'edit1_id', 'edit2_id', 'positions1', 'positions2', '_ngram_context')
     # increases F1 by ~6-7%
     IGNORE_TAGS = {'DT', 'PR', 'TO', 'CD', 'WD', 'WP'}  # CD doesn't improve - why?
+    # sentences of the store that unpickled edits are added to before the next store is started,
+    # so that the sentences of edits of dropped collections are freed
+    UNPICKLE_STORE_SIZE = 1000
+    # store of unpickled edits of every thread, stores are not thread-safe
+    _unpickle_local = threading.local()
 
-    def __init__(self, tokens1, tokens2, positions1, positions2, pos_tokens=None):
+    def __init__(self, tokens1, tokens2, positions1, positions2, pos_tokens=None, store=None):
         """
         :type tokens1: list
         :type tokens2: list
         :type positions1: tuple
         :type positions2: tuple
         :type pos_tokens: list
+        :type store: EditStore
         :return:
         """
+        self.store = store if store is not None else EditStore()
+        self.edit1_id = self.store.token_id(' '.join(tokens1[slice(*positions1)]).lower())
+        self.edit2_id = self.store.token_id(' '.join(tokens2[slice(*positions2)]).lower())
+        self.positions1 = tuple(positions1)
+        self.positions2 = tuple(positions2)
+        self.sentence_id = self.store.add_sentence(tokens2, pos_tokens)
+        self._ngram_context = None
+
+    def __getstate__(self):
+        # the sentence travels with the edit, ids are only valid in the store it was created in
+        tokens2, pos_tokens = self.store.decoded(self.sentence_id)
+        return (self.edit1, self.edit2, self.positions1, self.positions2, tokens2, pos_tokens,
+                self._ngram_context)
+
+    def __setstate__(self, state):
+        edit1, edit2, self.positions1, self.positions2, tokens2, pos_tokens, self._ngram_context = state
+        store = getattr(Edit._unpickle_local, 'store', None)
+        if store is None or len(store) >= Edit.UNPICKLE_STORE_SIZE:
+            store = Edit._unpickle_local.store = EditStore()
+        self.store = store
+        self.edit1_id = self.store.token_id(edit1)
+        self.edit2_id = self.store.token_id(edit2)
+        self.sentence_id = self.store.add_sentence(tokens2, pos_tokens)
 
-        self.edit1 = ' '.join(tokens1[slice(*positions1)]).lower()
-        self.edit2 = ' '.join(tokens2[slice(*positions2)]).lower()
-        self.positions1 = positions1
-        self.positions2 = positions2
-        self.left_tokens = tokens2[:positions2[0]]
-        self.right_tokens = tokens2[positions2[1]:]
+    @property
+    def edit1(self):
+        return self.store.tokens[self.edit1_id]
+
+    @property
+    def edit2(self):
+        return self.store.tokens[self.edit2_id]
 
-        if pos_tokens:
-            self.left_pos_tokens = pos_tokens[:positions2[0]]
-            self.right_pos_tokens = pos_tokens[positions2[1]:]
-            self.edit_pos_tokens = pos_tokens[slice(*positions2)]
-        self._ngram_context = {}
+    @property
+    def left_tokens(self):
+        return self.store.sentence(self.sentence_id, stop=self.positions2[0])
+
+    @property
+    def right_tokens(self):
+        return self.store.sentence(self.sentence_id, start=self.positions2[1])
+
+    @property
+    def left_pos_tokens(self):
+        return self.store.pos_sentence(self.sentence_id, stop=self.positions2[0])
+
+    @property
+    def right_pos_tokens(self):
+        return self.store.pos_sentence(self.sentence_id, start=self.positions2[1])
+
+    @property
+    def edit_pos_tokens(self):
+        return self.store.pos_sentence(self.sentence_id, *self.positions2)
 
     def __unicode__(self):
         return self.edit1+u'→'+self.edit2 + u'\n' + u' '.join(self.context()).strip()
@@ -249,7 +435,7 @@ class Edit(object):
 
     @property
     def is_error(self):
-        return self.edit1 != self.edit2
+        return self.edit1_id != self.edit2_id
 
     @staticmethod
     def _lowercase_token(token):
@@ -259,23 +445,38 @@ class Edit(object):
 
     def context(self, size=3, fill='', pos_tagged=False):
         """Normal context"""
+        return self._context(self.left_tokens, self.right_tokens, size, fill,
+                             pos_tokens=(self.left_pos_tokens, self.right_pos_tokens) if pos_tagged else None)
+
+    def _context(self, left_tokens, right_tokens, size, fill, pos_tokens=None):
+        """
+        :param pos_tokens: (left POS tags, right POS tags) to pair tokens with their tags
+        """
         def context_tokens(left, center, right):
             return [fill] * (size - len(left)) + \
                 list(left[-size:]) + center + list(right[:size]) + \
                 [fill] * (size - len(right))
-        ct = [self._lowercase_token(x) for x in context_tokens(self.left_tokens, self.edit2.split(), self.right_tokens)]
-        if pos_tagged:
-            pos_tokens = context_tokens(self.left_pos_tokens, self.edit_pos_tokens, self.right_pos_tokens)
+        ct = [self._lowercase_token(x) for x in context_tokens(left_tokens, self.edit2.split(), right_tokens)]
+        if pos_tokens is not None:
+            left_pos_tokens, right_pos_tokens = pos_tokens
+            pos_tokens = context_tokens(left_pos_tokens, self.edit_pos_tokens, right_pos_tokens)
             ct = zip(ct, pos_tokens)
         return ct
 
     def ngram_context(self, size=3, fill=''):
         """N-gram context"""
+        return self._cached_ngram_context(size, fill, self.left_tokens, self.left_pos_tokens,
+                                          self.right_tokens, self.right_pos_tokens)
+
+    def _cached_ngram_context(self, size, fill, left_tokens, left_pos_tokens, right_tokens, right_pos_tokens):
+        if self._ngram_context is None:
+            self._ngram_context = {}
         if size in self._ngram_context:
             return self._ngram_context[size]
         result_ngrams = {}
         for n_size in range(1, size):
-            context_tokens = self.context(n_size, fill, pos_tagged=True)
+            context_tokens = self._context(left_tokens, right_tokens, n_size, fill,
+                                           pos_tokens=(left_pos_tokens, right_pos_tokens))
             result_ngrams[n_size+1] = []
 
             for edit_pos, ngram in zip(range(n_size, -1, -1), nltk.ngrams(context_tokens, n_size+1)):
@@ -289,56 +490,49 @@ class Edit(object):
         return result_ngrams
 
     def ngram_context_no_adj(self, size=3, fill=''):
-        # save original tokens
-        old_left, old_pos_left = self.left_tokens, self.left_pos_tokens
-        old_right, old_pos_right = self.right_tokens, self.right_pos_tokens
-        ######
-        self.left_tokens, self.left_pos_tokens = strip_adjectives(self.left_tokens, self.left_pos_tokens)
-        self.right_tokens, self.right_pos_tokens = strip_adjectives(self.right_tokens, self.right_pos_tokens)
-        result_ngrams = self.ngram_context(size, fill)
-        # restore original tokens
-        self.left_tokens, self.left_pos_tokens = old_left, old_pos_left
-        self.right_tokens, self.right_pos_tokens = old_right, old_pos_right
-        return result_ngrams
+        left_tokens, left_pos_tokens = strip_adjectives(self.left_tokens, self.left_pos_tokens)
+        right_tokens, right_pos_tokens = strip_adjectives(self.right_tokens, self.right_pos_tokens)
+        return self._cached_ngram_context(size, fill, left_tokens, left_pos_tokens, right_tokens, right_pos_tokens)
 
-    def get_single_feature(self, SUBS_LIST, size=3):
-        import pandas as pd
-
-        def is_useful(pos_seq):
-            """Manually marked useless pos sequences, such a DT, PRP$, etc."""
-            result = True
-            pos_set = [x[:2] for x in pos_seq]
-            if len(pos_seq) == 2 and Edit.IGNORE_TAGS.intersection(pos_set):
-                result = False
-            return result
-
-        def get_pos_tag_features(bigrams):
-            pos_tag_feature = []
-            pos_tag_dict = dict([(bigram.edit_pos,
-                                  [int(bigram.pos_tag[int(1 != bigram.edit_pos)] == x) for x in EditCollection.TOP_POS_TAGS])
-                                 for bigram in bigrams if bigram])
-            # append 1 or 0 whether POS tag is catch-all OTHER
-            for key in pos_tag_dict.keys():
-                if not any(pos_tag_dict[key]):
-                    pos_tag_dict[key][-1] = 1
-            for position in (0, 1):
-                if position not in pos_tag_dict:
-                    pos_tag_feature.extend([0 for _ in EditCollection.TOP_POS_TAGS])
-                else:
-                    pos_tag_feature.extend(pos_tag_dict[position])
-            return pos_tag_feature
+    @staticmethod
+    def _is_useful(pos_seq):
+        """Manually marked useless pos sequences, such a DT, PRP$, etc."""
+        result = True
+        pos_set = [x[:2] for x in pos_seq]
+        if len(pos_seq) == 2 and Edit.IGNORE_TAGS.intersection(pos_set):
+            result = False
+        return result
 
-        context_ngrams = self.ngram_context(size)
-        df_list_substs = []
-        # RANK, PMI_SCORE
-        DEFAULT_SCORE = (50, -10)
+    @staticmethod
+    def _pos_tag_features(bigrams):
+        pos_tag_feature = []
+        pos_tag_dict = dict([(bigram.edit_pos,
+                              [int(bigram.pos_tag[int(1 != bigram.edit_pos)] == x) for x in EditCollection.TOP_POS_TAGS])
+                             for bigram in bigrams if bigram])
+        # append 1 or 0 whether POS tag is catch-all OTHER
+        for key in pos_tag_dict.keys():
+            if not any(pos_tag_dict[key]):
+                pos_tag_dict[key][-1] = 1
+        for position in (0, 1):
+            if position not in pos_tag_dict:
+                pos_tag_feature.extend([0 for _ in EditCollection.TOP_POS_TAGS])
+            else:
+                pos_tag_feature.extend(pos_tag_dict[position])
+        return pos_tag_feature
+
+    def _scored_ngrams(self, context_ngrams):
+        """
+        :returns: list of (n-gram size, normal position, n-gram, association dict) of the useful
+        context n-grams, largest n-grams first
+        """
+        scored_ngrams = []
         # TODO: filter on ALLOWED_TYPES
         added_normal_positions = set()
         for ngram_type, ngrams in reversed(context_ngrams.items()):
             for ngram_pos, ngram in enumerate(ngrams):
                 if not ngram:
                     continue
-                if not is_useful(ngram.pos_tag):
+                if not self._is_useful(ngram.pos_tag):
                     continue
 
                 norm_pos = ngram.normal_position
@@ -349,67 +543,73 @@ class Edit(object):
                     if not score_dict:
                         continue
                     #added_normal_positions.add(norm_pos)
+                scored_ngrams.append((ngram_type, norm_pos, ngram, score_dict))
+        return scored_ngrams
 
-                ngram_weight = 0
-                if NGRAM_REGRESSOR:
-                    ngram_weight = NGRAM_REGRESSOR.predict(ngram.get_single_feature(self.edit2)[0])[0]
-                for subst in SUBS_LIST:
-                    df_list_substs.append([subst, score_dict.get(subst, DEFAULT_SCORE)[1],
-                                           score_dict.get(subst, DEFAULT_SCORE)[0],
-                                           ngram_type, norm_pos, 1/(ngram_weight+1)])
-        assert len(df_list_substs) > 0
-        df_substs = pd.DataFrame(df_list_substs, columns=['substitution', 'score', 'rank', 'type', 'norm_position', 'weight'])
+    def get_single_feature(self, SUBS_LIST, size=3):
+        """
+        :returns: (feature vectors, labels), one for every substitution in ``SUBS_LIST``
+        """
+        import numpy as np
 
-        central_prob = df_substs[(df_substs.norm_position == 0)][:len(SUBS_LIST)].set_index('substitution')
-        """type: DataFrame"""
+        context_ngrams = self.ngram_context(size)
+        scored_ngrams = self._scored_ngrams(context_ngrams)
+        assert len(scored_ngrams) > 0 and len(SUBS_LIST) > 0
 
         matrix = EditCollection.CONFUSION_MATRIX[self.edit1]
         matrix_sum = sum(matrix.values())
         assert matrix_sum > 0
 
-        feature_vectors = []
-        labels = []
-
-        # TODO: add indicator feature if rank/position is missing?
-        type_group = df_substs.groupby(['substitution', 'type'])
-        avg_by_position = df_substs.groupby(['substitution', 'norm_position']).mean()
-        avg_by_type = type_group.mean()
-        #weighted_ranks_types = type_group.apply(lambda subf: sum(subf['weight']*subf['rank'])/sum(subf['weight']))
-        #weighted_scores_types = type_group.apply(lambda subf: sum(subf['weight']*subf['score'])/sum(subf['score']))
-        #weighted_ranks_positions = df_substs.groupby(['substitution', 'norm_position']).apply(lambda subf: sum(subf['weight']*subf['rank'])/sum(subf['weight']))
-        top_type_counts = type_group.apply(lambda x: x[x['rank'] == 0]['rank'].count())
-
-        for subst in SUBS_LIST:
-
-            feature_vector = []
-            for ngram_size in range(2, 4):
-                feature_vector.append(avg_by_type.loc[subst]['rank'].get(ngram_size, 50))
-                feature_vector.append(int(feature_vector[-1] != 50))
-            feature_vector.append(avg_by_type.loc[subst]['score'].get(3, -10))
-
-            # START: zero prob indicator feature -----
-            central_prob_len = 0
-            if len(central_prob) > 0:
-                central_prob_len = central_prob['type'].values[0]
-            feature_vector.append(central_prob_len)
-            feature_vector.append(central_prob['rank'].get(subst, 50))
-            # END zero prob
-
-            # reverse confusion matrix
-            feature_vector.append(matrix.get(subst, 0)/matrix_sum)
-            # counts of a preposition on top of a ranking
-            feature_vector.append(top_type_counts.loc[subst].get(3, 0))
-
-            # average rank by normalized position
-            for position in (-1, 0, 1):
-                feature_vector.append(avg_by_position.loc[subst]['rank'].get(position, 50))
-
-            # substitutions themselves
-            feature_vector.extend([int(x == subst) for x in EditCollection.SUBSTITUTIONS])
-
-            # POS TAG enumeration
-            feature_vector.extend(get_pos_tag_features(context_ngrams[2]))
-
-            labels.append(int(self.edit2 == subst))
-            feature_vectors.append(feature_vector)
-        return feature_vectors, labels
+        # RANK, PMI_SCORE of every n-gram and substitution
+        DEFAULT_SCORE = (50, -10)
+        ranks = np.empty((len(scored_ngrams), len(SUBS_LIST)))
+        scores = np.empty((len(scored_ngrams), len(SUBS_LIST)))
+        for i, (_, _, _, score_dict) in enumerate(scored_ngrams):
+            for j, subst in enumerate(SUBS_LIST):
+                ranks[i, j], scores[i, j] = score_dict.get(subst, DEFAULT_SCORE)
+        types = np.array([x[0] for x in scored_ngrams])
+        positions = np.array([x[1] for x in scored_ngrams])
+
+        def mean(values, mask, default):
+            if mask.any():
+                return values[mask].mean(axis=0)
+            return default
+
+        num_features = len(EditCollection.FEATURE_NAMES)
+        features = np.zeros((len(SUBS_LIST), num_features + len(EditCollection.SUBSTITUTIONS) +
+                             2 * len(EditCollection.TOP_POS_TAGS)))
+        for i, ngram_size in enumerate(range(2, 4)):
+            features[:, 2*i] = mean(ranks, types == ngram_size, 50)
+            features[:, 2*i+1] = features[:, 2*i] != 50
+        features[:, 4] = mean(scores, types == 3, -10)
+
+        # zero prob indicator feature: the first central n-gram
+        central = np.flatnonzero(positions == 0)
+        if len(central):
+            features[:, 5] = types[central[0]]
+            features[:, 6] = ranks[central[0]]
+        else:
+            features[:, 6] = 50
+
+        # reverse confusion matrix
+        features[:, 7] = [matrix.get(subst, 0)/matrix_sum for subst in SUBS_LIST]
+        # counts of a preposition on top of a ranking
+        features[:, 8] = (ranks[types == 3] == 0).sum(axis=0)
+
+        # average rank by normalized position
+        for i, position in enumerate((-1, 0, 1)):
+            features[:, 9+i] = mean(ranks, positions == position, 50)
+
+        # substitutions themselves
+        subst_columns = defaultdict(list)
+        for i, subst in enumerate(EditCollection.SUBSTITUTIONS):
+            subst_columns[subst].append(num_features + i)
+        for j, subst in enumerate(SUBS_LIST):
+            features[j, subst_columns.get(subst, [])] = 1
+
+        # POS TAG enumeration
+        features[:, num_features + len(EditCollection.SUBSTITUTIONS):] = \
+            self._pos_tag_features(context_ngrams[2])
+
+        labels = [int(self.edit2 == subst) for subst in SUBS_LIST]
+        return features.tolist(), labels
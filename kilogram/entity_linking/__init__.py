@@ -2,6 +2,7 @@ from __future__ import division
 from collections import defaultdict
 import nltk
 from kilogram import ListPacker, NgramService
+from kilogram.storage.packing import top_size
 from kilogram.lang import split_camel_case
 
 PERCENTILE = 0.9
@@ -50,7 +51,7 @@ class CandidateEntity:
                 label, uris = line.strip().split('\t')
             except:
                 continue
-            candidates = ListPacker.unpack(uris)
+            candidates = ListPacker.unpack_top(uris, mass=PERCENTILE)
             uri_counts_local[label] = [(uri, float(count)) for uri, count in candidates]
         return uri_counts_local
 
@@ -76,7 +77,7 @@ class CandidateEntity:
                 continue
             res = NgramService.hbase_raw(table, cand_string, column)
             if res:
-                candidates = ListPacker.unpack(res)
+                candidates = ListPacker.unpack_top(res, mass=PERCENTILE)
                 self.cand_string = cand_string
                 return [(uri, float(count)) for uri, count in candidates]
             prev_cand_string = cand_string
@@ -84,7 +85,7 @@ class CandidateEntity:
         res = NgramService.hbase_raw("wiki_anchor_ngrams_nospace",
                                      self.cand_string.replace(' ', '').lower(), column)
         if res:
-            candidates = ListPacker.unpack(res)
+            candidates = ListPacker.unpack_top(res, mass=PERCENTILE)
             self.cand_string = self.cand_string.replace(' ', '').lower()
             return [(uri, float(count)) for uri, count in candidates]
 
@@ -112,19 +113,17 @@ class CandidateEntity:
         uri_counts = {}
 
         # take Xs percentile to remove noisy candidates
+        # TODO: percentile has impact on the number of candidates and on the heuristic respectively
         if candidates:
-            temp_candidates = candidates
+            temp_candidates = sorted(candidates, key=lambda x: x[1], reverse=True)
+            counts = [count for _, count in temp_candidates]
+            temp_candidates = temp_candidates[:top_size(counts, sum(counts), mass=PERCENTILE)]
         else:
+            # stored candidates are unpacked up to the percentile
             temp_candidates = self._get_uri_counts()
         if temp_candidates is None:
             return
-        total_c = sum(zip(*temp_candidates)[1])
-        cur_c = 0
-        # TODO: percentile has impact on the number of candidates and on the heuristic respectively
-        for uri, count in sorted(temp_candidates, key=lambda x: x[1], reverse=True):
-            if cur_c/total_c > PERCENTILE:
-                break
-            cur_c += count
+        for uri, count in temp_candidates:
             uri_counts[uri] = count
         # also remove all counts = 1
         # TODO: do experiments
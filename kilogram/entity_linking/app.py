@@ -5,14 +5,15 @@
 import argparse
 import os.path
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 
 import kilogram
 from kilogram.dataset.entity_linking.gerbil import DataSet
 from kilogram.entity_linking import syntactic_subsumption
 from kilogram.dataset.dbpedia import DBPediaOntology, NgramEntityResolver
 from kilogram.entity_types.prediction import NgramTypePredictor
-from kilogram import NgramService
+from kilogram import NgramService, AsyncNgramService
+from kilogram.storage import LookupCache, Metrics, StatsdSink, render_text
 
 
 parser = argparse.ArgumentParser(description=__doc__)
@@ -23,14 +24,34 @@ parser.add_argument('--ner-host', dest='ner_host', action='store', required=True
 parser.add_argument('--types-table', dest='types_table', action='store', required=True,
                     help='Typed N-gram table in HBase')
 parser.add_argument('--hbase-host', dest='hbase_host', action='store', required=True,
-                    help='HBase gateway host')
+                    help='HBase gateway host, or comma-separated host[:port] list of several gateways')
 parser.add_argument('--hbase-port', dest='hbase_port', action='store',
                     default='9090', help='HBase gateway host')
+parser.add_argument('--hbase-pool-size', dest='hbase_pool_size', action='store', type=int,
+                    help='Maximum number of concurrent connections to every HBase gateway, '
+                         'by default enough for --max-in-flight lookups and at least 8')
+parser.add_argument('--hbase-hedge-percentile', dest='hbase_hedge_percentile', action='store', type=float,
+                    help='With several gateways, duplicate lookups slower than this latency percentile '
+                         'of a gateway, such as 0.95')
+parser.add_argument('--hbase-cache-size', dest='hbase_cache_size', action='store', type=int,
+                    default=100000, help='Number of HBase values to cache, 0 to disable caching')
+parser.add_argument('--statsd-host', dest='statsd_host', action='store',
+                    help='Send lookup metrics to this statsd host, metrics are served on /metrics anyway')
+parser.add_argument('--max-in-flight', dest='max_in_flight', action='store', type=int,
+                    default=64, help='Maximum number of concurrent lookups, 0 to look up sequentially')
 
 
 args = parser.parse_args()
 
-NgramService.configure(hbase_host=(args.hbase_host, args.hbase_port))
+cache = LookupCache(max_entries=args.hbase_cache_size) if args.hbase_cache_size else None
+metrics = Metrics([StatsdSink(args.statsd_host)] if args.statsd_host else None)
+hbase_hosts = [(host.split(':')[0], host.split(':')[1] if ':' in host else args.hbase_port)
+               for host in args.hbase_host.split(',')]
+NgramService.configure(hbase_host=hbase_hosts if len(hbase_hosts) > 1 else hbase_hosts[0],
+                       pool_size=args.hbase_pool_size or max(args.max_in_flight, 8),
+                       cache=cache, metrics=metrics, hedge_percentile=args.hbase_hedge_percentile)
+if args.max_in_flight:
+    AsyncNgramService.configure(max_in_flight=args.max_in_flight)
 kilogram.NER_HOSTNAME = args.ner_host
 ner = NgramEntityResolver(os.path.join(args.dbpedia_data_dir, "dbpedia_data.txt"),
                           os.path.join(args.dbpedia_data_dir, "dbpedia_2015-04.owl"))
@@ -78,6 +99,11 @@ def d2kb_prior_types():
     return jsonify({'mentions': new_mentions})
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics_text():
+    return Response(render_text(NgramService.metrics_snapshot()), mimetype='text/plain')
+
+
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
@@ -85,4 +111,4 @@ def after_request(response):
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0')
+    app.run(debug=True, host='0.0.0.0', threaded=True)
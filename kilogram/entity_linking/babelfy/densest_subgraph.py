@@ -22,9 +22,11 @@ class SemanticGraph:
         self.candidates = candidates
         neighbors = {}
 
+        uris = list(set(e.uri for cand in candidates for e in cand.entities))
+        edge_weights = dict(zip(uris, NgramService.get_wiki_edge_weights_many(uris)))
         for cand in candidates:
             for e in cand.entities:
-                neighbors[e.uri] = NgramService.get_wiki_edge_weights(e.uri)
+                neighbors[e.uri] = dict(edge_weights[e.uri])
                 # delete self
                 try:
                     del neighbors[e.uri][e.uri]
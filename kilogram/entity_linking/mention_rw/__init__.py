@@ -1,4 +1,5 @@
 from __future__ import division
+import heapq
 import math
 import numpy as np
 import networkx as nx
@@ -42,7 +43,7 @@ def _candidate_filter(candidates):
         return substring_similar[:topn]
 
     def top_prior(candidate_, topn=10):
-        return sorted(candidate_.entities, key=lambda e: e.count, reverse=True)[:topn]
+        return heapq.nlargest(topn, candidate_.entities, key=lambda e: e.count)
 
     for candidate in candidates:
         entities = top_prior(candidate)
@@ -73,13 +74,17 @@ class SemanticGraph:
         #for cand in candidates:
         #    self.candidate_uris1.add(cand.cand_string)
 
+        mention_uris = list(set(_mention_uri(e.uri, cand.cand_string)
+                                for cand in candidates for e in cand.entities))
+        cooccurs = dict(zip(mention_uris, NgramService.get_wiki_link_mention_cooccur_many(mention_uris)))
+
         self.candidate_uris = set()
         for cand in candidates:
             total = sum([e.count for e in cand.entities])
             for e in cand.entities:
                 mention_uri = _mention_uri(e.uri, cand.cand_string)
                 self.candidate_uris.add(mention_uri)
-                neighbors[mention_uri] = NgramService.get_wiki_link_mention_cooccur(mention_uri)
+                neighbors[mention_uri] = dict(cooccurs[mention_uri])
                 # delete self
                 try:
                     del neighbors[mention_uri][mention_uri]
@@ -1,5 +1,6 @@
 from __future__ import division
 from collections import defaultdict
+import heapq
 import math
 import numpy as np
 import networkx as nx
@@ -41,7 +42,7 @@ def _candidate_filter(candidates):
         return substring_similar[:topn]
 
     def top_prior(candidate_, topn=10):
-        return sorted(candidate_.entities, key=lambda e: e.count, reverse=True)[:topn]
+        return heapq.nlargest(topn, candidate_.entities, key=lambda e: e.count)
 
     for candidate in candidates:
         entities = top_prior(candidate)
@@ -72,10 +73,15 @@ class SemanticGraph:
         for cand in candidates:
             for e in cand.entities:
                 self.candidate_uris.add(e.uri)
+        uris = list(self.candidate_uris)
+        pagelinks = dict(zip(uris, NgramService.get_wiki_title_pagelinks_many(uris)))
+        cooccurs = dict(zip(uris, NgramService.get_wiki_links_cooccur_many(uris)))
+        for cand in candidates:
+            for e in cand.entities:
                 neighbors[e.uri] = defaultdict(lambda: 0)
-                for n_uri, n_count in NgramService.get_wiki_title_pagelinks(e.uri).items():
+                for n_uri, n_count in pagelinks[e.uri].items():
                     neighbors[e.uri][n_uri] = int(n_count)
-                for n_uri, n_count in NgramService.get_wiki_links_cooccur(e.uri).items():
+                for n_uri, n_count in cooccurs[e.uri].items():
                     neighbors[e.uri][n_uri] += int(n_count)
                 # delete self
                 try:
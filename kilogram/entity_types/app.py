@@ -3,13 +3,14 @@
 ./app.py typogram
 """
 import sys
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from kilogram.dataset.dbpedia import DBPediaOntology
 from kilogram.entity_types.prediction import NgramTypePredictor
 from kilogram import NgramService
 from kilogram.lang.unicode import strip_unicode
+from kilogram.storage import Metrics, render_text
 
-NgramService.configure(hbase_host=('diufpc304', 9090), subst_table=sys.argv[1])
+NgramService.configure(hbase_host=('diufpc304', 9090), subst_table=sys.argv[1], metrics=Metrics())
 
 app = Flask(__name__)
 dbpedia_ontology = DBPediaOntology('dbpedia_2015-04.owl')
@@ -22,6 +23,11 @@ def predict_ngram_from_context():
     return jsonify({'types': ngram_predictor.predict_types_features(context)})
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics_text():
+    return Response(render_text(NgramService.metrics_snapshot()), mimetype='text/plain')
+
+
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
@@ -25,8 +25,9 @@ class NgramTypePredictor(object):
         self.type_hierarchy = type_hierarchy
         self.hbase_table = hbase_table
         self.type_priors = {}
-        total = sum(NgramService.substitution_counts.values())
-        for entity_type, count in NgramService.substitution_counts.items():
+        substitution_counts = NgramService.get_substitution_counts()
+        total = sum(substitution_counts.values())
+        for entity_type, count in substitution_counts.items():
             self.type_priors[entity_type] = count/total
 
     def _get_ngram_probs(self, context, filter_types=None):
@@ -35,11 +36,15 @@ class NgramTypePredictor(object):
         trigrams = [context[:3], context[-3:], context[1:4]]
         bigrams = [context[1:3], None, context[2:4]]
 
+        # bigrams are only used as a fallback, but fetching them together saves round-trips
+        ngrams = [" ".join(ngram) for ngram in trigrams + bigrams if ngram]
+        values = dict(zip(ngrams, NgramService.hbase_raw_many(self.hbase_table, ngrams, "ngram:value")))
+
         types = []
         for bigram, trigram in zip(bigrams, trigrams):
-            type_values = NgramService.hbase_raw(self.hbase_table, " ".join(trigram), "ngram:value")
+            type_values = values[" ".join(trigram)]
             if not type_values and bigram:
-                type_values = NgramService.hbase_raw(self.hbase_table, " ".join(bigram), "ngram:value")
+                type_values = values[" ".join(bigram)]
             if type_values:
                 type_values_unpacked = ListPacker.unpack(type_values)
                 if filter_types:
@@ -57,10 +62,13 @@ class NgramTypePredictor(object):
         trigrams = [context[:3], context[-3:], context[1:4]]
         bigrams = [context[1:3], 'NONE', context[2:4]]
 
+        ngrams = [" ".join(ngram) for ngram in trigrams + bigrams]
+        values = dict(zip(ngrams, NgramService.hbase_raw_many(self.hbase_table, ngrams, "ngram:value")))
+
         types = {2: [], 3: []}
         for bigram, trigram in zip(bigrams, trigrams):
             for ngram, order in zip((bigram, trigram), (2, 3)):
-                type_values = NgramService.hbase_raw(self.hbase_table, " ".join(ngram), "ngram:value") or []
+                type_values = values[" ".join(ngram)] or []
                 type_values_unpacked = ListPacker.unpack(type_values)
                 type_dict = {'ngram': ' '.join(ngram)}
                 try:
@@ -1,7 +1,6 @@
 # coding=utf-8
 import re
-import socket
-import time
+from .stanford import StanfordClient
 from .unicode import strip_unicode
 from .tokenize import wiki_tokenize_func
 
@@ -85,37 +84,53 @@ def strip_adjectives(tokens, pos_tokens):
         return [], []
 
 
+# (hostname, port) -> StanfordClient
+_stanford_clients = {}
+
+
+def configure_stanford(hostname, port, **kwargs):
+    """
+    Sets the options of the client of a Stanford server, see ``StanfordClient``.
+    :param hostname: host name, or comma-separated host names of servers on the same port
+    """
+    client = _stanford_clients.pop((hostname, port), None)
+    if client is not None:
+        client.close()
+    client = StanfordClient([(host, port) for host in hostname.split(',')], **kwargs)
+    _stanford_clients[(hostname, port)] = client
+    return client
+
+
 def _stanford_socket(hostname, port, content):
-    while True:
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.connect((hostname, port))
-            break
-        except socket.error:
-            time.sleep(1)
-    s.sendall(content.encode('utf-8'))
-    s.shutdown(socket.SHUT_WR)
-    data = ""
-    while 1:
-        l_data = s.recv(8192)
-        if l_data == "":
-            break
-        data += l_data
-    s.close()
-    return data
+    return _stanford_socket_many(hostname, port, [content])[0]
+
+
+def _stanford_socket_many(hostname, port, contents):
+    client = _stanford_clients.get((hostname, port))
+    if client is None:
+        client = configure_stanford(hostname, port)
+    return client.request_many(contents)
+
+
+def _compress_pos(pos_tag):
+    if pos_tag.startswith('VB'):
+        pos_tag = 'VB'
+    elif pos_tag == 'NNS':
+        pos_tag = 'NN'
+    return pos_tag
 
 
 def pos_tag(sentence):
-    from .. import ST_HOSTNAME, ST_PORT
+    return pos_tag_many([sentence])[0]
+
 
-    def compress_pos(pos_tag):
-        if pos_tag.startswith('VB'):
-            pos_tag = 'VB'
-        elif pos_tag == 'NNS':
-            pos_tag = 'NN'
-        return pos_tag
-    pos_tokens = _stanford_socket(ST_HOSTNAME, ST_PORT, sentence).strip()
-    return [compress_pos(x.split('_')[1]) for x in pos_tokens.split()]
+def pos_tag_many(sentences):
+    """
+    :returns: list of POS tags of every sentence, tagged in one call to the server
+    """
+    from .. import ST_HOSTNAME, ST_PORT
+    return [[_compress_pos(x.split('_')[1]) for x in pos_tokens.strip().split()]
+            for pos_tokens in _stanford_socket_many(ST_HOSTNAME, ST_PORT, sentences)]
 
 
 def replace_ne(sentence):
@@ -230,10 +245,19 @@ def parse_entities(sentence):
     /usr/lib/jvm/java-8-oracle/bin/java -mx500m -cp stanford-corenlp-3.5.1-models.jar:stanford-corenlp-3.5.1.jar edu.stanford.nlp.ie.NERServer -port 9191 -outputFormat inlineXML &
     """
 
+    return parse_entities_many([sentence])[0]
+
+
+def parse_entities_many(sentences):
+    """
+    :returns: list of entities of every sentence, see ``parse_entities``
+    """
     from .. import NER_HOSTNAME, NER_PORT
-    sentence = strip_unicode(sentence)
-    sentence_pos = _stanford_socket(NER_HOSTNAME, NER_PORT, _strip_tweet_entities(sentence)).strip()
-    return parse_entities_from_xml(sentence, sentence_pos)
+    sentences = [strip_unicode(sentence) for sentence in sentences]
+    sentences_pos = _stanford_socket_many(NER_HOSTNAME, NER_PORT,
+                                          [_strip_tweet_entities(sentence) for sentence in sentences])
+    return [parse_entities_from_xml(sentence, sentence_pos.strip())
+            for sentence, sentence_pos in zip(sentences, sentences_pos)]
 
 
 def parse_tweet_entities(text):
@@ -1,8 +1,15 @@
 import difflib
+import functools
+import os
 import re
+import sys
+import time
+from collections import defaultdict
 
-from ..edit import Edit
-from . import strip_determiners, pos_tag
+import unicodecsv as csv
+
+from ..edit import Edit, EditStore
+from . import strip_determiners, pos_tag_many
 from .tokenize import default_tokenize_func
 
 MULTIPLE_PUNCT_REGEX = re.compile(r'([.!?-]){2,}')
@@ -10,13 +17,6 @@ MULTIPLE_SPACE_REGEX = re.compile(r'([ ]){2,}')
 GARBAGE_REGEX = re.compile(r'[^\w\s]')
 
 
-def _get_line_num(edit_file):
-    line_n = 0
-    with open(edit_file) as input:
-        line_n = sum(1 for _ in input)
-    return line_n
-
-
 def _prefilter_line(row):
     edits = []
     for edit in row:
@@ -46,87 +46,336 @@ def _is_garbage(ngram1, ngram2):
     return False
 
 
-def extract_edits(edit_file, substitutions=None, tokenize_func=default_tokenize_func):
+def _row_tokens(row, tokenize_func):
     """
-    Extracts contexts for all n-grams that were changed between two text versions.
-    Uses most sequence matcher from difflib, which takes most longest subsequence.
+    :returns: (tokens of the first version, tokens of the second version), None if the row has no edits
+    """
+    row = _prefilter_line(row)
+    if row is None:
+        return
+    edit1, edit2 = row
+    if edit1 is None or edit2 is None:
+        return
+    # tokenize to words, since we want word diff
+    edit1 = strip_determiners(' '.join(tokenize_func(edit1))).split()
+    edit2 = strip_determiners(' '.join(tokenize_func(edit2))).split()
+    return edit1, edit2
 
-    If ``substitutions'' argument is supplied, extract all n-gram matching substitutions,
-    even if they were not changed.
 
-    :returns: list of Edit objects
+def _rows_edits(rows, store, substitutions=None, tokenize_func=default_tokenize_func):
+    """
+    Tags the second versions of all rows in one call to the POS tagger.
+    :returns: list of Edit objects of every row, see ``extract_edits``
+    """
+    rows_tokens = [_row_tokens(row, tokenize_func) for row in rows]
+    sentences = [' '.join(tokens[1]) for tokens in rows_tokens if tokens is not None]
+    # identify pos tags here to not do it multiple times
+    rows_pos_tokens = iter(pos_tag_many(sentences) if sentences else [])
+    return [_row_edits(tokens[0], tokens[1], next(rows_pos_tokens), store, substitutions)
+            if tokens is not None else [] for tokens in rows_tokens]
+
+
+def _row_edits(edit1, edit2, pos_tokens, store, substitutions=None):
+    """
+    :returns: list of Edit objects of one row
     """
-    from pyutils import print_progress
-    edit_n = 0
     edits = []
-    line_n = _get_line_num(edit_file)
-
-    with open(edit_file, 'r') as input:
-        csvreader = csv.reader(input, delimiter='\t', encoding='utf-8')
-        csvreader.__class__.__len__ = lambda x: line_n
-        for row in print_progress(csvreader):
-            row = _prefilter_line(row)
-            edit1, edit2 = row
-            if edit1 is None or edit2 is None:
+    for seq in difflib.SequenceMatcher(None, edit1, edit2).get_grouped_opcodes(0):
+        for tag, i1, i2, j1, j2 in seq:
+            if tag == 'equal':
                 continue
-            # tokenize to words, since we want word diff
-            edit1 = strip_determiners(' '.join(tokenize_func(edit1))).split()
-            edit2 = strip_determiners(' '.join(tokenize_func(edit2))).split()
-            # identify pos tags here to not do it multiple times
-            pos_tokens = pos_tag(' '.join(edit2))
-            for seq in difflib.SequenceMatcher(None, edit1, edit2).get_grouped_opcodes(0):
-                for tag, i1, i2, j1, j2 in seq:
-                    if tag == 'equal':
-                        continue
-                    # extract merged edits into unigrams that match substitutions
-                    if substitutions:
-                        # TODO: works only for unigram substitutions
-                        index1 = [(ix, i) for ix, i in enumerate(range(i1, i2)) if edit1[i] in substitutions]
-                        index2 = [(ix, i) for ix, i in enumerate(range(j1, j2)) if edit2[i] in substitutions]
-                        if len(index1) != 1 or len(index2) != 1 or index1[0][0] != index2[0][0]:
-                            continue
-                        i1, i2 = index1[0][1], index1[0][1]+1
-                        j1, j2 = index2[0][1], index2[0][1]+1
-                    edits.append(Edit(edit1, edit2, (i1, i2), (j1, j2), pos_tokens))
-                    edit_n += 1
-
-            # Add all other substitutions if supplied
-            # TODO: works only for unigrams
+            # extract merged edits into unigrams that match substitutions
             if substitutions:
-                for i, unigram in enumerate(edit2):
-                    if unigram in substitutions:
-                        edits.append(Edit(edit2, edit2, (i, i+1), (i, i+1), pos_tokens))
-                        edit_n += 1
+                # TODO: works only for unigram substitutions
+                index1 = [(ix, i) for ix, i in enumerate(range(i1, i2)) if edit1[i] in substitutions]
+                index2 = [(ix, i) for ix, i in enumerate(range(j1, j2)) if edit2[i] in substitutions]
+                if len(index1) != 1 or len(index2) != 1 or index1[0][0] != index2[0][0]:
+                    continue
+                i1, i2 = index1[0][1], index1[0][1]+1
+                j1, j2 = index2[0][1], index2[0][1]+1
+            edits.append(Edit(edit1, edit2, (i1, i2), (j1, j2), pos_tokens, store=store))
 
-        del csvreader.__class__.__len__
-    print('Total edits extracted:', edit_n)
+    # Add all other substitutions if supplied
+    # TODO: works only for unigrams
+    if substitutions:
+        for i, unigram in enumerate(edit2):
+            if unigram in substitutions:
+                edits.append(Edit(edit2, edit2, (i, i+1), (i, i+1), pos_tokens, store=store))
     return edits
 
 
-def extract_filtered(edit_file, filter_func, tokenize_func=default_tokenize_func):
+def _rows_filtered(rows, store, filter_func, tokenize_func=default_tokenize_func):
     """
-    Extracts contexts for all words from edit_file that satisfy conditions in ``filter_func``.
-    Only second text version is used.
+    :returns: list of Edit objects of every row, see ``extract_filtered``
+    """
+    return [_row_filtered(row, store, filter_func, tokenize_func) for row in rows]
+
+
+def _row_filtered(row, store, filter_func, tokenize_func=default_tokenize_func):
+    """
+    :returns: list of Edit objects of one row
+    """
+    row = _prefilter_line(row)
+    if row is None:
+        return []
+    _, edit2 = row
+    if edit2 is None:
+        return []
+    # tokenize to words, since we want word diff
+    edit2 = tokenize_func(edit2)
+    return [Edit(edit2, edit2, (i1, i1+1), (i1, i1+1), store=store)
+            for i1, word in enumerate(edit2) if filter_func(word)]
+
+
+class EditStream(object):
+    """
+    Edits of a tab-separated file of text versions, read in a single pass.
+
+    ``position`` is a checkpoint of the edits consumed so far: (byte offset of a row,
+    number of edits of that row already consumed). A stream created with this position
+    continues with the next edit.
+    """
+    # rows of every new store, so that consumed edits release their sentences
+    STORE_ROWS = 1000
+    # rows passed to the row function at once, so that their sentences are tagged in one call
+    BATCH_ROWS = 64
+
+    def __init__(self, edit_file, row_func, chunk_size=None, position=(0, 0), end=None, store=None,
+                 progress=True):
+        """
+        :param row_func: function of (list of csv rows, store) -> list of Edit objects of every row
+        :param chunk_size: yield lists of ``chunk_size`` edits instead of single edits
+        :param position: checkpoint to start from
+        :param end: byte offset, rows starting from it are not read
+        :param store: ``EditStore`` of all edits, None for a new store every ``STORE_ROWS`` rows
+        :param progress: print the percentage of bytes read
+        """
+        self.edit_file = edit_file
+        self.row_func = row_func
+        self.chunk_size = chunk_size
+        self.position = tuple(position)
+        self.end = end
+        self.store = store
+        self.progress = progress
+        self.edit_n = 0
+        self.row_n = 0
+        self._offset = 0
+
+    def _lines(self, input):
+        # csv reader pulls one line at a time, so the offset is always at the end of the last row
+        while True:
+            line = input.readline()
+            if not line:
+                return
+            self._offset += len(line)
+            yield line
+
+    def _print_progress(self, offset, size, percent):
+        new_percent = 100 * offset // size if size else 100
+        if self.progress and new_percent != percent:
+            sys.stdout.write('\r%d%%' % new_percent)
+            sys.stdout.flush()
+        return new_percent
+
+    def _batches(self, csvreader, row_start):
+        """
+        :returns: iterator of lists of (csv row, byte offset of the row, byte offset after the row)
+        """
+        batch = []
+        for row in csvreader:
+            if self.end is not None and row_start >= self.end:
+                break
+            batch.append((row, row_start, self._offset))
+            row_start = self._offset
+            if len(batch) == self.BATCH_ROWS:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _edits(self):
+        row_start, skip = self.position
+        store = self.store
+        store_row_n = 0
+        percent = None
+        with open(self.edit_file, 'rb') as input:
+            size = os.fstat(input.fileno()).st_size
+            input.seek(row_start)
+            self._offset = row_start
+            csvreader = csv.reader(self._lines(input), delimiter='\t', encoding='utf-8')
+            for batch in self._batches(csvreader, row_start):
+                self.row_n += len(batch)
+                if self.store is None and (store is None or store_row_n >= self.STORE_ROWS):
+                    store, store_row_n = EditStore(), 0
+                store_row_n += len(batch)
+                rows_edits = self.row_func([row for row, _, _ in batch], store)
+                for (row, row_start, row_end), edits in zip(batch, rows_edits):
+                    for i in range(skip, len(edits)):
+                        yield edits[i], (row_start, i + 1) if i + 1 < len(edits) else (row_end, 0)
+                    skip = 0
+                percent = self._print_progress(batch[-1][2], size, percent)
+        if self.progress:
+            sys.stdout.write('\n')
+
+    def __iter__(self):
+        chunk = []
+        for edit, position in self._edits():
+            self.edit_n += 1
+            if self.chunk_size is None:
+                self.position = position
+                yield edit
+                continue
+            chunk.append(edit)
+            if len(chunk) == self.chunk_size:
+                self.position = position
+                yield chunk
+                chunk = []
+        if chunk:
+            # the position is already at the end of the last row
+            self.position = position
+            yield chunk
+
+
+def _shards(edit_file, shard_n):
+    """
+    Splits a file into byte ranges that start at the beginning of a line.
+    Fields with line breaks are not supported.
+    :returns: list of (start, end) byte offsets
+    """
+    size = os.path.getsize(edit_file)
+    offsets = [0]
+    with open(edit_file, 'rb') as input:
+        for i in range(1, shard_n):
+            # the line that contains the byte before the boundary belongs to the previous shard
+            input.seek(max(size * i // shard_n - 1, offsets[-1]))
+            input.readline()
+            offset = input.tell()
+            if offsets[-1] < offset < size:
+                offsets.append(offset)
+    offsets.append(size)
+    return zip(offsets[:-1], offsets[1:])
+
+
+# state of worker processes, set by the pool initializer, so that row functions do not need to be pickled
+_worker_edit_file = None
+_worker_row_func = None
+
+
+def _init_worker(edit_file, row_func):
+    global _worker_edit_file, _worker_row_func
+    _worker_edit_file = edit_file
+    _worker_row_func = row_func
+
+
+def _extract_shard(shard):
+    """
+    :returns: (process id, number of rows, number of bytes, seconds, list of Edit objects)
+    """
+    start_time = time.time()
+    start, end = shard
+    stream = EditStream(_worker_edit_file, _worker_row_func, position=(start, 0), end=end, progress=False)
+    edits = list(stream)
+    return os.getpid(), stream.row_n, end - start, time.time() - start_time, edits
+
+
+def _extract_parallel(edit_file, row_func, processes, ordered=True, shard_n=None, progress=True):
+    """
+    Extracts edits of byte ranges of the file in worker processes. Every worker tags
+    its sentences with its own connections to the POS tagger.
+
+    :param ordered: return edits in the order of the file, otherwise in the order shards finish
+    :param shard_n: number of byte ranges, 4 per process by default
+    :param progress: print the number of finished ranges and the throughput of every worker
     :returns: list of Edit objects
     """
-    from pyutils import print_progress
-    edit_n = 0
+    from multiprocessing import Pool
+    shards = _shards(edit_file, shard_n or 4 * processes)
+    worker_stats = defaultdict(lambda: [0, 0, 0.])
     edits = []
-    line_n = _get_line_num(edit_file)
-    with open(edit_file, 'r') as input:
-        csvreader = csv.reader(input, delimiter='\t', encoding='utf-8')
-        csvreader.__class__.__len__ = lambda x: line_n
-        for row in print_progress(csvreader):
-            row = _prefilter_line(row)
-            _, edit2 = row
-            if edit2 is None:
-                continue
-            # tokenize to words, since we want word diff
-            edit2 = tokenize_func(edit2)
-            for i1, word in enumerate(edit2):
-                if filter_func(word):
-                    edits.append(Edit(edit2, edit2, (i1, i1+1), (i1, i1+1)))
-                    edit_n += 1
-        del csvreader.__class__.__len__
-    print('Total edits extracted:', edit_n)
+    pool = Pool(processes, initializer=_init_worker, initargs=(edit_file, row_func))
+    try:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for i, (pid, row_n, byte_n, seconds, shard_edits) in enumerate(imap(_extract_shard, shards)):
+            stats = worker_stats[pid]
+            stats[0] += row_n
+            stats[1] += byte_n
+            stats[2] += seconds
+            edits.extend(shard_edits)
+            if progress:
+                sys.stdout.write('\r%d/%d shards' % (i + 1, len(shards)))
+                sys.stdout.flush()
+        if progress:
+            sys.stdout.write('\n')
+    finally:
+        pool.close()
+        pool.join()
+    if not progress:
+        return edits
+    for pid, (row_n, byte_n, seconds) in sorted(worker_stats.items()):
+        print('Worker %d: %d rows, %.1f MB in %.1f s, %.1f rows/s' % (
+            pid, row_n, byte_n / 1024. / 1024, seconds, row_n / seconds if seconds else 0.))
+    return edits
+
+
+def iter_edits(edit_file, substitutions=None, tokenize_func=default_tokenize_func, **kwargs):
+    """
+    Streaming version of ``extract_edits``.
+
+    :param kwargs: ``chunk_size``, ``position``, ``store`` and ``progress`` of ``EditStream``
+    :rtype: EditStream
+    """
+    return EditStream(edit_file, functools.partial(_rows_edits, substitutions=substitutions,
+                                                   tokenize_func=tokenize_func), **kwargs)
+
+
+def iter_filtered(edit_file, filter_func, tokenize_func=default_tokenize_func, **kwargs):
+    """
+    Streaming version of ``extract_filtered``.
+
+    :param kwargs: ``chunk_size``, ``position``, ``store`` and ``progress`` of ``EditStream``
+    :rtype: EditStream
+    """
+    return EditStream(edit_file, functools.partial(_rows_filtered, filter_func=filter_func,
+                                                   tokenize_func=tokenize_func), **kwargs)
+
+
+def _extract(edit_file, row_func, processes, ordered, progress):
+    if processes > 1:
+        edits = _extract_parallel(edit_file, row_func, processes, ordered, progress=progress)
+    else:
+        edits = list(EditStream(edit_file, row_func, store=EditStore(), progress=progress))
+    if progress:
+        print('Total edits extracted: %d' % len(edits))
     return edits
+
+
+def extract_edits(edit_file, substitutions=None, tokenize_func=default_tokenize_func, processes=1, ordered=True,
+                  progress=True):
+    """
+    Extracts contexts for all n-grams that were changed between two text versions.
+    Uses most sequence matcher from difflib, which takes most longest subsequence.
+
+    If ``substitutions'' argument is supplied, extract all n-gram matching substitutions,
+    even if they were not changed.
+
+    :param processes: number of worker processes, that read byte ranges of the file
+    :param ordered: with several processes, keep the order of the file
+    :param progress: print progress, the throughput of every worker and the number of edits
+    :returns: list of Edit objects
+    """
+    return _extract(edit_file, functools.partial(_rows_edits, substitutions=substitutions, tokenize_func=tokenize_func),
+                    processes, ordered, progress)
+
+
+def extract_filtered(edit_file, filter_func, tokenize_func=default_tokenize_func, processes=1, ordered=True,
+                     progress=True):
+    """
+    Extracts contexts for all words from edit_file that satisfy conditions in ``filter_func``.
+    Only second text version is used.
+    :param processes: number of worker processes, see ``extract_edits``
+    :param ordered: with several processes, keep the order of the file
+    :param progress: print progress, the throughput of every worker and the number of edits
+    :returns: list of Edit objects
+    """
+    return _extract(edit_file, functools.partial(_rows_filtered, filter_func=filter_func, tokenize_func=tokenize_func),
+                    processes, ordered, progress)
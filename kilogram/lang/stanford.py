@@ -0,0 +1,202 @@
+"""Socket client of the Stanford POS tagger and NER servers"""
+import itertools
+import os
+import select
+import socket
+import threading
+import time
+import Queue
+from collections import deque
+
+
+class StanfordClient(object):
+    """
+    Client of Stanford servers, such as ``MaxentTaggerServer`` and ``NERServer``, on one or more hosts.
+
+    The stock servers answer one request per connection and close it, so the sentences of a call
+    are sent on up to ``pool_size`` connections at a time, and every answer ends with its connection.
+    With ``persistent`` set, the server is expected to answer every line with one line and keep the
+    connection open: up to ``batch_size`` sentences are sent as one request of newline-delimited
+    lines, and idle connections are kept for the next calls.
+
+    Failed connections are retried on the next host, waiting ``min_backoff`` seconds, twice as long
+    after every failure up to ``max_backoff``, until ``deadline`` seconds after the call started.
+    """
+
+    def __init__(self, hosts, pool_size=4, persistent=False, batch_size=64, timeout=30, deadline=60,
+                 min_backoff=0.05, max_backoff=2, buffer_size=65536):
+        """
+        :param hosts: list of (host, port)
+        :param pool_size: maximum number of connections of a call, and of idle persistent connections
+        :param timeout: socket timeout in seconds
+        :param deadline: time in seconds after which a call fails
+        :param buffer_size: size of the receive buffer of every thread
+        """
+        self.hosts = list(hosts)
+        self.pool_size = pool_size
+        self.persistent = persistent
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.deadline = deadline
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.buffer_size = buffer_size
+        self._next_host = itertools.count()
+        self._idle = Queue.LifoQueue()
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    @property
+    def _buffer(self):
+        buf = getattr(self._local, 'buffer', None)
+        if buf is None:
+            buf = self._local.buffer = bytearray(self.buffer_size)
+        return buf
+
+    def _wait(self, attempt, deadline, error):
+        """Sleeps before the next attempt, raises ``error`` if it would end after the deadline"""
+        delay = min(self.min_backoff * 2 ** attempt, self.max_backoff)
+        if time.time() + delay > deadline:
+            raise error
+        time.sleep(delay)
+
+    def _timeout(self, deadline):
+        """:returns: socket timeout of the next operation, bounded by the deadline"""
+        timeout = min(self.timeout, deadline - time.time())
+        if timeout <= 0:
+            raise socket.timeout('deadline of the Stanford request passed')
+        return timeout
+
+    def _connect(self, deadline):
+        attempt = 0
+        while True:
+            host = self.hosts[next(self._next_host) % len(self.hosts)]
+            try:
+                return socket.create_connection(host, self._timeout(deadline))
+            except socket.error as e:
+                self._wait(attempt, deadline, e)
+                attempt += 1
+
+    def _recv(self, sock, response):
+        """
+        Appends the next received bytes to ``response``.
+        :returns: number of bytes received, 0 if the connection was closed
+        """
+        buf = self._buffer
+        n = sock.recv_into(buf)
+        response[len(response):] = memoryview(buf)[:n]
+        return n
+
+    def request(self, content):
+        """
+        :type content: unicode
+        :returns: answer of the server as a UTF-8 string
+        """
+        return self.request_many([content])[0]
+
+    def request_many(self, contents):
+        """
+        :type contents: list
+        :returns: list of answers of the server as UTF-8 strings, in the order of ``contents``
+        """
+        if self._pid != os.getpid():
+            # sockets inherited by a forked process are shared with the parent
+            self._idle = Queue.LifoQueue()
+            self._pid = os.getpid()
+        contents = [content.encode('utf-8') for content in contents]
+        deadline = time.time() + self.deadline
+        if self.persistent:
+            results = []
+            for i in range(0, len(contents), self.batch_size):
+                results.extend(self._request_batch(contents[i:i+self.batch_size], deadline))
+            return results
+        return self._request_single(contents, deadline)
+
+    def _request_single(self, contents, deadline):
+        """One request per connection, answers end with the connection"""
+        results = [None] * len(contents)
+        attempts = [0] * len(contents)
+        pending = deque(range(len(contents)))
+        # socket -> (index of the content, received answer)
+        active = {}
+
+        def failed(sock, i, error):
+            sock.close()
+            active.pop(sock, None)
+            self._wait(attempts[i], deadline, error)
+            attempts[i] += 1
+            pending.appendleft(i)
+
+        try:
+            while pending or active:
+                while pending and len(active) < self.pool_size:
+                    i = pending.popleft()
+                    sock = self._connect(deadline)
+                    try:
+                        sock.sendall(contents[i])
+                        sock.shutdown(socket.SHUT_WR)
+                    except socket.error as e:
+                        failed(sock, i, e)
+                        continue
+                    active[sock] = (i, bytearray())
+                timeout = min(self.timeout, deadline - time.time())
+                readable = select.select(list(active), [], [], max(timeout, 0))[0] if active else []
+                if active and not readable:
+                    raise socket.timeout('no answer from the Stanford server')
+                for sock in readable:
+                    i, response = active[sock]
+                    try:
+                        if self._recv(sock, response):
+                            continue
+                    except socket.error as e:
+                        failed(sock, i, e)
+                        continue
+                    results[i] = str(response)
+                    sock.close()
+                    del active[sock]
+        finally:
+            for sock in active:
+                sock.close()
+        return results
+
+    def _request_batch(self, contents, deadline):
+        """Newline-delimited sentences on a persistent connection, one answer line per sentence"""
+        request = ''.join(content.replace('\n', ' ') + '\n' for content in contents)
+        attempt = 0
+        while True:
+            try:
+                sock = self._idle.get_nowait()
+            except Queue.Empty:
+                sock = self._connect(deadline)
+            response = bytearray()
+            try:
+                # idle connections keep the timeout of the call that created them
+                sock.settimeout(self._timeout(deadline))
+                sock.sendall(request)
+                line_n = 0
+                while line_n < len(contents):
+                    # a batch that times out is sent again only before the deadline, see _wait
+                    sock.settimeout(self._timeout(deadline))
+                    start = len(response)
+                    if not self._recv(sock, response):
+                        raise socket.error('connection closed by the Stanford server')
+                    line_n += response.count('\n', start)
+            except socket.error as e:
+                sock.close()
+                # idle connections may have been closed by the server in the meantime
+                self._wait(attempt, deadline, e)
+                attempt += 1
+                continue
+            if self._idle.qsize() < self.pool_size:
+                self._idle.put(sock)
+            else:
+                sock.close()
+            return str(response).split('\n')[:len(contents)]
+
+    def close(self):
+        """Closes all idle connections"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Queue.Empty:
+                break
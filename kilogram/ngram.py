@@ -2,6 +2,7 @@ from nltk import FreqDist, BigramCollocationFinder, TrigramCollocationFinder
 from nltk.collocations import TrigramAssocMeasures as trigram_measures
 from nltk.collocations import BigramAssocMeasures as bigram_measures
 from .ngram_service import NgramService, SUBSTITUTION_TOKEN
+from .association import AssociationCache, is_supported, rank_substitutions
 
 
 class Ngram(object):
@@ -14,13 +15,52 @@ class Ngram(object):
         otherwise available counts for all substitutions
         :rtype: list
         """
+        return Ngram._array_freq_dist(ngrams, NgramService.get_freq_arrays(ngrams))
+
+    @staticmethod
+    def _freq_dist(freqs):
+        """
+        :param freqs: list of count dicts returned by ``get_freq``
+        :rtype: FreqDist
+        """
         result = {}
-        for ngram in ngrams:
-            result.update(NgramService.get_freq(ngram))
+        for freq in freqs:
+            result.update(freq)
+        return FreqDist(result)
+
+    @staticmethod
+    def _array_freq_dist(ngrams, freqs):
+        """
+        :param freqs: counts returned by ``get_freq_arrays`` for ``ngrams``
+        :rtype: FreqDist
+        """
+        substitutions = NgramService.get_substitutions()
+        result = {}
+        for ngram, freq in zip(ngrams, freqs):
+            split_ngram = ngram.split()
+            if isinstance(freq, (int, long)):
+                result[ngram if len(split_ngram) == 1 else tuple(split_ngram)] = freq
+            elif len(split_ngram) == 1:
+                result.update(zip(substitutions, freq.tolist()))
+            else:
+                sub_index = split_ngram.index(SUBSTITUTION_TOKEN)
+                for subst, count in zip(substitutions, freq.tolist()):
+                    split_ngram[sub_index] = subst
+                    result[tuple(split_ngram)] = count
         return FreqDist(result)
 
 
 class EditNgram(Ngram):
+    # shared by all instances, None to compute every n-gram again
+    association_cache = AssociationCache()
+
+    @classmethod
+    def set_association_cache(cls, cache):
+        """
+        :type cache: kilogram.association.AssociationCache
+        """
+        cls.association_cache = cache
+
     def __init__(self, ngram, edit_pos):
         """
         :param edit_pos: position of substitution in an n-gram
@@ -59,9 +99,33 @@ class EditNgram(Ngram):
         return ngram
 
     def association(self, measure='pmi'):
+        """
+        :returns: dict of substitution -> (rank, score) for the substitutions that occur in the n-gram
+        """
         if measure in self._association_dict:
                 return self._association_dict[measure]
+        cache = EditNgram.association_cache
+        if cache is not None:
+            found, collocs = cache.get(self.subst_ngram, self.edit_pos, measure)
+            if found:
+                self._association_dict[measure] = collocs
+                return collocs
+        if not is_supported(len(self.ngram), measure):
+            collocs = self._nltk_association(measure)
+        else:
+            try:
+                collocs = rank_substitutions(self.subst_ngram, *self._get_freq_arrays(), measure=measure)
+            except Exception as e:
+                print('Exception in pmi_preps', e)
+                print(self)
+                collocs = {}
+        self._association_dict[measure] = collocs
+        if cache is not None:
+            cache.put(self.subst_ngram, self.edit_pos, measure, collocs)
+        return collocs
 
+    def _nltk_association(self, measure):
+        """Same as ``association`` with the NLTK collocation finders, for all NLTK measures"""
         ngrams = [self.ngram]
         collocs = {}
 
@@ -89,20 +153,49 @@ class EditNgram(Ngram):
                 return collocs
         return collocs
 
-    def _get_freq_distributions(self):
+    def _freq_ngrams(self):
+        """
+        :returns: n-grams to count for association measures: words, whole n-gram and,
+        for trigrams, the wild-card and the two bigrams
+        """
         subst_ngram = self.subst_ngram
-        word_fd = self.ngram_freq(subst_ngram)
-        whole_fd = self.ngram_freq([' '.join(subst_ngram)])
         n = len(self.ngram)
+        if n not in (2, 3):
+            raise NotImplementedError
+        ngrams = list(subst_ngram) + [' '.join(subst_ngram)]
+        if n == 3:
+            # need to add wild-card and bigram distributions
+            ngrams.extend([subst_ngram[0] + u' ' + subst_ngram[2],
+                           u' '.join(subst_ngram[:2]), u' '.join(subst_ngram[1:])])
+        return ngrams
+
+    def _get_freq_arrays(self):
+        """
+        Fetches all counts in a single batch, unless the association cache has them.
+        :returns: (n-grams of ``_freq_ngrams``, aligned ``get_freq_arrays`` counts)
+        """
+        cache = EditNgram.association_cache
+        if cache is not None:
+            found, ngrams_freqs = cache.get_arrays(self.subst_ngram, self.edit_pos)
+            if found:
+                return ngrams_freqs
+        ngrams = self._freq_ngrams()
+        ngrams_freqs = ngrams, NgramService.get_freq_arrays(ngrams)
+        if cache is not None:
+            cache.put_arrays(self.subst_ngram, self.edit_pos, ngrams_freqs)
+        return ngrams_freqs
+
+    def _get_freq_distributions(self):
+        ngrams, freqs = self._get_freq_arrays()
+        n = len(self.ngram)
+        word_fd = self._array_freq_dist(ngrams[:n], freqs[:n])
+        whole_fd = self._array_freq_dist(ngrams[n:n+1], freqs[n:n+1])
         if n == 2:
             dist = (word_fd, whole_fd)
-        elif n == 3:
-            # need to add wild-card and bigram distributions
-            wildfd = self.ngram_freq([subst_ngram[0] + u' ' + subst_ngram[2]])
-            bfd = self.ngram_freq([u' '.join(subst_ngram[:2]), u' '.join(subst_ngram[1:])])
-            dist = (word_fd, bfd, wildfd, whole_fd)
         else:
-            raise NotImplementedError
+            wildfd = self._array_freq_dist(ngrams[n+1:n+2], freqs[n+1:n+2])
+            bfd = self._array_freq_dist(ngrams[n+2:], freqs[n+2:])
+            dist = (word_fd, bfd, wildfd, whole_fd)
         return dist
 
     def get_single_feature(self, correction):
@@ -1,13 +1,25 @@
 # coding=utf-8
 from __future__ import division
+import functools
+import os
+import threading
 import time
+from collections import defaultdict
 
-from thrift.transport import TSocket
-from thrift.protocol import TBinaryProtocol
-from thrift.transport import TTransport
-from .hbase import Hbase
+import numpy as np
+
+from .storage import HBaseBackend, MultiGatewayBackend, RecordingBackend, ReplayBackend, BloomFilter, \
+    SingleFlight, packing, save_warm_start, load_warm_start
+from .storage.metrics import TABLE, GETTER, DECODE
 
 SUBSTITUTION_TOKEN = 'SUB'
+# environment variables with default recording and replay files of NgramService.configure
+RECORD_ENV = 'KILOGRAM_RECORD'
+REPLAY_ENV = 'KILOGRAM_REPLAY'
+# seconds of latency added to every replayed lookup
+REPLAY_LATENCY_ENV = 'KILOGRAM_REPLAY_LATENCY'
+# environment variable with the default warm start file of NgramService.configure
+WARM_START_ENV = 'KILOGRAM_WARM_START'
 
 
 class ListPacker(object):
@@ -20,23 +32,97 @@ class ListPacker(object):
         """
         return ' '.join([x[0]+','+str(x[1]) for x in list_counts])
 
+    @classmethod
+    def pack_binary(cls, list_counts):
+        """
+        Binary alternative to ``pack``, counts must be integers.
+        :type list_counts: list of tuples (str, int)
+        :return: str
+        """
+        return packing.pack_binary(list_counts)
+
+    @classmethod
+    def pack_armored(cls, list_counts):
+        """
+        Binary encoding safe to write into TSV files, such as Spark job output.
+        :type list_counts: list of tuples (str, int)
+        :return: str
+        """
+        return packing.armor(packing.pack_binary(list_counts))
+
     @classmethod
     def unpack(cls, list_counts_str):
         """
+        Reads all formats produced by ``pack``, ``pack_binary`` and ``pack_armored``.
         :return: list of tuples
         """
         if list_counts_str:
+            list_counts_str = packing.dearmor(list_counts_str)
+            if packing.is_binary(list_counts_str):
+                return zip(*packing.unpack_binary(list_counts_str))
             return [y for y in (x.rsplit(',', 1) for x in list_counts_str.split()) if len(y) == 2]
         else:
             return []
 
+    @classmethod
+    def unpack_top(cls, list_counts_str, k=None, mass=None):
+        """
+        Unpacks the largest counts only, binary lists are stored sorted and stop
+        decoding early.
+        :param k: maximum number of entries, None for no limit
+        :param mass: fraction of the total count to cover, None for no limit
+        :return: list of tuples (str, long) ordered by count descending
+        """
+        if list_counts_str:
+            list_counts_str = packing.dearmor(list_counts_str)
+            if packing.is_binary(list_counts_str):
+                return packing.unpack_top(list_counts_str, k, mass)
+        counts = sorted([(x[0], long(x[1])) for x in cls.unpack(list_counts_str)],
+                        key=lambda x: x[1], reverse=True)
+        size = packing.top_size([x[1] for x in counts], sum(x[1] for x in counts), k, mass)
+        return counts[:size]
+
+    @classmethod
+    def unpack_arrays(cls, list_counts_str):
+        """
+        :return: (keys, counts) parallel arrays
+        """
+        if list_counts_str:
+            list_counts_str = packing.dearmor(list_counts_str)
+            if packing.is_binary(list_counts_str):
+                return packing.unpack_binary(list_counts_str)
+        counts = cls.unpack(list_counts_str)
+        return [x[0] for x in counts], [long(x[1]) for x in counts]
+
+
+def _instrumented(getter):
+    """Records calls and latency of a getter when metrics are enabled"""
+    @functools.wraps(getter)
+    def wrapper(cls, *args, **kwargs):
+        if cls.h_metrics is None:
+            return getter(cls, *args, **kwargs)
+        with cls.h_metrics.timed(GETTER, getter.__name__):
+            return getter(cls, *args, **kwargs)
+    return wrapper
+
 
 class NgramService(object):
-    h_rate = None
-    h_start = None
-    h_client = None
+    h_metrics = None
+    h_backend = None
+    # number of concurrent HBase connections, None for other backends
+    h_pool_size = None
+    h_cache = None
+    h_bloom_filters = None
+    h_bloom_checked = None
+    h_bloom_avoided = None
+    # guards bloom filter counters, incremented by lookups of pool threads
+    h_bloom_lock = threading.Lock()
+    h_flights = None
+    h_warm_start = None
     substitutions = None
     substitution_counts = None
+    substitution_index = None
+    substitution_array = None
     subst_table = None
     ngram_table = None
     wiki_anchors_table = None
@@ -55,7 +141,33 @@ class NgramService(object):
                   wiki_anchors_table="wiki_anchors", wiki_urls_table="wiki_urls",
                   wiki_edges_table="wiki_edges", wiki_pagelinks_title_table="TL",
                   wiki_link_mention_cooccur="CC", wiki_link_cooccur_table="LL",
-                  hbase_host=None):
+                  hbase_host=None, pool_size=8, timeout=None, cache=None, backend=None,
+                  bloom_filters=None, coalesce=True, metrics=None, hedge_percentile=None,
+                  record_path=None, replay_path=None, warm_start_path=None):
+        """
+        :param hbase_host: (host, port) of the HBase Thrift gateway, or a list of them to spread
+        lookups over several gateways with failover
+        :param pool_size: maximum number of concurrent connections to every gateway
+        :param timeout: socket timeout in seconds
+        :param cache: cache for raw values, None to always query HBase
+        :type cache: LookupCache
+        :param backend: storage to use instead of the HBase gateway
+        :type backend: kilogram.storage.Backend
+        :param bloom_filters: dict of table name -> BloomFilter or path to a saved filter with
+        all row keys of the table, rows missing from the filter are not looked up
+        :param coalesce: whether concurrent lookups of the same row share one backend call
+        :param metrics: collector of latencies and sizes of lookups, None to disable
+        :type metrics: kilogram.storage.Metrics
+        :param hedge_percentile: with several gateways, latency percentile of a gateway after
+        which a lookup is duplicated on another gateway, None to disable
+        :param record_path: file to record all responses to, defaults to $KILOGRAM_RECORD
+        :param replay_path: recorded file to serve all lookups from instead of HBase,
+        defaults to $KILOGRAM_REPLAY, latency is added from $KILOGRAM_REPLAY_LATENCY
+        :param warm_start_path: local file to load substitution counts from instead of HBase,
+        written on the first load, defaults to $KILOGRAM_WARM_START
+
+        Nothing is fetched here, connections are opened and substitution counts loaded on first use.
+        """
         cls.subst_table = subst_table
         cls.ngram_table = ngram_table
         cls.wiki_urls_table = wiki_urls_table
@@ -65,18 +177,171 @@ class NgramService(object):
         cls.wiki_link_mention_cooccur_table = wiki_link_mention_cooccur
         cls.wiki_link_cooccur_table = wiki_link_cooccur_table
 
-        # HBASE
-        cls.h_transport = TTransport.TBufferedTransport(TSocket.TSocket(*hbase_host))
-        protocol = TBinaryProtocol.TBinaryProtocolAccelerated(cls.h_transport)
-        cls.h_client = Hbase.Client(protocol)
-        cls.h_transport.open()
-        cls.h_rate = 0
-        cls.h_start = time.time()
+        if cls.h_backend is not None:
+            cls.h_backend.close()
+        record_path = record_path or os.environ.get(RECORD_ENV)
+        replay_path = replay_path or os.environ.get(REPLAY_ENV)
+        cls.h_pool_size = None
+        if backend is None and replay_path:
+            backend = ReplayBackend(replay_path, latency=float(os.environ.get(REPLAY_LATENCY_ENV, 0)))
+        elif backend is None and isinstance(hbase_host, list):
+            backend = MultiGatewayBackend.from_hosts(hbase_host, pool_size=pool_size, timeout=timeout,
+                                                     hedge_percentile=hedge_percentile)
+            cls.h_pool_size = pool_size * len(hbase_host)
+        elif backend is None:
+            backend = HBaseBackend(hbase_host[0], hbase_host[1], pool_size=pool_size, timeout=timeout)
+            cls.h_pool_size = pool_size
+        if record_path:
+            backend = RecordingBackend(backend, record_path)
+        cls.h_backend = backend
+        cls.h_cache = cache
+        cls.h_bloom_filters = {}
+        for table, bloom in (bloom_filters or {}).items():
+            if not isinstance(bloom, BloomFilter):
+                bloom = BloomFilter.load(bloom)
+            cls.h_bloom_filters[table] = bloom
+        cls.h_bloom_checked = defaultdict(lambda: 0)
+        cls.h_bloom_avoided = defaultdict(lambda: 0)
+        cls.h_flights = SingleFlight() if coalesce else None
+        cls.h_metrics = metrics
+        cls.h_warm_start = warm_start_path or os.environ.get(WARM_START_ENV)
+        cls.substitution_counts = None
+        cls.substitutions = None
+        cls.substitution_index = None
+        cls.substitution_array = None
+
+    @classmethod
+    def get_substitution_counts(cls):
+        """
+        :returns: dict of substitution -> count, loaded on first call
+        """
+        if cls.substitution_counts is None:
+            cls._load_substitutions()
+        return cls.substitution_counts
 
-        cls.substitution_counts = cls.get_freq(SUBSTITUTION_TOKEN)
-        cls.substitutions = sorted(cls.substitution_counts.keys())
+    @classmethod
+    def get_substitutions(cls):
+        """
+        :returns: sorted list of substitutions, loaded on first call
+        """
+        if cls.substitutions is None:
+            cls._load_substitutions()
+        return cls.substitutions
 
     @classmethod
+    def get_substitution_index(cls):
+        """
+        :returns: dict of substitution -> position in the arrays of ``get_freq_arrays``,
+        stable while the service stays configured
+        """
+        if cls.substitution_index is None:
+            cls.substitution_index = dict((subst, i) for i, subst in enumerate(cls.get_substitutions()))
+        return cls.substitution_index
+
+    @classmethod
+    def _load_substitutions(cls):
+        # warm start state is only valid for the table it was fetched from
+        state_name = 'substitution_counts:' + cls.subst_table
+        counts = None
+        if cls.h_warm_start:
+            counts = load_warm_start(cls.h_warm_start).get(state_name)
+        if counts is None:
+            counts = cls.get_freq(SUBSTITUTION_TOKEN)
+            if cls.h_warm_start:
+                state = load_warm_start(cls.h_warm_start)
+                state[state_name] = counts.items()
+                save_warm_start(cls.h_warm_start, state)
+        cls.substitutions = sorted(counts.keys())
+        cls.substitution_counts = counts
+        cls.substitution_index = None
+        cls.substitution_array = None
+
+    @classmethod
+    def cache_stats(cls):
+        """
+        :returns: hit/miss counters of the lookup cache, None if cache is disabled
+        """
+        if cls.h_cache is None:
+            return None
+        return cls.h_cache.stats()
+
+    @classmethod
+    def bloom_stats(cls):
+        """
+        :returns: dict of table name -> number of lookups skipped by its bloom filter
+        """
+        with cls.h_bloom_lock:
+            return dict(cls.h_bloom_avoided)
+
+    @classmethod
+    def coalesce_stats(cls):
+        """
+        :returns: numbers of requested and deduplicated lookups, None if coalescing is disabled
+        """
+        if cls.h_flights is None:
+            return None
+        return cls.h_flights.stats()
+
+    @classmethod
+    def set_metrics(cls, metrics):
+        """
+        Enables or disables instrumentation at runtime.
+        :type metrics: kilogram.storage.Metrics or None
+        """
+        cls.h_metrics = metrics
+
+    @classmethod
+    def metrics_snapshot(cls):
+        """
+        :returns: dict with latencies per table, getter and decoding, if metrics are enabled,
+        and backend, cache, bloom filter and coalescing statistics
+        """
+        res = cls.h_metrics.snapshot() if cls.h_metrics is not None else {}
+        backend_stats = cls.h_backend.stats()
+        if backend_stats is not None:
+            res['backend'] = backend_stats
+        if cls.h_cache is not None:
+            res['cache'] = cls.cache_stats()
+        if cls.h_flights is not None:
+            res['coalesce'] = cls.coalesce_stats()
+        bloom = {}
+        with cls.h_bloom_lock:
+            bloom_counts = [(table, checked, cls.h_bloom_avoided[table])
+                            for table, checked in cls.h_bloom_checked.items()]
+        for table, checked, avoided in bloom_counts:
+            bloom[table] = {'checked': checked, 'avoided': avoided, 'avoided_rate': avoided/checked}
+        if bloom:
+            res['bloom'] = bloom
+        return res
+
+    @classmethod
+    def _may_exist(cls, table, row):
+        bloom = cls.h_bloom_filters.get(table)
+        if bloom is None:
+            return True
+        may_exist = row in bloom
+        with cls.h_bloom_lock:
+            cls.h_bloom_checked[table] += 1
+            if not may_exist:
+                cls.h_bloom_avoided[table] += 1
+        return may_exist
+
+    @classmethod
+    def _record_fetch(cls, table, start, values):
+        if cls.h_metrics is not None:
+            cls.h_metrics.record(TABLE, table, time.time() - start,
+                                 sum(len(value) for value in values if value))
+
+    @classmethod
+    def _decode(cls, getter, func, *args):
+        """Calls ``func`` that decodes raw values of ``getter``, timed if metrics are enabled"""
+        if cls.h_metrics is None:
+            return func(*args)
+        with cls.h_metrics.timed(DECODE, getter):
+            return func(*args)
+
+    @classmethod
+    @_instrumented
     def hbase_count(cls, table, ngram):
         """
         :rtype: int
@@ -89,19 +354,87 @@ class NgramService(object):
         return res
 
     @classmethod
+    @_instrumented
     def hbase_raw(cls, table, ngram, column):
-        from . import DEBUG
-        cls.h_rate += 1
-        time_diff = time.time() - cls.h_start
-        if time_diff > 30 and DEBUG:
-            print("HBase req rate:", cls.h_rate/time_diff, "r/s")
-            cls.h_start = time.time()
-            cls.h_rate = 0
-        try:
-            res = cls.h_client.get(table, ngram.encode('utf-8'), column, None)
-            return res[0].value
-        except (ValueError, IndexError):
+        row = ngram.encode('utf-8')
+        if not cls._may_exist(table, row):
             return None
+        cache = cls.h_cache
+        if cache is not None and cache.is_enabled(table):
+            found, value = cache.get(table, row, column)
+            if found:
+                return value
+            value = cls._fetch(table, row, column)
+            cache.put(table, row, column, value)
+            return value
+        return cls._fetch(table, row, column)
+
+    @classmethod
+    def _fetch(cls, table, row, column):
+        def fetch():
+            start = time.time()
+            try:
+                value = cls.h_backend.get(table, row, column)
+            except:
+                if cls.h_metrics is not None:
+                    cls.h_metrics.record(TABLE, table, time.time() - start, error=True)
+                raise
+            cls._record_fetch(table, start, [value])
+            return value
+        if cls.h_flights is not None:
+            return cls.h_flights.do(table, row, column, fetch)
+        return fetch()
+
+    @classmethod
+    @_instrumented
+    def hbase_raw_many(cls, table, ngrams, column):
+        """
+        Same as ``hbase_raw`` for several rows, fetched with batched backend calls.
+        :type ngrams: list
+        :returns: list of values aligned with ``ngrams``, None for missing rows
+        """
+        rows = {}
+        for ngram in ngrams:
+            rows.setdefault(ngram.encode('utf-8'), None)
+        candidate_rows = [row for row in rows if cls._may_exist(table, row)]
+        cache = cls.h_cache
+        if cache is not None and cache.is_enabled(table):
+            missing = []
+            for row in candidate_rows:
+                found, value = cache.get(table, row, column)
+                if found:
+                    rows[row] = value
+                else:
+                    missing.append(row)
+            fetched = cls._fetch_many(table, missing, column)
+            for row in missing:
+                rows[row] = fetched.get(row)
+                cache.put(table, row, column, rows[row])
+        else:
+            rows.update(cls._fetch_many(table, candidate_rows, column))
+        return [rows[ngram.encode('utf-8')] for ngram in ngrams]
+
+    @classmethod
+    def _fetch_many(cls, table, rows, column):
+        """
+        :returns: dict of found rows and their values
+        """
+        if not rows:
+            return {}
+
+        def fetch_many(rows_):
+            start = time.time()
+            try:
+                values = cls.h_backend.get_many(table, rows_, column)
+            except:
+                if cls.h_metrics is not None:
+                    cls.h_metrics.record(TABLE, table, time.time() - start, error=True)
+                raise
+            cls._record_fetch(table, start, values.values())
+            return values
+        if cls.h_flights is not None:
+            return cls.h_flights.do_many(table, rows, column, fetch_many)
+        return fetch_many(rows)
 
     @staticmethod
     def _tuple(ngram):
@@ -112,8 +445,27 @@ class NgramService(object):
         return tuple([x for x in ngram])
 
     @classmethod
-    def get_freq(cls, ngram):
-        """Get ngram frequency from Google Ngram corpus"""
+    def _freq_request(cls, ngram):
+        """
+        :returns: (table, row) that holds counts for ``ngram``, None if no lookup is needed
+        """
+        split_ngram = ngram.split()
+        split_len = len(split_ngram)
+        if NgramService._is_subst(split_ngram):
+            if split_len == 1:
+                if cls.substitution_counts:
+                    return None
+                return cls.subst_table, SUBSTITUTION_TOKEN
+            if 1 < split_len < 5:
+                return cls.subst_table, ngram
+            raise Exception('%d-grams are not supported yet' % split_len)
+        if not 1 <= split_len <= 3:
+            raise Exception('%d-grams are not supported' % split_len)
+        return cls.ngram_table, ngram
+
+    @classmethod
+    def _freq_response(cls, ngram, value):
+        """Builds ``get_freq`` result from a raw value fetched for ``_freq_request``"""
         split_ngram = ngram.split()
         split_len = len(split_ngram)
         if NgramService._is_subst(split_ngram):
@@ -122,42 +474,123 @@ class NgramService(object):
                 if cls.substitution_counts:
                     return cls.substitution_counts
                 else:
-                    counts = ListPacker.unpack(NgramService.hbase_raw(cls.subst_table, SUBSTITUTION_TOKEN, "ngram:value"))
+                    counts = ListPacker.unpack(value)
                     return dict((word, long(count)) for word, count in counts)
-            if 1 < split_len < 5:
-                counts = dict(ListPacker.unpack(NgramService.hbase_raw(cls.subst_table, ngram, "ngram:value")))
-            else:
-                raise Exception('%d-grams are not supported yet' % split_len)
+            counts = dict(ListPacker.unpack(value))
             res = {}
-            for subst in cls.substitutions:
+            for subst in cls.get_substitutions():
                 cur_ngram = split_ngram[:]
                 cur_ngram[sub_index] = subst
                 res[cls._tuple(cur_ngram)] = long(counts.get(subst, 0))
         else:
-            count = cls.hbase_count(cls.ngram_table, ngram)
+            count = 0 if value is None else long(value)
             if split_len == 1:
                 res = {ngram: count}
-            elif 2 <= split_len <= 3:
-                res = {cls._tuple(split_ngram): count}
             else:
-                raise Exception('%d-grams are not supported' % split_len)
+                res = {cls._tuple(split_ngram): count}
         return res
 
     @classmethod
+    @_instrumented
+    def get_freq(cls, ngram):
+        """Get ngram frequency from Google Ngram corpus"""
+        request = cls._freq_request(ngram)
+        value = None
+        if request is not None:
+            value = NgramService.hbase_raw(request[0], request[1], "ngram:value")
+        return cls._decode('get_freq', cls._freq_response, ngram, value)
+
+    @classmethod
+    @_instrumented
+    def get_freq_many(cls, ngrams):
+        """
+        Same as ``get_freq`` for several n-grams, fetches all counts with one batch per table.
+        :type ngrams: list
+        :returns: list of dicts aligned with ``ngrams``
+        """
+        requests, values = cls._fetch_freq_values(ngrams)
+        return cls._decode('get_freq_many', lambda: [cls._freq_response(ngram, values.get(request))
+                                                     for ngram, request in zip(ngrams, requests)])
+
+    @classmethod
+    @_instrumented
+    def get_freq_arrays(cls, ngrams):
+        """
+        Same as ``get_freq_many`` without building a dict per substituted n-gram.
+        :type ngrams: list
+        :returns: list aligned with ``ngrams`` of numpy int64 arrays of counts by
+        ``get_substitution_index`` for substituted n-grams, long counts for the other n-grams.
+        The array of the "SUB" unigram is shared by all calls and read-only.
+        """
+        requests, values = cls._fetch_freq_values(ngrams)
+        return cls._decode('get_freq_arrays', lambda: [cls._freq_array_response(ngram, values.get(request))
+                                                       for ngram, request in zip(ngrams, requests)])
+
+    @classmethod
+    def _fetch_freq_values(cls, ngrams):
+        """
+        :returns: (list of ``_freq_request`` of every n-gram, dict of request -> raw value)
+        """
+        requests = [cls._freq_request(ngram) for ngram in ngrams]
+        table_rows = {}
+        for request in requests:
+            if request is not None:
+                table_rows.setdefault(request[0], set()).add(request[1])
+        values = {}
+        for table, rows in table_rows.items():
+            rows = list(rows)
+            values.update(((table, row), value) for row, value in
+                          zip(rows, NgramService.hbase_raw_many(table, rows, "ngram:value")))
+        return requests, values
+
+    @classmethod
+    def _substitution_array(cls, keys, counts):
+        """
+        :returns: int64 array of ``counts`` placed by ``get_substitution_index``, keys that are not
+        substitutions are dropped
+        """
+        index = cls.get_substitution_index()
+        res = np.zeros(len(index), dtype=np.int64)
+        if len(keys):
+            positions = np.fromiter((index.get(key, -1) for key in keys), dtype=np.intp, count=len(keys))
+            counts = np.asarray(counts, dtype=np.int64)
+            known = positions >= 0
+            res[positions[known]] = counts[known]
+        return res
+
+    @classmethod
+    def _freq_array_response(cls, ngram, value):
+        """Builds ``get_freq_arrays`` result from a raw value fetched for ``_freq_request``"""
+        split_ngram = ngram.split()
+        if NgramService._is_subst(split_ngram):
+            if len(split_ngram) == 1:
+                if cls.substitution_array is None:
+                    counts = cls.get_substitution_counts()
+                    substitution_array = cls._substitution_array(counts.keys(), counts.values())
+                    # shared by all results, a caller must not change it for the others
+                    substitution_array.flags.writeable = False
+                    cls.substitution_array = substitution_array
+                return cls.substitution_array
+            return cls._substitution_array(*ListPacker.unpack_arrays(value))
+        return 0 if value is None else long(value)
+
+    @classmethod
+    @_instrumented
     def get_uri_counts(cls, uri):
-        return cls._get_counts(uri, cls.wiki_urls_table)
+        return cls._get_counts(uri, cls.wiki_urls_table, 'get_uri_counts')
 
     @classmethod
+    @_instrumented
     def get_anchor_counts(cls, uri):
-        return cls._get_counts(uri, cls.wiki_anchors_table)
+        return cls._get_counts(uri, cls.wiki_anchors_table, 'get_anchor_counts')
 
     @classmethod
-    def _get_counts(cls, key, table):
-        counts = ListPacker.unpack(
-            NgramService.hbase_raw(table, key.decode('utf-8'), "ngram:value"))
-        return [long(x[1]) for x in counts]
+    def _get_counts(cls, key, table, getter):
+        value = NgramService.hbase_raw(table, key.decode('utf-8'), "ngram:value")
+        return cls._decode(getter, lambda: [long(x[1]) for x in ListPacker.unpack(value)])
 
     @classmethod
+    @_instrumented
     def get_wiki_prob(cls, phrase):
         """Get wiki probability of a phrase"""
         anchor_counts = cls.get_anchor_counts(phrase)
@@ -170,25 +603,60 @@ class NgramService(object):
         return anchor_count/wiki_counts
 
     @classmethod
+    def _get_dict(cls, table, key, getter):
+        """
+        :returns: unpacked dict of ``key``
+        """
+        value = NgramService.hbase_raw(table, key, "ngram:value")
+        return cls._decode(getter, lambda: dict(ListPacker.unpack(value)))
+
+    @classmethod
+    def _get_dicts_many(cls, table, keys, getter):
+        """
+        :returns: list of unpacked dicts aligned with ``keys``
+        """
+        values = NgramService.hbase_raw_many(table, keys, "ngram:value")
+        return cls._decode(getter, lambda: [dict(ListPacker.unpack(value)) for value in values])
+
+    @classmethod
+    @_instrumented
     def get_wiki_edge_weights(cls, uri):
-        res = dict(ListPacker.unpack(NgramService.hbase_raw(cls.wiki_edges_table, uri,
-                                                            "ngram:value")))
-        return res
+        return cls._get_dict(cls.wiki_edges_table, uri, 'get_wiki_edge_weights')
+
+    @classmethod
+    @_instrumented
+    def get_wiki_edge_weights_many(cls, uris):
+        return cls._get_dicts_many(cls.wiki_edges_table, uris, 'get_wiki_edge_weights_many')
 
     @classmethod
+    @_instrumented
     def get_wiki_title_pagelinks(cls, uri):
-        res = dict(ListPacker.unpack(NgramService.hbase_raw(cls.wiki_pagelinks_title_table, uri,
-                                                            "ngram:value")))
-        return res
+        return cls._get_dict(cls.wiki_pagelinks_title_table, uri, 'get_wiki_title_pagelinks')
 
     @classmethod
+    @_instrumented
+    def get_wiki_title_pagelinks_many(cls, uris):
+        return cls._get_dicts_many(cls.wiki_pagelinks_title_table, uris,
+                                   'get_wiki_title_pagelinks_many')
+
+    @classmethod
+    @_instrumented
     def get_wiki_links_cooccur(cls, uri):
-        res = dict(ListPacker.unpack(NgramService.hbase_raw(cls.wiki_link_cooccur_table, uri,
-                                                            "ngram:value")))
-        return res
+        return cls._get_dict(cls.wiki_link_cooccur_table, uri, 'get_wiki_links_cooccur')
+
+    @classmethod
+    @_instrumented
+    def get_wiki_links_cooccur_many(cls, uris):
+        return cls._get_dicts_many(cls.wiki_link_cooccur_table, uris, 'get_wiki_links_cooccur_many')
 
     @classmethod
+    @_instrumented
     def get_wiki_link_mention_cooccur(cls, mention_uri):
-        res = dict(ListPacker.unpack(NgramService.hbase_raw(cls.wiki_link_mention_cooccur_table,
-                                                            mention_uri, "ngram:value")))
-        return res
+        return cls._get_dict(cls.wiki_link_mention_cooccur_table, mention_uri,
+                             'get_wiki_link_mention_cooccur')
+
+    @classmethod
+    @_instrumented
+    def get_wiki_link_mention_cooccur_many(cls, mention_uris):
+        return cls._get_dicts_many(cls.wiki_link_mention_cooccur_table, mention_uris,
+                                   'get_wiki_link_mention_cooccur_many')
@@ -0,0 +1,13 @@
+from .base import Backend, RoutingBackend
+from .hbase import ConnectionPool, HBaseBackend
+from .gateways import MultiGatewayBackend
+from .local import SqliteBackend, load_tsv
+from .sstable import SSTable, SSTableWriter, SSTableBackend, build_sstable
+from .bloom import BloomFilter
+from .cache import LookupCache
+from .shared_cache import SharedCache
+from .singleflight import SingleFlight
+from .metrics import Metrics, CallbackSink, StatsdSink, render_text
+from .replay import RecordingBackend, ReplayBackend
+from .export import export_table
+from .warm_start import save_warm_start, load_warm_start
@@ -0,0 +1,62 @@
+class Backend(object):
+    """Key-value storage that serves raw ``NgramService`` lookups"""
+
+    def get(self, table, row, column):
+        """
+        :type row: str
+        :returns: raw value or None if row is missing
+        """
+        raise NotImplementedError
+
+    def get_many(self, table, rows, column):
+        """
+        :type rows: list
+        :returns: dict of found rows and their values
+        """
+        res = {}
+        for row in rows:
+            value = self.get(table, row, column)
+            if value is not None:
+                res[row] = value
+        return res
+
+    def stats(self):
+        """
+        :returns: dict of backend-specific counters, None if the backend has none
+        """
+        return None
+
+    def close(self):
+        pass
+
+
+class RoutingBackend(Backend):
+    """Dispatches lookups to different backends by table"""
+
+    def __init__(self, routes, default=None):
+        """
+        :param routes: dict of table name -> Backend
+        :param default: backend for all other tables, None to treat them as empty
+        """
+        self.routes = routes
+        self.default = default
+
+    def _backend(self, table):
+        return self.routes.get(table, self.default)
+
+    def get(self, table, row, column):
+        backend = self._backend(table)
+        if backend is None:
+            return None
+        return backend.get(table, row, column)
+
+    def get_many(self, table, rows, column):
+        backend = self._backend(table)
+        if backend is None:
+            return {}
+        return backend.get_many(table, rows, column)
+
+    def close(self):
+        for backend in set(self.routes.values() + [self.default]):
+            if backend is not None:
+                backend.close()
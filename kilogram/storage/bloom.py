@@ -0,0 +1,85 @@
+"""Bloom filter for negative lookups"""
+import hashlib
+import math
+import mmap
+import struct
+
+_HEADER = struct.Struct('<QI')
+
+
+class BloomFilter(object):
+    """
+    Set membership with false positives but no false negatives.
+    Bits can live in any buffer, including an mmap of a larger file.
+    """
+
+    def __init__(self, num_bits, num_hashes, bits=None, offset=0):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        if bits is None:
+            bits = bytearray((num_bits + 7) // 8)
+        self.bits = bits
+        self.offset = offset
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=0.01):
+        """
+        :param capacity: expected number of keys
+        :param error_rate: target false positive rate
+        """
+        capacity = max(capacity, 1)
+        num_bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        num_hashes = max(1, int(round(num_bits / float(capacity) * math.log(2))))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, key):
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        h1, h2 = struct.unpack('<QQ', hashlib.md5(key).digest())
+        for i in xrange(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[self.offset + (pos >> 3)] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        for pos in self._positions(key):
+            byte = self.bits[self.offset + (pos >> 3)]
+            if not isinstance(byte, int):
+                byte = ord(byte)
+            if not byte & (1 << (pos & 7)):
+                return False
+        return True
+
+    def tostring(self):
+        return _HEADER.pack(self.num_bits, self.num_hashes) + str(self.bits)
+
+    @classmethod
+    def fromstring(cls, buf, offset=0):
+        """
+        Reads a filter serialized with ``tostring``, the bits are not copied.
+        """
+        num_bits, num_hashes = _HEADER.unpack_from(buf, offset)
+        return cls(num_bits, num_hashes, buf, offset + _HEADER.size)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.tostring())
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps a filter written by ``save``"""
+        with open(path, 'rb') as f:
+            return cls.fromstring(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_keys(cls, keys, capacity, error_rate=0.01):
+        """
+        :param keys: iterable of keys
+        :param capacity: number of keys
+        """
+        bloom = cls.for_capacity(capacity, error_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom
@@ -0,0 +1,114 @@
+"""In-process cache for raw lookups"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+class LookupCache(object):
+    """
+    LRU cache for raw values keyed by (table, row, column).
+    Missing rows are cached as well, since most lookups for popular keys repeat.
+    """
+
+    def __init__(self, max_entries=100000, max_bytes=None, ttl=None, tables=None):
+        """
+        :param max_entries: maximum number of cached values, None for no limit
+        :param max_bytes: approximate maximum size of cached rows and values, None for no limit
+        :param ttl: time in seconds after which a value expires, None to keep forever
+        :param tables: set of tables to cache, None to cache all tables
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.tables = set(tables) if tables is not None else None
+        self.hits = defaultdict(lambda: 0)
+        self.misses = defaultdict(lambda: 0)
+        self.evictions = 0
+        self._bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_enabled(self, table):
+        return self.tables is None or table in self.tables
+
+    def enable(self, table, enabled=True):
+        if self.tables is None:
+            if enabled:
+                return
+            self.tables = set()
+        if enabled:
+            self.tables.add(table)
+        else:
+            self.tables.discard(table)
+
+    @staticmethod
+    def _size(key, value):
+        return len(key[1]) + (len(value) if value else 0)
+
+    def get(self, table, row, column):
+        """
+        :returns: (found, value)
+        """
+        key = (table, row, column)
+        with self._lock:
+            try:
+                value, expires = self._data.pop(key)
+            except KeyError:
+                self.misses[table] += 1
+                return False, None
+            if expires is not None and expires < time.time():
+                self._bytes -= self._size(key, value)
+                self.misses[table] += 1
+                return False, None
+            # re-insert to mark as recently used
+            self._data[key] = (value, expires)
+            self.hits[table] += 1
+            return True, value
+
+    def put(self, table, row, column, value):
+        key = (table, row, column)
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= self._size(key, old[0])
+            self._data[key] = (value, expires)
+            self._bytes += self._size(key, value)
+            while self._data and (self.max_entries is not None and len(self._data) > self.max_entries
+                                  or self.max_bytes is not None and self._bytes > self.max_bytes):
+                old_key, old = self._data.popitem(last=False)
+                self._bytes -= self._size(old_key, old[0])
+                self.evictions += 1
+
+    def items(self):
+        """
+        :returns: list of ((table, row, column), value) of the entries that have not expired
+        """
+        now = time.time()
+        with self._lock:
+            return [(key, value) for key, (value, expires) in self._data.items()
+                    if expires is None or expires >= now]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """
+        :returns: dict with hit/miss counters, total and per table
+        """
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        tables = {}
+        for table in set(self.hits.keys()) | set(self.misses.keys()):
+            table_total = self.hits[table] + self.misses[table]
+            tables[table] = {'hits': self.hits[table], 'misses': self.misses[table],
+                             'hit_rate': self.hits[table]/float(table_total) if table_total else 0.}
+        return {'hits': hits, 'misses': misses,
+                'hit_rate': hits/float(hits + misses) if hits + misses else 0.,
+                'entries': len(self._data), 'bytes': self._bytes,
+                'evictions': self.evictions, 'tables': tables}
@@ -0,0 +1,32 @@
+"""Variable-length integer encoding shared by the binary formats"""
+
+
+def encode_varint(value):
+    """
+    LEB128 encoding of a non-negative integer.
+    :rtype: str
+    """
+    res = bytearray()
+    while value > 0x7f:
+        res.append((value & 0x7f) | 0x80)
+        value >>= 7
+    res.append(value)
+    return str(res)
+
+
+def decode_varint(buf, pos=0):
+    """
+    :param buf: str, mmap or bytearray
+    :returns: (value, position after the encoded value)
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        if not isinstance(byte, int):
+            byte = ord(byte)
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
@@ -0,0 +1,111 @@
+"""Bulk export of HBase tables into local snapshot files"""
+import os
+import shutil
+import tempfile
+from multiprocessing.pool import ThreadPool
+
+from ..hbase.ttypes import TScan
+from .local import SqliteBackend, load_tsv
+from .packing import armor, is_binary, pack_binary
+from .sstable import build_sstable
+
+FORMATS = ('tsv', 'sqlite', 'sstable')
+
+
+def table_ranges(pool, table):
+    """
+    :type pool: kilogram.storage.ConnectionPool
+    :returns: sorted list of (start row, stop row) of the table regions, '' for open ends
+    """
+    ranges = sorted((region.startKey, region.endKey) for region in pool.call('getTableRegions', table))
+    return ranges or [('', '')]
+
+
+def scan_range(pool, table, column, start_row='', stop_row='', batch_size=1000):
+    """
+    Streams rows of a key range with a server-side scanner.
+    :param batch_size: number of rows fetched per call
+    :returns: iterator of (row, value) in row order
+    """
+    scan = TScan(startRow=start_row or None, stopRow=stop_row or None, columns=[column],
+                 caching=batch_size)
+    with pool.connection() as conn:
+        scanner = conn.client.scannerOpenWithScan(table, scan, None)
+        try:
+            while True:
+                row_results = conn.client.scannerGetList(scanner, batch_size)
+                if not row_results:
+                    break
+                for row_result in row_results:
+                    cell = row_result.columns.get(column)
+                    if cell is not None:
+                        yield row_result.row, cell.value
+        finally:
+            conn.client.scannerClose(scanner)
+
+
+def repack_value(value):
+    """
+    :returns: text (key, count) list converted to the binary packed format, other values unchanged
+    """
+    if not value or is_binary(value) or ',' not in value:
+        return value
+    try:
+        return pack_binary([(key, int(count)) for key, count in (x.rsplit(',', 1) for x in value.split())])
+    except ValueError:
+        return value
+
+
+def _export_range(pool, table, column, start_row, stop_row, filename, batch_size, repack):
+    num_rows = 0
+    with open(filename, 'w') as f:
+        for row, value in scan_range(pool, table, column, start_row, stop_row, batch_size):
+            if repack:
+                value = repack_value(value)
+            if is_binary(value):
+                value = armor(value)
+            f.write(row + '\t' + value + '\n')
+            num_rows += 1
+    return num_rows
+
+
+def export_table(pool, table, out_path, fmt='tsv', column='ngram:value', num_workers=4,
+                 batch_size=1000, repack=False):
+    """
+    Exports a whole table, scanning its regions in parallel.
+    :type pool: kilogram.storage.ConnectionPool
+    :param fmt: 'tsv' writes a directory of sorted part files in the Spark output format,
+    'sqlite' loads the table into a SQLite database, 'sstable' writes an SSTable of a count table
+    :param repack: convert text (key, count) lists to the binary packed format
+    :returns: number of exported rows
+    """
+    if fmt not in FORMATS:
+        raise ValueError('Unknown format %s, expected one of %s' % (fmt, ', '.join(FORMATS)))
+    if fmt == 'tsv':
+        parts_dir = out_path
+        if not os.path.exists(parts_dir):
+            os.makedirs(parts_dir)
+    else:
+        parts_dir = tempfile.mkdtemp()
+    try:
+        ranges = table_ranges(pool, table)
+
+        def export_range(i):
+            start_row, stop_row = ranges[i]
+            return _export_range(pool, table, column, start_row, stop_row,
+                                 os.path.join(parts_dir, 'part-%05d' % i), batch_size, repack)
+        workers = ThreadPool(min(num_workers, len(ranges)))
+        try:
+            num_rows = sum(workers.map(export_range, range(len(ranges))))
+        finally:
+            workers.close()
+        if fmt == 'sqlite':
+            backend = SqliteBackend(out_path)
+            load_tsv(backend, table, [parts_dir], column)
+            backend.close()
+        elif fmt == 'sstable':
+            build_sstable([parts_dir], out_path)
+    finally:
+        if fmt != 'tsv':
+            shutil.rmtree(parts_dir)
+    return num_rows
@@ -0,0 +1,188 @@
+"""Lookups spread over several HBase Thrift gateways"""
+import itertools
+import sys
+import threading
+import time
+import Queue
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+from .base import Backend
+from .hbase import HBaseBackend, TRANSPORT_ERRORS
+
+
+class _Gateway(object):
+    """Backend of one gateway with its recent latencies and health"""
+
+    # number of latencies the hedging deadline is computed from
+    WINDOW = 1000
+    # latencies recorded between updates of the deadline
+    UPDATE_INTERVAL = 50
+    # latencies required before requests are hedged
+    MIN_SAMPLES = 20
+
+    def __init__(self, name, backend):
+        self.name = name
+        self.backend = backend
+        self.calls = 0
+        self.failures = 0
+        self.hedges = 0
+        self.consecutive_failures = 0
+        self.down_until = 0
+        self.latencies = deque(maxlen=self.WINDOW)
+        self.deadline = None
+        self._lock = threading.Lock()
+
+    def is_healthy(self):
+        return self.down_until <= time.time()
+
+    def succeeded(self, seconds, hedge_percentile):
+        with self._lock:
+            self.calls += 1
+            self.consecutive_failures = 0
+            self.latencies.append(seconds)
+            if hedge_percentile is not None and len(self.latencies) >= self.MIN_SAMPLES and \
+                    (self.deadline is None or self.calls % self.UPDATE_INTERVAL == 0):
+                latencies = sorted(self.latencies)
+                self.deadline = latencies[min(int(len(latencies) * hedge_percentile), len(latencies) - 1)]
+
+    def failed(self, failure_threshold, retry_after):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= failure_threshold:
+                self.down_until = time.time() + retry_after
+
+    def hedged(self):
+        with self._lock:
+            self.hedges += 1
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {'calls': self.calls, 'failures': self.failures, 'hedges': self.hedges,
+                'healthy': self.is_healthy(),
+                'p50': latencies[len(latencies) // 2] if latencies else 0.,
+                'hedge_deadline': self.deadline or 0.}
+
+
+class MultiGatewayBackend(Backend):
+    """
+    Spreads lookups round-robin over several gateways of the same HBase cluster.
+    A call that fails with a transport error is retried on the next gateway, and a gateway that
+    fails ``failure_threshold`` times in a row is skipped for ``retry_after`` seconds. Other errors,
+    such as a missing table, are raised right away and do not count against the gateway.
+    With ``hedge_percentile`` set, a call that takes longer than that percentile of the recent
+    latencies of its gateway is duplicated on a second gateway, the first answer wins.
+    """
+
+    def __init__(self, backends, hedge_percentile=None, min_hedge_delay=0.002, failure_threshold=3,
+                 retry_after=30, max_in_flight=64):
+        """
+        :param backends: dict of gateway name -> Backend, such as HBaseBackend
+        :param hedge_percentile: latency percentile between 0 and 1 after which to send a duplicate
+        request, None to disable hedging
+        :param min_hedge_delay: minimum time in seconds to wait before hedging
+        :param max_in_flight: number of threads that run hedged calls
+        """
+        self.gateways = [_Gateway(name, backend) for name, backend in sorted(backends.items())]
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.failure_threshold = failure_threshold
+        self.retry_after = retry_after
+        self._next = itertools.count()
+        self._pool = None
+        if hedge_percentile is not None and len(self.gateways) > 1:
+            self._pool = ThreadPool(max_in_flight)
+
+    @classmethod
+    def from_hosts(cls, hosts, pool_size=8, timeout=None, **kwargs):
+        """
+        :param hosts: list of (host, port) of the gateways
+        """
+        return cls(dict(('%s:%s' % (host, port), HBaseBackend(host, port, pool_size=pool_size, timeout=timeout))
+                        for host, port in hosts), **kwargs)
+
+    def _ordered_gateways(self):
+        """Gateways to try, starting with the next one in turn, unhealthy ones as a last resort"""
+        start = next(self._next) % len(self.gateways)
+        gateways = self.gateways[start:] + self.gateways[:start]
+        return [g for g in gateways if g.is_healthy()] + [g for g in gateways if not g.is_healthy()]
+
+    def _run(self, gateway, method, args):
+        start = time.time()
+        try:
+            value = getattr(gateway.backend, method)(*args)
+        except TRANSPORT_ERRORS:
+            gateway.failed(self.failure_threshold, self.retry_after)
+            raise
+        gateway.succeeded(time.time() - start, self.hedge_percentile)
+        return value
+
+    def _call(self, method, *args):
+        gateways = self._ordered_gateways()
+        if self._pool is None:
+            for i, gateway in enumerate(gateways):
+                try:
+                    return self._run(gateway, method, args)
+                except TRANSPORT_ERRORS:
+                    if i == len(gateways) - 1:
+                        raise
+        return self._call_hedged(gateways, method, args)
+
+    def _call_hedged(self, gateways, method, args):
+        results = Queue.Queue()
+
+        def run(gateway):
+            try:
+                results.put((True, self._run(gateway, method, args)))
+            except Exception:
+                results.put((False, sys.exc_info()))
+
+        remaining = iter(gateways)
+        primary = next(remaining)
+        self._pool.apply_async(run, (primary,))
+        pending = 1
+        deadline = primary.deadline
+        if deadline is not None:
+            deadline = max(deadline, self.min_hedge_delay)
+        while True:
+            try:
+                ok, value = results.get(timeout=deadline)
+            except Queue.Empty:
+                # the call is slow, send a duplicate to the next gateway
+                deadline = None
+                gateway = next(remaining, None)
+                if gateway is not None:
+                    primary.hedged()
+                    self._pool.apply_async(run, (gateway,))
+                    pending += 1
+                continue
+            pending -= 1
+            if ok:
+                return value
+            if not isinstance(value[1], TRANSPORT_ERRORS):
+                # the request itself is wrong, other gateways fail the same way
+                raise value[0], value[1], value[2]
+            gateway = next(remaining, None)
+            if gateway is not None:
+                # fail over to the next gateway
+                self._pool.apply_async(run, (gateway,))
+                pending += 1
+            elif not pending:
+                raise value[0], value[1], value[2]
+
+    def get(self, table, row, column):
+        return self._call('get', table, row, column)
+
+    def get_many(self, table, rows, column):
+        return self._call('get_many', table, rows, column)
+
+    def stats(self):
+        return dict((g.name, g.stats()) for g in self.gateways)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+        for gateway in self.gateways:
+            gateway.backend.close()
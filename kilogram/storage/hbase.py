@@ -0,0 +1,176 @@
+"""HBase Thrift gateway access"""
+import os
+import socket
+import threading
+import time
+import Queue
+from contextlib import contextmanager
+
+from thrift.transport import TSocket
+from thrift.protocol import TBinaryProtocol
+from thrift.transport import TTransport
+from thrift.transport.TTransport import TTransportException
+from ..hbase import Hbase
+from .base import Backend
+
+# maximum number of rows fetched in a single Thrift call
+BATCH_SIZE = 500
+# errors after which a connection can not be reused
+TRANSPORT_ERRORS = (TTransportException, socket.error)
+
+
+class _Connection(object):
+    def __init__(self, host, port, timeout):
+        t_socket = TSocket.TSocket(host, port)
+        if timeout is not None:
+            t_socket.setTimeout(timeout * 1000)
+        self.transport = TTransport.TBufferedTransport(t_socket)
+        self.client = Hbase.Client(TBinaryProtocol.TBinaryProtocolAccelerated(self.transport))
+        self.transport.open()
+        self.last_used = time.time()
+
+    def close(self):
+        try:
+            self.transport.close()
+        except TRANSPORT_ERRORS:
+            pass
+
+
+class ConnectionPool(object):
+    """
+    Bounded pool of Thrift connections to one HBase gateway.
+    Every thread checks out its own connection, so calls from different threads run in parallel.
+    """
+
+    def __init__(self, host, port, size=8, timeout=None, check_interval=30):
+        """
+        :param size: maximum number of open connections
+        :param timeout: socket timeout in seconds, None to block
+        :param check_interval: idle time in seconds after which a connection is checked before use
+        """
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self._idle = Queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def _is_healthy(self, conn):
+        if not conn.transport.isOpen():
+            return False
+        if time.time() - conn.last_used < self.check_interval:
+            return True
+        try:
+            conn.client.getTableNames()
+        except TRANSPORT_ERRORS + (Hbase.IOError,):
+            return False
+        return True
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # sockets inherited by a forked process, such as a multiprocessing worker,
+            # are shared with the parent and can not be used, neither can the slots they hold
+            self._idle = Queue.LifoQueue()
+            self._slots = threading.BoundedSemaphore(self.size)
+            self._local = threading.local()
+            self._pid = os.getpid()
+
+    def _checkout(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except Queue.Empty:
+                    return _Connection(self.host, self.port, self.timeout)
+                if self._is_healthy(conn):
+                    return conn
+                conn.close()
+        except:
+            self._slots.release()
+            raise
+
+    def _checkin(self, conn, broken=False):
+        if broken:
+            conn.close()
+        else:
+            conn.last_used = time.time()
+            self._idle.put(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a connection for the current thread, nested calls reuse the same connection.
+        :rtype: _Connection
+        """
+        self._check_pid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._checkout()
+        self._local.conn = conn
+        broken = False
+        try:
+            yield conn
+        except TRANSPORT_ERRORS:
+            broken = True
+            raise
+        finally:
+            self._local.conn = None
+            self._checkin(conn, broken)
+
+    def call(self, method, *args):
+        """
+        Calls a ``Hbase.Client`` method, reconnects and retries once if the transport fails.
+        """
+        self._check_pid()
+        nested = getattr(self._local, 'conn', None) is not None
+        try:
+            with self.connection() as conn:
+                return getattr(conn.client, method)(*args)
+        except TRANSPORT_ERRORS:
+            if nested:
+                raise
+            with self.connection() as conn:
+                return getattr(conn.client, method)(*args)
+
+    def close(self):
+        """Closes all idle connections"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Queue.Empty:
+                break
+
+
+class HBaseBackend(Backend):
+    """Serves lookups from an HBase Thrift gateway"""
+
+    def __init__(self, host, port, pool_size=8, timeout=None, batch_size=BATCH_SIZE):
+        self.pool = ConnectionPool(host, port, size=pool_size, timeout=timeout)
+        self.batch_size = batch_size
+
+    def get(self, table, row, column):
+        try:
+            res = self.pool.call('get', table, row, column, None)
+            return res[0].value
+        except (ValueError, IndexError):
+            return None
+
+    def get_many(self, table, rows, column):
+        res = {}
+        for i in range(0, len(rows), self.batch_size):
+            for row_result in self.pool.call('getRowsWithColumns', table, rows[i:i+self.batch_size],
+                                             [column], None):
+                cell = row_result.columns.get(column)
+                if cell is not None:
+                    res[row_result.row] = cell.value
+        return res
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,123 @@
+"""Local storage for single-box deployments"""
+import glob
+import os.path
+import sqlite3
+import threading
+
+from .base import Backend
+from .packing import dearmor
+
+# SQLite limits the number of query parameters
+_MAX_VARIABLES = 900
+
+
+class SqliteBackend(Backend):
+    """
+    Serves lookups from a local SQLite database, one SQLite table per HBase table.
+    Reads go through a memory-mapped database file.
+    """
+
+    def __init__(self, db_path, mmap_size=2**30):
+        """
+        :param mmap_size: maximum number of bytes of the database file to memory-map
+        """
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._tables = None
+
+    @property
+    def conn(self):
+        # sqlite connections can not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('PRAGMA mmap_size = %d' % self.mmap_size)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _quote(table):
+        return '"' + table.replace('"', '""') + '"'
+
+    def _has_table(self, table):
+        if self._tables is None:
+            self._tables = set(x[0] for x in self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"))
+        return table in self._tables
+
+    def create_table(self, table):
+        self.conn.execute('CREATE TABLE IF NOT EXISTS %s (row BLOB, col TEXT, value BLOB, '
+                          'PRIMARY KEY (row, col)) WITHOUT ROWID' % self._quote(table))
+        self._tables = None
+
+    def put_many(self, table, items, column):
+        """
+        :param items: iterable of (row, value)
+        """
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO %s VALUES (?, ?, ?)' % self._quote(table),
+                                  ((sqlite3.Binary(row), column, sqlite3.Binary(value))
+                                   for row, value in items))
+
+    def get(self, table, row, column):
+        if not self._has_table(table):
+            return None
+        res = self.conn.execute('SELECT value FROM %s WHERE row = ? AND col = ?' % self._quote(table),
+                                (sqlite3.Binary(row), column)).fetchone()
+        if res is None:
+            return None
+        return str(res[0])
+
+    def get_many(self, table, rows, column):
+        res = {}
+        if not self._has_table(table):
+            return res
+        for i in range(0, len(rows), _MAX_VARIABLES):
+            chunk = rows[i:i+_MAX_VARIABLES]
+            query = 'SELECT row, value FROM %s WHERE col = ? AND row IN (%s)' % \
+                    (self._quote(table), ', '.join('?' * len(chunk)))
+            for row, value in self.conn.execute(query, [column] + [sqlite3.Binary(x) for x in chunk]):
+                res[str(row)] = str(value)
+        return res
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _tsv_files(path):
+    """Expands Spark/Hadoop output directories into part files"""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, 'part-*')))
+    return [path]
+
+
+def read_tsv(paths):
+    """
+    Reads ``label\\tvalue`` lines produced by the Spark jobs.
+    :returns: iterator of (label, value)
+    """
+    for path in paths:
+        for filename in _tsv_files(path):
+            with open(filename) as f:
+                for line in f:
+                    try:
+                        label, value = line.rstrip('\n').split('\t', 1)
+                    except ValueError:
+                        continue
+                    yield label, value
+
+
+def load_tsv(backend, table, paths, column='ngram:value'):
+    """
+    Bulk-loads files in the format uploaded by ``hbase_upload_array.pig``.
+    Armored binary lists are stored decoded.
+    :type backend: SqliteBackend
+    :param paths: list of files or Spark output directories
+    """
+    backend.conn.execute('PRAGMA synchronous = OFF')
+    backend.create_table(table)
+    backend.put_many(table, ((label, dearmor(value)) for label, value in read_tsv(paths)), column)
@@ -0,0 +1,183 @@
+"""Latency and throughput instrumentation of lookups"""
+import math
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# kinds of recorded operations
+TABLE = 'table'
+GETTER = 'getter'
+DECODE = 'decode'
+
+
+class LatencyHistogram(object):
+    """
+    Histogram with logarithmic buckets, percentiles are accurate to about 10%.
+    """
+    MIN_SECONDS = 1e-6
+    # bucket upper bounds grow by this factor
+    GROWTH = 1.2
+
+    def __init__(self):
+        self.buckets = defaultdict(lambda: 0)
+        self.count = 0
+        self.total = 0.
+
+    def _bucket(self, seconds):
+        if seconds <= self.MIN_SECONDS:
+            return 0
+        return int(math.ceil(math.log(seconds / self.MIN_SECONDS, self.GROWTH)))
+
+    def add(self, seconds):
+        self.buckets[self._bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q):
+        """
+        :param q: percentile between 0 and 1
+        :returns: upper bound of the bucket containing the percentile, in seconds
+        """
+        if not self.count:
+            return 0.
+        rank = q * self.count
+        cur = 0
+        for bucket in sorted(self.buckets):
+            cur += self.buckets[bucket]
+            if cur >= rank:
+                return self.MIN_SECONDS * self.GROWTH ** bucket
+        return self.MIN_SECONDS * self.GROWTH ** max(self.buckets)
+
+
+class _Stats(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency = LatencyHistogram()
+
+    def to_dict(self, uptime):
+        return {'calls': self.calls, 'errors': self.errors, 'bytes': self.bytes,
+                'rate': self.calls/uptime if uptime else 0.,
+                'mean': self.latency.total/self.latency.count if self.latency.count else 0.,
+                'p50': self.latency.percentile(0.5), 'p95': self.latency.percentile(0.95),
+                'p99': self.latency.percentile(0.99)}
+
+
+class Metrics(object):
+    """
+    Collects calls, errors, latencies and returned bytes of backend calls per table,
+    of ``NgramService`` getters and of value decoding per getter.
+    Every measurement is also passed to the sinks, callables of
+    ``(kind, name, seconds, num_bytes, error)``.
+    """
+
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+        self.start = time.time()
+        self._stats = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, seconds, num_bytes=0, error=False):
+        """
+        :param kind: one of TABLE, GETTER or DECODE
+        """
+        with self._lock:
+            stats = self._stats[kind].get(name)
+            if stats is None:
+                stats = self._stats[kind][name] = _Stats()
+            stats.calls += 1
+            stats.errors += error
+            stats.bytes += num_bytes
+            stats.latency.add(seconds)
+        for sink in self.sinks:
+            sink(kind, name, seconds, num_bytes, error)
+
+    @contextmanager
+    def timed(self, kind, name):
+        start = time.time()
+        try:
+            yield
+        except:
+            self.record(kind, name, time.time() - start, error=True)
+            raise
+        self.record(kind, name, time.time() - start)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.start = time.time()
+
+    def snapshot(self):
+        """
+        :returns: dict of kind -> name -> counters, latencies in seconds
+        """
+        uptime = time.time() - self.start
+        with self._lock:
+            return dict((kind, dict((name, stats.to_dict(uptime)) for name, stats in names.items()))
+                        for kind, names in self._stats.items())
+
+
+def render_text(snapshot, prefix='kilogram'):
+    """
+    Formats nested stats as ``name{labels} value`` lines, the Prometheus text format.
+    Top-level keys are part of metric names, keys of nested dicts that only hold dicts,
+    such as table names, become the ``name`` label::
+
+        kilogram_table_p99{name="ngrams"} 0.0012
+    """
+    lines = []
+
+    def add(path, labels, value):
+        if isinstance(value, dict):
+            is_named = len(path) > 1 and all(isinstance(x, dict) for x in value.values())
+            for key, sub_value in sorted(value.items()):
+                if is_named:
+                    add(path, labels + [('name', key)], sub_value)
+                else:
+                    add(path + [key], labels, sub_value)
+        elif isinstance(value, (int, long, float)):
+            label_str = ','.join('%s="%s"' % (k, str(v).replace('"', '\\"')) for k, v in labels)
+            # repr of a long ends with L, which is not a valid sample value
+            value_str = repr(float(value)) if isinstance(value, float) else '%d' % value
+            lines.append('%s%s %s' % ('_'.join(path), '{%s}' % label_str if label_str else '', value_str))
+    add([prefix], [], snapshot)
+    return '\n'.join(lines) + '\n'
+
+
+class CallbackSink(object):
+    """Calls a function with every measurement, errors of the function are ignored"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def __call__(self, kind, name, seconds, num_bytes, error):
+        try:
+            self.callback(kind, name, seconds, num_bytes, error)
+        except Exception:
+            pass
+
+
+class StatsdSink(object):
+    """Sends measurements as statsd timers and counters over UDP"""
+
+    def __init__(self, host='localhost', port=8125, prefix='kilogram'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, kind, name, seconds, num_bytes, error):
+        metric = '%s.%s.%s' % (self.prefix, kind, name.replace(':', '_').replace('|', '_'))
+        packet = ['%s.latency:%f|ms' % (metric, seconds * 1000)]
+        if num_bytes:
+            packet.append('%s.bytes:%d|c' % (metric, num_bytes))
+        if error:
+            packet.append('%s.errors:1|c' % metric)
+        try:
+            self._socket.sendto('\n'.join(packet), self.address)
+        except socket.error:
+            # metrics must never break lookups
+            pass
@@ -0,0 +1,171 @@
+"""
+Recording of lookup responses and their deterministic replay, for offline benchmarks.
+
+A recording is a gzip file of ``MAGIC`` followed by entries of
+(varint length + table, varint length + row, varint length + column, 1 byte found flag,
+varint length + value if found).
+"""
+import atexit
+import gzip
+import os.path
+import threading
+import time
+import weakref
+
+from .base import Backend
+from .encoding import encode_varint, decode_varint
+
+MAGIC = 'KGREC\x01'
+# recording backends that are not closed yet, saved by a single exit handler
+_open_recorders = weakref.WeakSet()
+
+
+@atexit.register
+def _save_open_recorders():
+    for recorder in list(_open_recorders):
+        recorder.save()
+
+
+def _encode_str(value):
+    return encode_varint(len(value)) + value
+
+
+def load_recording(path):
+    """
+    :returns: dict of (table, row, column) -> value, None for rows recorded as missing
+    """
+    with gzip.open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('%s is not a lookup recording' % path)
+    responses = {}
+    pos = len(MAGIC)
+    while pos < len(data):
+        key = []
+        for _ in range(3):
+            length, pos = decode_varint(data, pos)
+            key.append(data[pos:pos+length])
+            pos += length
+        found = data[pos] == '\x01'
+        pos += 1
+        value = None
+        if found:
+            length, pos = decode_varint(data, pos)
+            value = data[pos:pos+length]
+            pos += length
+        responses[tuple(key)] = value
+    return responses
+
+
+def save_recording(path, responses):
+    """
+    :param responses: dict of (table, row, column) -> value or None
+    """
+    with gzip.open(path, 'wb') as f:
+        f.write(MAGIC)
+        for (table, row, column), value in sorted(responses.items()):
+            entry = _encode_str(table) + _encode_str(row) + _encode_str(column)
+            if value is None:
+                entry += '\x00'
+            else:
+                entry += '\x01' + _encode_str(value)
+            f.write(entry)
+
+
+class RecordingBackend(Backend):
+    """
+    Passes lookups to another backend and records every response, including missing rows.
+    Responses are saved on ``close`` and at interpreter exit, merged with an existing recording.
+    Backends dropped without ``close`` are not kept alive until exit, nor saved.
+    """
+
+    def __init__(self, backend, path):
+        """
+        :type backend: Backend
+        :param path: recording file
+        """
+        self.backend = backend
+        self.path = path
+        self._responses = {}
+        self._lock = threading.Lock()
+        self._saved = False
+        _open_recorders.add(self)
+
+    def get(self, table, row, column):
+        value = self.backend.get(table, row, column)
+        with self._lock:
+            self._responses[(table, row, column)] = value
+            self._saved = False
+        return value
+
+    def get_many(self, table, rows, column):
+        res = self.backend.get_many(table, rows, column)
+        with self._lock:
+            for row in rows:
+                self._responses[(table, row, column)] = res.get(row)
+            self._saved = False
+        return res
+
+    def save(self):
+        with self._lock:
+            if self._saved:
+                return
+            responses = load_recording(self.path) if os.path.exists(self.path) else {}
+            responses.update(self._responses)
+            save_recording(self.path, responses)
+            self._saved = True
+
+    def stats(self):
+        return self.backend.stats()
+
+    def close(self):
+        self.save()
+        _open_recorders.discard(self)
+        self.backend.close()
+
+
+class ReplayBackend(Backend):
+    """Serves lookups from a recording made by ``RecordingBackend``"""
+
+    def __init__(self, path, latency=0, strict=False):
+        """
+        :param latency: seconds every call is delayed by, or a function returning them,
+        such as ``lambda: random.expovariate(1000)``, to simulate network conditions
+        :param strict: raise KeyError for lookups missing from the recording instead of
+        treating them as missing rows
+        """
+        self.responses = load_recording(path)
+        self.latency = latency
+        self.strict = strict
+        self.unrecorded = 0
+
+    def _delay(self):
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency > 0:
+            time.sleep(latency)
+
+    def _lookup(self, table, row, column):
+        key = (table, row, column)
+        if key not in self.responses:
+            if self.strict:
+                raise KeyError('Lookup was not recorded: %r' % (key,))
+            self.unrecorded += 1
+            return None
+        return self.responses[key]
+
+    def get(self, table, row, column):
+        self._delay()
+        return self._lookup(table, row, column)
+
+    def get_many(self, table, rows, column):
+        # one round trip per batch, as with the Thrift gateway
+        self._delay()
+        res = {}
+        for row in rows:
+            value = self._lookup(table, row, column)
+            if value is not None:
+                res[row] = value
+        return res
+
+    def stats(self):
+        return {'recorded': len(self.responses), 'unrecorded': self.unrecorded}
@@ -0,0 +1,167 @@
+"""Lookup cache shared by the processes of a multiprocessing pool"""
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+class SharedCache(object):
+    """
+    Cache with the same interface as ``LookupCache``, kept in a SQLite file that all forked
+    worker processes read and populate. Hit counters live in shared memory, so the parent
+    process sees the statistics of all workers.
+    Create it in the parent process before starting the pool.
+
+    Every process checks the number of entries after ``max_entries // 10`` puts, at most 1000,
+    and evicts the oldest entries above ``max_entries``, so the bound is approximate.
+    """
+
+    def __init__(self, path=None, tables=None, max_tables=64, max_entries=100000):
+        """
+        :param path: cache file, None for a temporary file in shared memory,
+        removed by ``close``
+        :param tables: set of tables to cache, None to cache all tables
+        :param max_tables: maximum number of tables with hit statistics
+        :param max_entries: maximum number of cached values, None for no limit
+        """
+        self.is_temporary = path is None
+        if path is None:
+            tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+            fd, path = tempfile.mkstemp(suffix='.sqlite', prefix='kilogram-cache-', dir=tmp_dir)
+            os.close(fd)
+        self.path = path
+        self.tables = set(tables) if tables is not None else None
+        self.max_tables = max_tables
+        self.max_entries = max_entries
+        self._evict_interval = max(1, min(1000, max_entries // 10)) if max_entries is not None else None
+        # hits and misses of every table id, and evictions
+        self._counters = multiprocessing.RawArray('L', 2 * max_tables)
+        self._evictions = multiprocessing.RawValue('L', 0)
+        self._counters_lock = multiprocessing.Lock()
+        self._owner_pid = os.getpid()
+        self._reset_process_state()
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS cache (tbl TEXT, row BLOB, col TEXT, value BLOB, '
+                              'added REAL, PRIMARY KEY (tbl, row, col)) WITHOUT ROWID')
+            if 'added' not in [x[1] for x in self.conn.execute('PRAGMA table_info(cache)')]:
+                # cache files of earlier versions
+                self.conn.execute('ALTER TABLE cache ADD COLUMN added REAL DEFAULT 0')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS cache_added ON cache (added)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS tables (name TEXT PRIMARY KEY, id INTEGER)')
+
+    def _reset_process_state(self):
+        # SQLite connections must not be used after a fork: every process opens its own
+        self._local = threading.local()
+        self._table_ids = {}
+        self._puts = 0
+        self._pid = os.getpid()
+
+    @property
+    def conn(self):
+        if self._pid != os.getpid():
+            self._reset_process_state()
+        # connections can not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            self._local.conn = conn
+        return conn
+
+    def is_enabled(self, table):
+        return self.tables is None or table in self.tables
+
+    def enable(self, table, enabled=True):
+        if self.tables is None:
+            if enabled:
+                return
+            self.tables = set()
+        if enabled:
+            self.tables.add(table)
+        else:
+            self.tables.discard(table)
+
+    def _table_id(self, table):
+        table_id = self._table_ids.get(table)
+        if table_id is None:
+            with self.conn:
+                self.conn.execute('INSERT OR IGNORE INTO tables SELECT ?, COUNT(*) FROM tables', (table,))
+            table_id = self._table_ids[table] = self.conn.execute(
+                'SELECT id FROM tables WHERE name = ?', (table,)).fetchone()[0]
+        return table_id
+
+    def _count(self, table, is_hit):
+        table_id = self._table_id(table)
+        if table_id >= self.max_tables:
+            return
+        with self._counters_lock:
+            self._counters[2 * table_id + (0 if is_hit else 1)] += 1
+
+    def get(self, table, row, column):
+        """
+        :returns: (found, value)
+        """
+        res = self.conn.execute('SELECT value FROM cache WHERE tbl = ? AND row = ? AND col = ?',
+                                (table, sqlite3.Binary(row), column)).fetchone()
+        self._count(table, res is not None)
+        if res is None:
+            return False, None
+        return True, str(res[0]) if res[0] is not None else None
+
+    def put(self, table, row, column, value):
+        self.conn.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                          (table, sqlite3.Binary(row), column,
+                           sqlite3.Binary(value) if value is not None else None, time.time()))
+        if self.max_entries is None:
+            return
+        self._puts += 1
+        if self._puts % self._evict_interval == 0:
+            self._evict()
+
+    def _evict(self):
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return
+        with self.conn:
+            cursor = self.conn.execute('DELETE FROM cache WHERE added <= '
+                                       '(SELECT added FROM cache ORDER BY added LIMIT 1 OFFSET ?)', (excess - 1,))
+        with self._counters_lock:
+            self._evictions.value += cursor.rowcount
+
+    def clear(self):
+        self.conn.execute('DELETE FROM cache')
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def stats(self):
+        """
+        :returns: dict with hit/miss counters of all processes, total and per table
+        """
+        tables = {}
+        for table, table_id in self.conn.execute('SELECT name, id FROM tables'):
+            if table_id >= self.max_tables:
+                continue
+            hits, misses = self._counters[2 * table_id], self._counters[2 * table_id + 1]
+            tables[str(table)] = {'hits': hits, 'misses': misses,
+                                  'hit_rate': hits/float(hits + misses) if hits + misses else 0.}
+        hits = sum(x['hits'] for x in tables.values())
+        misses = sum(x['misses'] for x in tables.values())
+        return {'hits': hits, 'misses': misses,
+                'hit_rate': hits/float(hits + misses) if hits + misses else 0.,
+                'entries': len(self), 'evictions': self._evictions.value, 'tables': tables}
+
+    def close(self):
+        if self._pid != os.getpid():
+            self._reset_process_state()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        if self.is_temporary and os.getpid() == self._owner_pid:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
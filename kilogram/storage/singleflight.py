@@ -0,0 +1,110 @@
+"""Coalescing of concurrent identical lookups"""
+import sys
+import threading
+from collections import defaultdict
+
+
+class _Call(object):
+    """Lookup in flight, waiters block on ``done``"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.exc_info = None
+
+    def result(self):
+        self.done.wait()
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.value
+
+
+class SingleFlight(object):
+    """
+    Lets one thread fetch a (table, row, column) while other threads asking for the same
+    key wait for its result instead of sending their own request.
+    """
+
+    def __init__(self):
+        self.requests = defaultdict(lambda: 0)
+        self.deduplicated = defaultdict(lambda: 0)
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, table, rows, column):
+        """
+        :returns: (rows to fetch with their calls, rows already in flight with their calls)
+        """
+        own = []
+        waiting = []
+        with self._lock:
+            for row in rows:
+                key = (table, row, column)
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    own.append((row, call))
+                else:
+                    waiting.append((row, call))
+            self.requests[table] += len(rows)
+            self.deduplicated[table] += len(waiting)
+        return own, waiting
+
+    def _finish(self, table, column, own, values=None, exc_info=None):
+        with self._lock:
+            for row, call in own:
+                del self._calls[(table, row, column)]
+        for row, call in own:
+            if exc_info is not None:
+                call.exc_info = exc_info
+            else:
+                call.value = values.get(row)
+            call.done.set()
+
+    def do(self, table, row, column, fetch):
+        """
+        :param fetch: function without arguments that returns the value of the row
+        """
+        own, waiting = self._join(table, [row], column)
+        if waiting:
+            return waiting[0][1].result()
+        try:
+            value = fetch()
+        except:
+            self._finish(table, column, own, exc_info=sys.exc_info())
+            raise
+        self._finish(table, column, own, {row: value})
+        return value
+
+    def do_many(self, table, rows, column, fetch_many):
+        """
+        :param fetch_many: function of a list of rows that returns a dict of found rows
+        :returns: dict of found rows and their values
+        """
+        own, waiting = self._join(table, rows, column)
+        res = {}
+        if own:
+            # fetch own rows before waiting for others, so that threads never wait on each other
+            try:
+                res = fetch_many([row for row, _ in own])
+            except:
+                self._finish(table, column, own, exc_info=sys.exc_info())
+                raise
+            self._finish(table, column, own, res)
+        for row, call in waiting:
+            value = call.result()
+            if value is not None:
+                res[row] = value
+        return res
+
+    def stats(self):
+        """
+        :returns: dict with numbers of requested and deduplicated lookups, total and per table
+        """
+        requests = sum(self.requests.values())
+        deduplicated = sum(self.deduplicated.values())
+        tables = dict((table, {'requests': self.requests[table], 'deduplicated': self.deduplicated[table]})
+                      for table in self.requests.keys())
+        return {'requests': requests, 'deduplicated': deduplicated,
+                'dedup_rate': deduplicated/float(requests) if requests else 0.,
+                'tables': tables}
@@ -0,0 +1,242 @@
+"""
+Immutable sorted table of n-gram counts, read through mmap.
+
+Layout::
+
+    MAGIC
+    data blocks    entries of (varint shared prefix length, varint suffix length, suffix, varint count),
+                   the first key of every block is stored in full
+    block index    uint64 offset of every block
+    bloom filter   optional, see BloomFilter.tostring
+    footer         index offset, number of blocks, bloom offset, bloom length, number of entries, MAGIC
+"""
+import heapq
+import mmap
+import os.path
+import struct
+
+from .base import Backend
+from .bloom import BloomFilter
+from .encoding import encode_varint, decode_varint
+from .local import _tsv_files
+
+MAGIC = 'KGSST\x01'
+_OFFSET = struct.Struct('<Q')
+_FOOTER = struct.Struct('<QQQQQ')
+
+
+def _common_prefix(key1, key2):
+    i = 0
+    max_i = min(len(key1), len(key2))
+    while i < max_i and key1[i] == key2[i]:
+        i += 1
+    return i
+
+
+class SSTableWriter(object):
+    """Writes keys in ascending byte order"""
+
+    def __init__(self, path, block_size=256, bloom_capacity=None, bloom_error_rate=0.01):
+        """
+        :param block_size: approximate size of a data block in bytes,
+        small blocks keep the linear scan after the binary search short
+        :param bloom_capacity: expected number of keys, None to skip the bloom filter
+        """
+        self.block_size = block_size
+        self.bloom = None
+        if bloom_capacity is not None:
+            self.bloom = BloomFilter.for_capacity(bloom_capacity, bloom_error_rate)
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._offset = len(MAGIC)
+        self._block_offsets = []
+        self._block_start = None
+        self._prev_key = None
+        self.num_entries = 0
+
+    def add(self, key, count):
+        """
+        :type key: str
+        :type count: int
+        """
+        if self._prev_key is not None and key <= self._prev_key:
+            raise ValueError('Keys must be unique and sorted: %r after %r' % (key, self._prev_key))
+        if self._block_start is None or self._offset - self._block_start >= self.block_size:
+            self._block_start = self._offset
+            self._block_offsets.append(self._offset)
+            shared = 0
+        else:
+            shared = _common_prefix(self._prev_key, key)
+        entry = encode_varint(shared) + encode_varint(len(key) - shared) + key[shared:] + encode_varint(count)
+        self._file.write(entry)
+        self._offset += len(entry)
+        self._prev_key = key
+        self.num_entries += 1
+        if self.bloom is not None:
+            self.bloom.add(key)
+
+    def close(self):
+        index_offset = self._offset
+        for offset in self._block_offsets:
+            self._file.write(_OFFSET.pack(offset))
+        bloom_offset = index_offset + _OFFSET.size * len(self._block_offsets)
+        bloom_length = 0
+        if self.bloom is not None:
+            bloom = self.bloom.tostring()
+            self._file.write(bloom)
+            bloom_length = len(bloom)
+        self._file.write(_FOOTER.pack(index_offset, len(self._block_offsets), bloom_offset,
+                                      bloom_length, self.num_entries))
+        self._file.write(MAGIC)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SSTable(object):
+    """
+    Read-only view of a file written by ``SSTableWriter``.
+    Pages are shared between all processes that open the same file.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        footer_offset = len(self._mmap) - _FOOTER.size - len(MAGIC)
+        if self._mmap[:len(MAGIC)] != MAGIC or self._mmap[-len(MAGIC):] != MAGIC:
+            raise ValueError('%s is not an SSTable file' % path)
+        self._index_offset, self._num_blocks, bloom_offset, bloom_length, self._num_entries = \
+            _FOOTER.unpack_from(self._mmap, footer_offset)
+        self.bloom = None
+        if bloom_length:
+            self.bloom = BloomFilter.fromstring(self._mmap, bloom_offset)
+
+    def __len__(self):
+        return self._num_entries
+
+    def _block_offset(self, i):
+        if i == self._num_blocks:
+            return self._index_offset
+        return _OFFSET.unpack_from(self._mmap, self._index_offset + i * _OFFSET.size)[0]
+
+    def _first_key(self, i):
+        pos = self._block_offset(i)
+        _, pos = decode_varint(self._mmap, pos)
+        key_len, pos = decode_varint(self._mmap, pos)
+        return self._mmap[pos:pos+key_len]
+
+    def _find_block(self, key):
+        """Binary search for the last block starting with a key <= ``key``"""
+        lo, hi = 0, self._num_blocks
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._first_key(mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def _iter_block(self, i):
+        pos = self._block_offset(i)
+        end = self._block_offset(i + 1)
+        key = ''
+        while pos < end:
+            shared, pos = decode_varint(self._mmap, pos)
+            suffix_len, pos = decode_varint(self._mmap, pos)
+            key = key[:shared] + self._mmap[pos:pos+suffix_len]
+            pos += suffix_len
+            count, pos = decode_varint(self._mmap, pos)
+            yield key, count
+
+    def get(self, key, default=None):
+        """
+        :type key: str
+        :returns: count of ``key``
+        """
+        if self.bloom is not None and key not in self.bloom:
+            return default
+        block = self._find_block(key)
+        if block < 0:
+            return default
+        for block_key, count in self._iter_block(block):
+            if block_key == key:
+                return count
+            if block_key > key:
+                break
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def iteritems(self):
+        for i in xrange(self._num_blocks):
+            for key, count in self._iter_block(i):
+                yield key, count
+
+    def close(self):
+        self._mmap.close()
+
+
+class SSTableBackend(Backend):
+    """Serves count tables, such as ``ngrams``, from SSTable files"""
+
+    def __init__(self, tables):
+        """
+        :param tables: dict of table name -> SSTable file path
+        """
+        self.tables = dict((table, SSTable(path)) for table, path in tables.items())
+
+    def get(self, table, row, column):
+        sstable = self.tables.get(table)
+        if sstable is None:
+            return None
+        count = sstable.get(row)
+        if count is None:
+            return None
+        # HBase stores counts as text
+        return str(count)
+
+    def close(self):
+        for sstable in self.tables.values():
+            sstable.close()
+
+
+def _read_counts(filename):
+    with open(filename) as f:
+        for line in f:
+            try:
+                ngram, count = line.rstrip('\n').rsplit('\t', 1)
+                yield ngram, int(count)
+            except ValueError:
+                continue
+
+
+def build_sstable(paths, out_path, block_size=256, bloom_error_rate=None):
+    """
+    Converts ``reducer_generic.py`` output into an SSTable file.
+    Every part file has to be sorted by n-gram, as produced by the reducers; counts of
+    equal n-grams from different parts are summed.
+    :param paths: list of files or Hadoop output directories
+    :param bloom_error_rate: false positive rate of the bloom filter, None to skip it
+    """
+    filenames = [filename for path in paths for filename in _tsv_files(path)]
+    bloom_capacity = None
+    if bloom_error_rate is not None:
+        bloom_capacity = sum(1 for filename in filenames for _ in open(filename))
+    with SSTableWriter(out_path, block_size, bloom_capacity, bloom_error_rate or 0.01) as writer:
+        prev_ngram = None
+        prev_count = 0
+        for ngram, count in heapq.merge(*[_read_counts(filename) for filename in filenames]):
+            if ngram == prev_ngram:
+                prev_count += count
+                continue
+            if prev_ngram is not None:
+                writer.add(prev_ngram, prev_count)
+            prev_ngram, prev_count = ngram, count
+        if prev_ngram is not None:
+            writer.add(prev_ngram, prev_count)
+    return os.path.getsize(out_path)
@@ -0,0 +1,64 @@
+"""
+Local snapshot of the state ``NgramService`` fetches on first use, such as substitution counts.
+
+Layout::
+
+    MAGIC
+    entries of (varint length + name, varint length + ``pack_binary`` value)
+"""
+import mmap
+import os
+import tempfile
+
+from .encoding import encode_varint, decode_varint
+from .packing import pack_binary, unpack_binary
+
+MAGIC = 'KGWS\x01'
+
+
+def save_warm_start(path, state):
+    """
+    Writes to a temporary file of its own and renames it, so that concurrent savers never write
+    to the same file and readers never see a partially written one. The last rename wins.
+    :param state: dict of name -> list of (key, count)
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            for name, list_counts in sorted(state.items()):
+                value = pack_binary(list_counts)
+                f.write(encode_varint(len(name)) + name + encode_varint(len(value)) + value)
+        os.chmod(tmp_path, 0644)
+        os.rename(tmp_path, path)
+    except OSError:
+        # a concurrent saver removed the directory or won the race, its snapshot is as good as ours
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_warm_start(path):
+    """
+    :returns: dict of name -> dict of key -> count, empty if the file is missing or invalid
+    """
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return {}
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if data[:len(MAGIC)] != MAGIC:
+            return {}
+        state = {}
+        pos = len(MAGIC)
+        while pos < len(data):
+            length, pos = decode_varint(data, pos)
+            name = data[pos:pos+length]
+            pos += length
+            length, pos = decode_varint(data, pos)
+            keys, counts = unpack_binary(data[pos:pos+length])
+            pos += length
+            state[name] = dict(zip(keys, counts))
+        return state
+    finally:
+        data.close()
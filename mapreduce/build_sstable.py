@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+"""
+Converts n-gram counts produced by reducer_generic.py into a memory-mapped SSTable file:
+./build_sstable.py --bloom-error-rate 0.01 ngrams.sst /user/roman/ngram_counts
+"""
+import argparse
+from kilogram.storage import build_sstable
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('out_path',
+                    help='output SSTable file')
+parser.add_argument('paths', nargs='+',
+                    help='reducer output files or directories with part files')
+parser.add_argument('--block-size', dest='block_size', action='store', type=int, default=256,
+                    help='approximate size of a data block in bytes')
+parser.add_argument('--bloom-error-rate', dest='bloom_error_rate', action='store', type=float, default=None,
+                    help='false positive rate of the bloom filter, omit to skip the filter')
+
+args = parser.parse_args()
+
+size = build_sstable(args.paths, args.out_path, args.block_size, args.bloom_error_rate)
+print('Written %d bytes' % size)
@@ -15,6 +15,8 @@ parser.add_argument('--lowercase', dest='is_lowercase', action='store_true', req
                     default=False, help='whether to lowercase the mentions or not')
 parser.add_argument('--nospace', dest='no_space', action='store_true', required=False,
                     default=False, help='whether to strip the spaces from the labels')
+parser.add_argument('--binary', dest='is_binary', action='store_true', required=False,
+                    default=False, help='whether to write lists in the binary packed format')
 parser.add_argument('dbpedia_file',
                     help='path to the dbpedia data file on HDFS')
 parser.add_argument('wiki_anchors_dir',
@@ -114,17 +116,20 @@ def map_anchors(anchor_line):
 join = sc.textFile(args.wiki_anchors_dir).map(map_anchors).fullOuterJoin(uri_label_counts)
 
 
+pack = ListPacker.pack_armored if args.is_binary else ListPacker.pack
+
+
 def printer(value):
     label, values = value
     uri_counts_anchors, uri_count_labels = values
     if uri_count_labels is None:
-        return label + '\t' + ListPacker.pack(uri_counts_anchors)
+        return label + '\t' + pack(uri_counts_anchors)
     elif uri_counts_anchors is None:
-        return label + '\t' + ListPacker.pack(uri_count_labels)
+        return label + '\t' + pack(uri_count_labels)
     uri_count_labels_dict = dict(uri_count_labels)
     for uri, count in uri_counts_anchors:
         if uri not in uri_count_labels_dict:
             uri_count_labels_dict[uri] = count
-    return label + '\t' + ListPacker.pack(uri_count_labels_dict.items())
+    return label + '\t' + pack(uri_count_labels_dict.items())
 
 join.map(printer).saveAsTextFile(args.candidate_ngrams_out)
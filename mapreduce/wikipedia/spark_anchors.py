@@ -7,10 +7,13 @@ from pyspark import SparkContext
 import urllib
 import argparse
 from kilogram.lang.unicode import strip_unicode
+from kilogram import ListPacker
 
 sc = SparkContext(appName="WikipediaAnchors")
 
 parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--binary', dest='is_binary', action='store_true', required=False,
+                    default=False, help='whether to write lists in the binary packed format')
 parser.add_argument('link_mention_dir',
                     help='path to the link_mention directory on HDFS')
 parser.add_argument('wiki_anchors_out_dir',
@@ -72,7 +75,11 @@ anchor_counts_agg = anchor_counts_join.aggregateByKey({}, seqfunc, combfunc)
 uri_counts_agg = uri_counts_join.aggregateByKey({}, seqfunc, combfunc)
 
 def printer(value):
-    return value[0] + '\t' + ' '.join([x.replace(' ', '_')+","+str(y) for x, y in value[1].items()])
+    # both formats join the words of URIs with underscores
+    counts = [(x.replace(' ', '_'), y) for x, y in value[1].items()]
+    if args.is_binary:
+        return value[0] + '\t' + ListPacker.pack_armored(counts)
+    return value[0] + '\t' + ' '.join([x+","+str(y) for x, y in counts])
 
 anchor_counts_agg.map(printer).saveAsTextFile(args.wiki_anchors_out_dir)
 uri_counts_agg.map(printer).saveAsTextFile(args.wiki_urls_out_dir)
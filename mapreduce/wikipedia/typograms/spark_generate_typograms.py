@@ -38,7 +38,11 @@ def collect_counts(value1, value2):
 typed_ngrams = lines.map(generate_typed_ngram).filter(lambda x: x[1] >= 10).reduceByKey(collect_counts)
 
 
+# pass --binary as the third argument to write lists in the binary packed format
+pack = ListPacker.pack_armored if '--binary' in sys.argv[3:] else ListPacker.pack
+
+
 def printer(value):
-    return value[0] + '\t' + ListPacker.pack(value[1].items())
+    return value[0] + '\t' + pack(value[1].items())
 
 typed_ngrams.map(printer).saveAsTextFile(sys.argv[2])
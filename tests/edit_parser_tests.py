@@ -0,0 +1,98 @@
+# coding=utf-8
+import os
+import shutil
+import tempfile
+import unittest
+from kilogram.edit import Edit
+from kilogram.lang import edit_parser
+from kilogram.lang.edit_parser import iter_edits, iter_filtered, extract_filtered, _shards
+
+
+class TestEditStream(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.edit_file = os.path.join(self.tmp_dir, 'edits.tsv')
+        with open(self.edit_file, 'w') as f:
+            f.write(u'He sat at the bench\tHe sat on the bench\n'
+                    u'null\tNo edits here\n'
+                    u'Café in town\tThe café on the corner in town\n'
+                    u'x\tOn and on\n'.encode('utf-8'))
+        self.filter_func = lambda word: word.lower() in ('on', 'in')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _edits(self, edits):
+        return [(edit.edit2, edit.positions2, ' '.join(edit.context(1))) for edit in edits]
+
+    def test_same_as_list(self):
+        edits = extract_filtered(self.edit_file, self.filter_func, progress=False)
+        # all edits of one extraction share its store
+        self.assertEqual(len(set(id(edit.store) for edit in edits)), 1)
+        expected = self._edits(edits)
+        self.assertEqual(len(expected), 5)
+        self.assertEqual(self._edits(iter_filtered(self.edit_file, self.filter_func, progress=False)), expected)
+        chunks = list(iter_filtered(self.edit_file, self.filter_func, chunk_size=2, progress=False))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(self._edits(sum(chunks, [])), expected)
+
+    def test_resume(self):
+        expected = self._edits(iter_filtered(self.edit_file, self.filter_func, progress=False))
+        for chunk_size in (None, 1, 2, 3):
+            stream = iter_filtered(self.edit_file, self.filter_func, chunk_size=chunk_size, progress=False)
+            edits = []
+            while True:
+                # a new stream for every item, started from the checkpoint of the previous one
+                items = iter(stream)
+                item = next(items, None)
+                if item is None:
+                    break
+                edits.extend(item if chunk_size else [item])
+                stream = iter_filtered(self.edit_file, self.filter_func, chunk_size=chunk_size,
+                                       position=stream.position, progress=False)
+            self.assertEqual(self._edits(edits), expected)
+
+    def test_batch_tagging(self):
+        calls = []
+
+        def pos_tag_many(sentences):
+            calls.append(sentences)
+            return [['NN'] * len(sentence.split()) for sentence in sentences]
+
+        pos_tag_many_orig = edit_parser.pos_tag_many
+        edit_parser.pos_tag_many = pos_tag_many
+        self.addCleanup(setattr, edit_parser, 'pos_tag_many', pos_tag_many_orig)
+        edits = list(iter_edits(self.edit_file, progress=False))
+        # rows without a first version are not tagged
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(calls[0]), 3)
+        expected = [(u'at', u'on'), (u'café', u'café on corner'), (u'x', u'on and on')]
+        self.assertEqual([(edit.edit1, edit.edit2) for edit in edits], expected)
+        del calls[:]
+        stream = iter_edits(self.edit_file, progress=False)
+        stream.BATCH_ROWS = 2
+        self.assertEqual([(edit.edit1, edit.edit2) for edit in stream], expected)
+        self.assertEqual([len(sentences) for sentences in calls], [1, 2])
+
+    def test_parallel(self):
+        with open(self.edit_file, 'a') as f:
+            for i in range(200):
+                f.write('Row %d\tWord on %s in the %s\n' % (i, 'row ' * (i % 7), 'end' * (i % 3)))
+        expected = self._edits(extract_filtered(self.edit_file, self.filter_func, progress=False))
+        edits = extract_filtered(self.edit_file, self.filter_func, processes=3, progress=False)
+        self.assertEqual(self._edits(edits), expected)
+        # edits of a sentence share it after the transfer
+        self.assertEqual(len(set(id(edit.store.sentences[edit.sentence_id]) for edit in edits)), 203)
+        edits = extract_filtered(self.edit_file, self.filter_func, processes=3, ordered=False, progress=False)
+        self.assertEqual(sorted(self._edits(edits)), sorted(expected))
+        for shard_n in (1, 2, 7, 50, 1000):
+            shards = _shards(self.edit_file, shard_n)
+            self.assertEqual(shards[0][0], 0)
+            self.assertEqual(shards[-1][1], os.path.getsize(self.edit_file))
+            self.assertTrue(all(x[1] == y[0] for x, y in zip(shards, shards[1:])))
+
+
+if __name__ == '__main__':
+    print('Test EditStream')
+    unittest.main()
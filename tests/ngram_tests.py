@@ -0,0 +1,323 @@
+from __future__ import division
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import warnings
+from kilogram import NgramService, AsyncNgramService, ListPacker
+from kilogram.ngram import Ngram, EditNgram
+from kilogram import association
+from kilogram.association import AssociationCache
+from kilogram.edit import Edit, EditCollection, EditStore
+from kilogram.storage import SqliteBackend, load_tsv
+
+
+class _TestNgramService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        for table, lines in (('typogram', ['SUB\tin,100 on,50 at,20', 'SUB the\tin,10 on,5',
+                                           'of SUB\t' + ListPacker.pack_armored([('in', 3), ('into', 1)]),
+                                           'of SUB the\tin,2 on,1', 'SUB of\tat,7', 'SUB the end\tin,2']),
+                             ('ngrams', ['the\t1000', 'of\t800', 'of the\t300', 'end\t40', 'the end\t30'])):
+            table_dir = os.path.join(self.tmp_dir, table)
+            os.mkdir(table_dir)
+            with open(os.path.join(table_dir, 'part-00000'), 'w') as f:
+                f.write(''.join(line + '\n' for line in lines))
+        self.backend = SqliteBackend(os.path.join(self.tmp_dir, 'kilogram.sqlite'))
+        load_tsv(self.backend, 'typogram', [os.path.join(self.tmp_dir, 'typogram')])
+        load_tsv(self.backend, 'ngrams', [os.path.join(self.tmp_dir, 'ngrams')])
+        NgramService.configure(backend=self.backend, subst_table='typogram', ngram_table='ngrams')
+
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.tmp_dir)
+
+
+class TestFreqArrays(_TestNgramService):
+
+    def test_get_freq_arrays(self):
+        self.assertEqual(NgramService.get_substitution_index(), {'at': 0, 'in': 1, 'on': 2})
+        freqs = NgramService.get_freq_arrays([u'SUB', u'SUB the', u'of SUB', u'the SUB', u'of the', u'the x'])
+        self.assertEqual([x.tolist() for x in freqs[:4]], [[20, 100, 50], [0, 10, 5], [0, 3, 0], [0, 0, 0]])
+        self.assertEqual(freqs[4:], [300, 0])
+        # the shared substitution counts can not be changed through a result
+        with self.assertRaises(ValueError):
+            freqs[0][0] = 0
+        self.assertEqual(NgramService.get_freq_arrays([u'SUB'])[0].tolist(), [20, 100, 50])
+
+    def test_same_as_dicts(self):
+        ngrams = [u'SUB', u'SUB the', u'of SUB', u'the', u'of the']
+        self.assertEqual(Ngram.ngram_freq(ngrams), Ngram._freq_dist(NgramService.get_freq_many(ngrams)))
+        edit_ngram = EditNgram([u'of', u'in', u'the'], 1)
+        ngrams = edit_ngram._freq_ngrams()
+        freqs = NgramService.get_freq_many(ngrams)
+        self.assertEqual(list(edit_ngram._get_freq_distributions()),
+                         [Ngram._freq_dist(freqs[:3]), Ngram._freq_dist(freqs[5:]),
+                          Ngram._freq_dist(freqs[4:5]), Ngram._freq_dist(freqs[3:4])])
+
+    def test_association(self):
+        for ngram, edit_pos in (([u'in', u'the'], 0), ([u'of', u'in'], 1), ([u'of', u'in', u'the'], 1),
+                                ([u'at', u'of'], 0)):
+            for measure in ('pmi', 'student_t', 'chi_sq', 'likelihood_ratio', 'raw_freq', 'jaccard'):
+                expected = EditNgram(ngram, edit_pos)._nltk_association(measure)
+                collocs = EditNgram(ngram, edit_pos).association(measure)
+                self.assertEqual(sorted(collocs), sorted(expected))
+                for subst, (rank, score) in collocs.items():
+                    self.assertEqual(rank, expected[subst][0])
+                    self.assertAlmostEqual(score, expected[subst][1])
+
+    def test_unsupported_score(self):
+        edit_ngram = EditNgram([u'of', u'in', u'the'], 1)
+        marginals_ = association.marginals(edit_ngram.subst_ngram, *edit_ngram._get_freq_arrays())
+        for n, measure in ((3, 'dice'), (3, 'phi_sq'), (4, 'pmi'), (2, 'unknown')):
+            self.assertFalse(association.is_supported(n, measure))
+            self.assertRaises(ValueError, association.score, n, measure, marginals_)
+
+
+class TestAssociationCache(_TestNgramService):
+
+    def setUp(self):
+        super(TestAssociationCache, self).setUp()
+        self.default_cache = EditNgram.association_cache
+
+    def tearDown(self):
+        EditNgram.set_association_cache(self.default_cache)
+        super(TestAssociationCache, self).tearDown()
+
+    def test_shared(self):
+        cache = AssociationCache()
+        EditNgram.set_association_cache(cache)
+        collocs = EditNgram([u'in', u'the'], 0).association()
+        self.assertIs(EditNgram([u'on', u'the'], 0).association(), collocs)
+        EditNgram([u'in', u'the'], 0).association('chi_sq')
+        stats = cache.stats()
+        self.assertEqual(stats['tables']['pmi'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+        self.assertEqual(stats['tables'][AssociationCache.ARRAYS]['misses'], 1)
+        # configuring the service again drops all entries
+        self.backend = SqliteBackend(os.path.join(self.tmp_dir, 'kilogram.sqlite'))
+        NgramService.configure(backend=self.backend, subst_table='typogram', ngram_table='ngrams')
+        self.assertEqual(cache.get([u'SUB', u'the'], 0, 'pmi'), (False, None))
+
+    def test_eviction(self):
+        cache = AssociationCache(max_entries=2)
+        EditNgram.set_association_cache(cache)
+        EditNgram([u'in', u'the'], 0).association()
+        EditNgram([u'of', u'in'], 1).association()
+        self.assertEqual(len(cache.cache), 2)
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+    def test_save_load(self):
+        path = os.path.join(self.tmp_dir, 'associations')
+        cache = AssociationCache(path=path)
+        EditNgram.set_association_cache(cache)
+        collocs = EditNgram([u'of', u'in', u'the'], 1).association()
+        cache.save()
+        cache = AssociationCache(path=path)
+        self.assertEqual(cache.get([u'of', u'SUB', u'the'], 1, 'pmi'), (True, collocs))
+        self.assertEqual(cache.get_arrays([u'of', u'SUB', u'the'], 1), (False, None))
+
+    def test_prefetch(self):
+        cache = AssociationCache()
+        EditNgram.set_association_cache(cache)
+        tokens = u'most of the end'.split()
+        edits = [Edit(tokens, tokens[:1] + [u'in'] + tokens[2:], (1, 2), (1, 2), ['JJS', 'IN', 'DT', 'NN']),
+                 Edit(tokens, tokens, (1, 2), (1, 2), ['JJS', 'IN', 'DT', 'NN'])]
+        self.assertEqual(EditCollection.prefetch(edits), 4)
+        self.assertEqual(cache.stats()['tables']['pmi'], {'hits': 0, 'misses': 4, 'hit_rate': 0.})
+        expected = EditNgram([u'in', u'the'], 0)._nltk_association('pmi')
+        self.assertEqual(EditNgram([u'at', u'the'], 0).association(), expected)
+        self.assertEqual(cache.stats()['tables']['pmi']['hits'], 1)
+
+    def test_prefetch_small_cache(self):
+        cache = AssociationCache(max_entries=3)
+        EditNgram.set_association_cache(cache)
+        tokens = u'most of the end'.split()
+        edits = [Edit(tokens, tokens, (1, 2), (1, 2), ['JJS', 'IN', 'DT', 'NN'])]
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertEqual(EditCollection.prefetch(edits, batch_size=1), 1)
+        self.assertEqual(len(caught), 1)
+        self.assertEqual((len(cache.cache), cache.cache.max_entries, cache.stats()['evictions']), (2, 3, 0))
+        cache = AssociationCache(max_entries=8)
+        EditNgram.set_association_cache(cache)
+        edits = [Edit(tokens, tokens, (1, 2), (1, 2), ['JJS', 'IN', 'DT', 'NN'])]
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertEqual(EditCollection.prefetch(edits, batch_size=1), 4)
+        self.assertEqual(caught, [])
+        self.assertEqual((len(cache.cache), cache.stats()['evictions']), (8, 0))
+
+
+def pandas_single_feature(edit, SUBS_LIST, size=3):
+    """
+    The former pandas implementation of ``Edit.get_single_feature``, the reference of the
+    numpy one. Also timed by extra/benchmark_features.py.
+    """
+    import pandas as pd
+
+    context_ngrams = edit.ngram_context(size)
+    df_list_substs = []
+    # RANK, PMI_SCORE
+    DEFAULT_SCORE = (50, -10)
+    for ngram_type, norm_pos, _, score_dict in edit._scored_ngrams(context_ngrams):
+        for subst in SUBS_LIST:
+            df_list_substs.append([subst, score_dict.get(subst, DEFAULT_SCORE)[1],
+                                   score_dict.get(subst, DEFAULT_SCORE)[0],
+                                   ngram_type, norm_pos])
+    assert len(df_list_substs) > 0
+    df_substs = pd.DataFrame(df_list_substs, columns=['substitution', 'score', 'rank', 'type', 'norm_position'])
+
+    central_prob = df_substs[(df_substs.norm_position == 0)][:len(SUBS_LIST)].set_index('substitution')
+    """type: DataFrame"""
+
+    matrix = EditCollection.CONFUSION_MATRIX[edit.edit1]
+    matrix_sum = sum(matrix.values())
+    assert matrix_sum > 0
+
+    feature_vectors = []
+    labels = []
+
+    # TODO: add indicator feature if rank/position is missing?
+    type_group = df_substs.groupby(['substitution', 'type'])
+    avg_by_position = df_substs.groupby(['substitution', 'norm_position']).mean()
+    avg_by_type = type_group.mean()
+    top_type_counts = type_group.apply(lambda x: x[x['rank'] == 0]['rank'].count())
+
+    for subst in SUBS_LIST:
+
+        feature_vector = []
+        for ngram_size in range(2, 4):
+            feature_vector.append(avg_by_type.loc[subst]['rank'].get(ngram_size, 50))
+            feature_vector.append(int(feature_vector[-1] != 50))
+        feature_vector.append(avg_by_type.loc[subst]['score'].get(3, -10))
+
+        # START: zero prob indicator feature -----
+        central_prob_len = 0
+        if len(central_prob) > 0:
+            central_prob_len = central_prob['type'].values[0]
+        feature_vector.append(central_prob_len)
+        feature_vector.append(central_prob['rank'].get(subst, 50))
+        # END zero prob
+
+        # reverse confusion matrix
+        feature_vector.append(matrix.get(subst, 0)/matrix_sum)
+        # counts of a preposition on top of a ranking
+        feature_vector.append(top_type_counts.loc[subst].get(3, 0))
+
+        # average rank by normalized position
+        for position in (-1, 0, 1):
+            feature_vector.append(avg_by_position.loc[subst]['rank'].get(position, 50))
+
+        # substitutions themselves
+        feature_vector.extend([int(x == subst) for x in EditCollection.SUBSTITUTIONS])
+
+        # POS TAG enumeration
+        feature_vector.extend(edit._pos_tag_features(context_ngrams[2]))
+
+        labels.append(int(edit.edit2 == subst))
+        feature_vectors.append(feature_vector)
+    return feature_vectors, labels
+
+
+class TestEditFeatures(_TestNgramService):
+
+    def test_same_as_pandas(self):
+        tokens = u'most of the end'.split()
+        edits = [Edit(tokens, tokens[:1] + [u'in'] + tokens[2:], (1, 2), (1, 2), ['JJS', 'IN', 'DT', 'NN']),
+                 Edit(tokens, tokens, (1, 2), (1, 2), ['JJS', 'IN', 'DT', 'NN'])]
+        EditCollection(edits, ['at', 'in', 'on'])
+        for edit in edits:
+            for substitutions in (EditCollection.SUBSTITUTIONS, [edit.edit1]):
+                features, labels = edit.get_single_feature(substitutions)
+                self.assertEqual((features, labels), pandas_single_feature(edit, substitutions))
+                self.assertEqual(len(features[0]), len(EditCollection.FEATURE_NAMES) + 3 + 12)
+
+
+class TestAsyncNgramService(unittest.TestCase):
+
+    def test_pool_size_warning(self):
+        NgramService.configure(hbase_host=('localhost', 9090), pool_size=4)
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                AsyncNgramService.configure(max_in_flight=4)
+                self.assertEqual(caught, [])
+                AsyncNgramService.configure(max_in_flight=16)
+                self.assertEqual(len(caught), 1)
+        finally:
+            AsyncNgramService.h_pool.close()
+            AsyncNgramService.h_pool = None
+            NgramService.h_backend.close()
+
+
+class TestEditStore(unittest.TestCase):
+
+    def test_shared_sentence(self):
+        store = EditStore()
+        tokens1 = u'He sat at the bench'.split()
+        tokens2 = u'He sat on the bench'.split()
+        pos_tokens = ['PRP', 'VBD', 'IN', 'DT', 'NN']
+        edits = [Edit(tokens1, tokens2, (2, 3), (2, 3), pos_tokens, store=store),
+                 Edit(tokens1, tokens2, (3, 4), (3, 4), pos_tokens, store=store)]
+        self.assertEqual(len(store), 1)
+        self.assertEqual((edits[0].edit1, edits[0].edit2, edits[0].is_error), (u'at', u'on', True))
+        self.assertEqual(edits[0].left_tokens, [u'He', u'sat'])
+        self.assertEqual(edits[0].right_pos_tokens, ['DT', 'NN'])
+        self.assertEqual(edits[1].context(2), [u'sat', u'on', u'the', u'bench', u''])
+        self.assertEqual(edits[1].context(1, pos_tagged=True), [(u'on', 'IN'), (u'the', 'DT'), (u'bench', 'NN')])
+
+    def test_pickle(self):
+        import cPickle
+        tokens = u'He sat at the bench'.split()
+        edit = Edit(tokens, tokens[:2] + [u'on'] + tokens[3:], (2, 3), (2, 3), store=EditStore())
+        for protocol in (0, 2):
+            copy = cPickle.loads(cPickle.dumps(edit, protocol))
+            self.assertEqual((copy.edit1, copy.edit2, copy.positions2, copy.edit_pos_tokens),
+                             (u'at', u'on', (2, 3), None))
+            self.assertEqual(copy.context(), edit.context())
+            self.assertIsNot(copy.store, edit.store)
+
+    def test_unpickle_stores(self):
+        import cPickle
+        tokens = u'He sat at the bench'.split()
+        edits = [Edit(tokens, tokens, (i, i+1), (i, i+1), store=EditStore()) for i in range(5)]
+        size = Edit.UNPICKLE_STORE_SIZE
+        Edit.UNPICKLE_STORE_SIZE = 2
+        Edit._unpickle_local.store = None
+        try:
+            copies = cPickle.loads(cPickle.dumps(edits, 2))
+            # every thread adds to stores of its own
+            data = cPickle.dumps(edits * 200, 2)
+            thread_copies = [None] * 4
+
+            def unpickle(i):
+                thread_copies[i] = cPickle.loads(data)
+            threads = [threading.Thread(target=unpickle, args=(i,)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            Edit.UNPICKLE_STORE_SIZE = size
+        # stores are replaced once full, so that dropped edits free their sentences
+        self.assertEqual([len(copy.store) for copy in copies], [2, 2, 2, 2, 1])
+        self.assertEqual([copy.edit2 for copy in copies], [token.lower() for token in tokens])
+        thread_stores = [set(id(copy.store) for copy in x) for x in thread_copies]
+        self.assertEqual(sum(len(x) for x in thread_stores), len(set.union(*thread_stores)))
+        for x in thread_copies:
+            self.assertEqual([copy.edit2 for copy in x], [token.lower() for token in tokens] * 200)
+            self.assertTrue(all(len(copy.store) <= 2 for copy in x))
+
+    def test_own_store(self):
+        tokens = u'He sat at the bench'.split()
+        edits = [Edit(tokens, tokens, (i, i+1), (i, i+1)) for i in range(2)]
+        # edits created without a store do not add to a store of the process
+        self.assertIsNot(edits[0].store, edits[1].store)
+        self.assertEqual(len(edits[0].store), 1)
+
+
+if __name__ == '__main__':
+    print('Test Ngram')
+    unittest.main()
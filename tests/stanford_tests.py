@@ -0,0 +1,116 @@
+# coding=utf-8
+import socket
+import threading
+import time
+import unittest
+import SocketServer
+from kilogram.lang.stanford import StanfordClient
+
+
+class _SingleHandler(SocketServer.StreamRequestHandler):
+    """Like the stock servers: one line per connection"""
+
+    def handle(self):
+        line = self.rfile.readline().strip()
+        self.wfile.write(' '.join(word + '_X' for word in line.split()) + '\n')
+
+
+class _PersistentHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        self.server.connections += 1
+        for line in iter(self.rfile.readline, ''):
+            self.wfile.write(line.strip().upper() + '\n')
+            self.wfile.flush()
+
+
+class _StallingHandler(SocketServer.StreamRequestHandler):
+    """Answers lines until the line 'stall', then keeps the connection open without answering"""
+
+    def handle(self):
+        self.server.connections += 1
+        for line in iter(self.rfile.readline, ''):
+            if line.strip() == 'stall':
+                time.sleep(2)
+                return
+            self.wfile.write(line.strip().upper() + '\n')
+            self.wfile.flush()
+
+
+class _Server(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    connections = 0
+
+
+class TestStanfordClient(unittest.TestCase):
+
+    def _start(self, handler):
+        server = _Server(('localhost', 0), handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_single(self):
+        server = self._start(_SingleHandler)
+        client = StanfordClient([server.server_address], pool_size=3, buffer_size=4)
+        sentences = [u'sentence %d with ü' % i for i in range(10)]
+        self.assertEqual(client.request_many(sentences),
+                         [(u' '.join(word + '_X' for word in sentence.split()) + '\n').encode('utf-8')
+                          for sentence in sentences])
+
+    def test_persistent(self):
+        server = self._start(_PersistentHandler)
+        client = StanfordClient([server.server_address], pool_size=1, persistent=True, batch_size=4)
+        sentences = [u'sentence %d' % i for i in range(10)] + [u'two\nlines']
+        self.assertEqual(client.request_many(sentences), [x.upper().replace('\n', ' ') for x in sentences])
+        self.assertEqual(client.request(u'again'), 'AGAIN')
+        self.assertEqual(server.connections, 1)
+        client.close()
+
+    def test_deadline(self):
+        sock = socket.socket()
+        sock.bind(('localhost', 0))
+        address = sock.getsockname()
+        sock.close()
+        client = StanfordClient([address], deadline=0.5, min_backoff=0.05)
+        start = time.time()
+        self.assertRaises(socket.error, client.request, u'sentence')
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_batch_deadline(self):
+        server = self._start(_StallingHandler)
+        client = StanfordClient([server.server_address], pool_size=1, persistent=True, batch_size=2,
+                                timeout=30, deadline=60)
+        self.assertEqual(client.request(u'first'), 'FIRST')
+        # the idle connection is reused with the deadline of the new call
+        client.deadline = 0.5
+        start = time.time()
+        self.assertRaises(socket.error, client.request_many, [u'second', u'stall'])
+        self.assertLess(time.time() - start, 1.5)
+        client.close()
+
+    def test_connect_timeout(self):
+        timeouts = []
+
+        def create_connection(address, timeout):
+            timeouts.append(timeout)
+            raise socket.error('refused')
+
+        client = StanfordClient([('localhost', 1)], timeout=30, deadline=0.5, min_backoff=0.05)
+        create_connection_orig = socket.create_connection
+        socket.create_connection = create_connection
+        try:
+            self.assertRaises(socket.error, client.request, u'sentence')
+        finally:
+            socket.create_connection = create_connection_orig
+        self.assertTrue(timeouts)
+        self.assertTrue(all(0 < timeout <= 0.5 for timeout in timeouts))
+
+
+if __name__ == '__main__':
+    print('Test StanfordClient')
+    unittest.main()
@@ -0,0 +1,580 @@
+import contextlib
+import itertools
+import multiprocessing
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import weakref
+from kilogram.storage import LookupCache, SqliteBackend, load_tsv, SSTable, build_sstable, BloomFilter, \
+    SingleFlight, Metrics, render_text, Backend, MultiGatewayBackend, RecordingBackend, ReplayBackend, \
+    SharedCache, save_warm_start, load_warm_start
+from kilogram.storage.metrics import LatencyHistogram
+from kilogram.storage import packing, replay
+from kilogram.storage.export import repack_value, export_table
+from kilogram.storage.hbase import ConnectionPool
+from kilogram import ListPacker
+
+
+class TestLookupCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = LookupCache(max_entries=2)
+        cache.put('ngrams', 'a', 'ngram:value', '1')
+        cache.put('ngrams', 'b', 'ngram:value', '2')
+        cache.get('ngrams', 'a', 'ngram:value')
+        cache.put('ngrams', 'c', 'ngram:value', '3')
+        self.assertEqual(cache.get('ngrams', 'a', 'ngram:value'), (True, '1'))
+        self.assertEqual(cache.get('ngrams', 'b', 'ngram:value'), (False, None))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_missing_rows(self):
+        cache = LookupCache()
+        cache.put('ngrams', 'a', 'ngram:value', None)
+        self.assertEqual(cache.get('ngrams', 'a', 'ngram:value'), (True, None))
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_byte_budget(self):
+        cache = LookupCache(max_entries=None, max_bytes=10)
+        cache.put('ngrams', 'a', 'ngram:value', '12345')
+        cache.put('ngrams', 'b', 'ngram:value', '12345')
+        self.assertEqual(len(cache), 1)
+
+    def test_ttl(self):
+        cache = LookupCache(ttl=-1)
+        cache.put('ngrams', 'a', 'ngram:value', '1')
+        self.assertEqual(cache.get('ngrams', 'a', 'ngram:value'), (False, None))
+
+    def test_items(self):
+        cache = LookupCache()
+        cache.put('ngrams', 'a', 'ngram:value', '1')
+        self.assertEqual(cache.items(), [(('ngrams', 'a', 'ngram:value'), '1')])
+        cache.ttl = -1
+        cache.put('ngrams', 'b', 'ngram:value', '2')
+        self.assertEqual(len(cache.items()), 1)
+
+    def test_table_flags(self):
+        cache = LookupCache(tables=['ngrams'])
+        self.assertTrue(cache.is_enabled('ngrams'))
+        self.assertFalse(cache.is_enabled('typogram'))
+        cache.enable('typogram')
+        self.assertTrue(cache.is_enabled('typogram'))
+
+
+_shared_cache = None
+
+
+def _shared_cache_lookup(row):
+    found, value = _shared_cache.get('ngrams', row, 'ngram:value')
+    if not found:
+        _shared_cache.put('ngrams', row, 'ngram:value', row.upper())
+    return found
+
+
+class TestSharedCache(unittest.TestCase):
+
+    def test_workers(self):
+        global _shared_cache
+        _shared_cache = SharedCache()
+        _shared_cache.put('ngrams', 'missing', 'ngram:value', None)
+        pool = multiprocessing.Pool(4)
+        pool.map(_shared_cache_lookup, ['a', 'b', 'c'] * 20)
+        pool.close()
+        pool.join()
+        self.assertEqual(_shared_cache.get('ngrams', 'a', 'ngram:value'), (True, 'A'))
+        self.assertEqual(_shared_cache.get('ngrams', 'missing', 'ngram:value'), (True, None))
+        stats = _shared_cache.stats()
+        # counters of the workers and of the parent
+        self.assertEqual(stats['hits'] + stats['misses'], 62)
+        self.assertEqual(stats['tables']['ngrams']['hits'], stats['hits'])
+        self.assertEqual(len(_shared_cache), 4)
+        _shared_cache.close()
+        self.assertFalse(os.path.exists(_shared_cache.path))
+
+    def test_eviction(self):
+        global _shared_cache
+        _shared_cache = SharedCache(max_entries=20)
+        for i in range(100):
+            _shared_cache.put('ngrams', 'row%d' % i, 'ngram:value', str(i))
+        self.assertEqual(len(_shared_cache), 20)
+        self.assertEqual(_shared_cache.stats()['evictions'], 80)
+        # the oldest entries are evicted first
+        self.assertEqual(_shared_cache.get('ngrams', 'row0', 'ngram:value'), (False, None))
+        self.assertEqual(_shared_cache.get('ngrams', 'row99', 'ngram:value'), (True, '99'))
+        # workers open their own connections and evict entries of all processes
+        pool = multiprocessing.Pool(2)
+        pool.map(_shared_cache_put, range(100, 160))
+        pool.close()
+        pool.join()
+        self.assertLessEqual(len(_shared_cache), 20 + 2 * 2)
+        self.assertGreaterEqual(_shared_cache.stats()['evictions'], 136)
+        _shared_cache.close()
+
+
+def _shared_cache_put(i):
+    _shared_cache.put('ngrams', 'row%d' % i, 'ngram:value', str(i))
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def test_fork(self):
+        global _connection_pool
+        _connection_pool = ConnectionPool('localhost', 9090, size=1)
+        # the only slot is held by a connection of the parent thread
+        _connection_pool._slots.acquire()
+        _connection_pool._local.conn = 'parent connection'
+        pool = multiprocessing.Pool(1)
+        self.assertEqual(pool.apply(_connection_pool_state), (None, True))
+        pool.close()
+        pool.join()
+        _connection_pool._check_pid()
+        self.assertEqual(_connection_pool._local.conn, 'parent connection')
+        self.assertFalse(_connection_pool._slots.acquire(False))
+
+
+def _connection_pool_state():
+    _connection_pool._check_pid()
+    return getattr(_connection_pool._local, 'conn', None), _connection_pool._slots.acquire(False)
+
+
+class TestSqliteBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        tsv_file = os.path.join(self.tmp_dir, 'part-00000')
+        with open(tsv_file, 'w') as f:
+            f.write('SUB the\tin,10 on,5\nof the\t300\nmalformed\n')
+        self.backend = SqliteBackend(os.path.join(self.tmp_dir, 'kilogram.sqlite'))
+        load_tsv(self.backend, 'typogram', [self.tmp_dir])
+
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get(self):
+        self.assertEqual(self.backend.get('typogram', 'SUB the', 'ngram:value'), 'in,10 on,5')
+        self.assertIsNone(self.backend.get('typogram', 'malformed', 'ngram:value'))
+        self.assertIsNone(self.backend.get('typogram', 'of the', 'ngram:cnt'))
+        self.assertIsNone(self.backend.get('ngrams', 'of the', 'ngram:value'))
+
+    def test_get_many(self):
+        self.assertEqual(self.backend.get_many('typogram', ['of the', 'the end'], 'ngram:value'),
+                         {'of the': '300'})
+
+
+class TestSSTable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.counts = {}
+        for i in range(2):
+            with open(os.path.join(self.tmp_dir, 'part-0000%d' % i), 'w') as f:
+                for j in range(i, 1000, 2):
+                    ngram = 'ngram %04d' % j
+                    self.counts[ngram] = j * 1000
+                    f.write('%s\t%d\n' % (ngram, j * 1000))
+        self.sst_path = os.path.join(self.tmp_dir, 'ngrams.sst')
+        build_sstable([self.tmp_dir], self.sst_path, block_size=64, bloom_error_rate=0.01)
+        self.sstable = SSTable(self.sst_path)
+
+    def tearDown(self):
+        self.sstable.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get(self):
+        self.assertEqual(len(self.sstable), len(self.counts))
+        for ngram, count in self.counts.items():
+            self.assertEqual(self.sstable.get(ngram), count)
+        for ngram in ('', 'a', 'ngram', 'ngram 0000 ', 'ngram 1000', 'z'):
+            self.assertIsNone(self.sstable.get(ngram))
+
+    def test_iteritems(self):
+        self.assertEqual(list(self.sstable.iteritems()), sorted(self.counts.items()))
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_membership(self):
+        keys = ['key %d' % i for i in range(1000)]
+        bloom = BloomFilter.from_keys(keys, len(keys), 0.01)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(1 for i in range(1000) if 'other %d' % i in bloom)
+        self.assertLess(false_positives, 50)
+
+    def test_save_load(self):
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'test.bloom')
+        BloomFilter.from_keys(['a', u'\u00e9'], 2).save(path)
+        bloom = BloomFilter.load(path)
+        self.assertIn('a', bloom)
+        self.assertIn(u'\u00e9'.encode('utf-8'), bloom)
+        self.assertNotIn('b', bloom)
+        shutil.rmtree(tmp_dir)
+
+
+class TestBinaryPacking(unittest.TestCase):
+
+    counts = [('dbpedia:Place', 10), ('dbpedia:Person', 2**40), (u'\u00e9', 3)]
+
+    def test_round_trip(self):
+        value = ListPacker.pack_binary(self.counts)
+        self.assertEqual(ListPacker.unpack(value),
+                         [('dbpedia:Person', 2**40), ('dbpedia:Place', 10), (u'\u00e9'.encode('utf-8'), 3)])
+
+    def test_struct_widths(self):
+        # platforms where no array typecode is 8 bytes wide, such as 32-bit long
+        value = ListPacker.pack_binary(self.counts)
+        typecodes = dict(packing._TYPECODES)
+        try:
+            packing._TYPECODES.clear()
+            self.assertEqual(ListPacker.pack_binary(self.counts), value)
+            self.assertEqual(ListPacker.unpack(value), ListPacker.unpack(ListPacker.pack_binary(self.counts)))
+        finally:
+            packing._TYPECODES.update(typecodes)
+        self.assertEqual(ListPacker.unpack(value)[0], ('dbpedia:Person', 2**40))
+
+    def test_armored(self):
+        value = ListPacker.pack_armored(self.counts)
+        self.assertNotIn('\t', value)
+        self.assertNotIn('\n', value)
+        self.assertEqual(ListPacker.unpack(value), ListPacker.unpack(ListPacker.pack_binary(self.counts)))
+
+    def test_text_compatibility(self):
+        keys, counts = ListPacker.unpack_arrays(ListPacker.pack(self.counts[:2]))
+        self.assertEqual((keys, list(counts)), (['dbpedia:Place', 'dbpedia:Person'], [10, 2**40]))
+        self.assertEqual(ListPacker.unpack(''), [])
+        self.assertEqual(ListPacker.unpack(ListPacker.pack_binary([])), [])
+
+    def test_unpack_top(self):
+        counts = [('a', 50), ('b', 30), ('c', 15), ('d', 5)]
+        for value in (ListPacker.pack_binary(counts), ListPacker.pack(counts[::-1])):
+            self.assertEqual(ListPacker.unpack_top(value, k=2), counts[:2])
+            # the entry crossing the mass threshold is kept
+            self.assertEqual(ListPacker.unpack_top(value, mass=0.6), counts[:2])
+            self.assertEqual(ListPacker.unpack_top(value, mass=0.8), counts[:3])
+            self.assertEqual(ListPacker.unpack_top(value, k=1, mass=0.8), counts[:1])
+            self.assertEqual(ListPacker.unpack_top(value), counts)
+        self.assertEqual(ListPacker.unpack_top(ListPacker.pack_binary([]), k=3), [])
+
+    def test_repack(self):
+        value = repack_value(ListPacker.pack(self.counts[:2]))
+        self.assertEqual(ListPacker.unpack(value), [('dbpedia:Person', 2**40), ('dbpedia:Place', 10)])
+        # plain counts and malformed lists are kept
+        self.assertEqual(repack_value('42'), '42')
+        self.assertEqual(repack_value('a,b c,d'), 'a,b c,d')
+
+
+class _TestRegion(object):
+
+    def __init__(self, start_key, end_key):
+        self.startKey = start_key
+        self.endKey = end_key
+
+
+class _TestCell(object):
+
+    def __init__(self, value):
+        self.value = value
+
+
+class _TestRowResult(object):
+
+    def __init__(self, row, column, value):
+        self.row = row
+        self.columns = {column: _TestCell(value)}
+
+
+class _TestScanPool(object):
+    """Connection pool of an HBase table in memory, with the scanner calls of the Thrift client"""
+
+    def __init__(self, rows, split_keys):
+        self.rows = sorted(rows.items())
+        keys = [''] + split_keys + ['']
+        self.regions = [_TestRegion(start, end) for start, end in zip(keys, keys[1:])]
+        self.client = self
+        self._scanners = {}
+        self._lock = threading.Lock()
+
+    def call(self, method, table):
+        assert method == 'getTableRegions'
+        return self.regions
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self
+
+    def scannerOpenWithScan(self, table, scan, attributes):
+        rows = iter([_TestRowResult(row, scan.columns[0], value) for row, value in self.rows
+                     if row >= (scan.startRow or '') and (not scan.stopRow or row < scan.stopRow)])
+        with self._lock:
+            scanner_id = len(self._scanners)
+            self._scanners[scanner_id] = rows
+        return scanner_id
+
+    def scannerGetList(self, scanner_id, num_rows):
+        return list(itertools.islice(self._scanners[scanner_id], num_rows))
+
+    def scannerClose(self, scanner_id):
+        del self._scanners[scanner_id]
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.counts = dict(('ngram %03d' % i, str(i + 1)) for i in range(100))
+        self.lists = dict(('SUB %03d' % i, 'on,1 in,%d' % (i + 2)) for i in range(100))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_formats(self):
+        for num_workers in (1, 3):
+            pool = _TestScanPool(self.lists, ['SUB 010', 'SUB 050', 'SUB 077'])
+            for fmt in ('tsv', 'sqlite'):
+                out_path = os.path.join(self.tmp_dir, '%s-%d' % (fmt, num_workers))
+                self.assertEqual(export_table(pool, 'typogram', out_path, fmt, num_workers=num_workers,
+                                              batch_size=7, repack=True), 100)
+                if fmt == 'tsv':
+                    self.assertEqual(len(os.listdir(out_path)), 4)
+                    backend = SqliteBackend(os.path.join(self.tmp_dir, 'loaded-%d' % num_workers))
+                    load_tsv(backend, 'typogram', [out_path])
+                else:
+                    backend = SqliteBackend(out_path)
+                for i in range(100):
+                    value = backend.get('typogram', 'SUB %03d' % i, 'ngram:value')
+                    self.assertTrue(packing.is_binary(value))
+                    self.assertEqual(ListPacker.unpack(value), [('in', i + 2), ('on', 1)])
+                backend.close()
+            pool = _TestScanPool(self.counts, ['ngram 033', 'ngram 066'])
+            out_path = os.path.join(self.tmp_dir, 'sstable-%d' % num_workers)
+            self.assertEqual(export_table(pool, 'ngrams', out_path, 'sstable', num_workers=num_workers,
+                                          batch_size=7), 100)
+            sstable = SSTable(out_path)
+            self.assertEqual(dict(sstable.iteritems()), dict((row, int(count)) for row, count in self.counts.items()))
+            sstable.close()
+        self.assertRaises(ValueError, export_table, pool, 'ngrams', out_path, 'csv')
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def _run_concurrently(self, func, num_threads=5):
+        threads = [threading.Thread(target=func) for _ in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_do(self):
+        flights = SingleFlight()
+        fetched = []
+        results = []
+
+        def fetch():
+            fetched.append(1)
+            time.sleep(0.1)
+            return 'value'
+        self._run_concurrently(lambda: results.append(flights.do('t', 'row', 'c', fetch)))
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(fetched), 1)
+        self.assertEqual(flights.stats()['deduplicated'], 4)
+
+    def test_do_many(self):
+        flights = SingleFlight()
+        fetched = []
+        results = []
+
+        def fetch_many(rows):
+            fetched.extend(rows)
+            time.sleep(0.1)
+            return dict((row, row.upper()) for row in rows if row != 'missing')
+        self._run_concurrently(lambda: results.append(flights.do_many('t', ['a', 'b', 'missing'], 'c',
+                                                                       fetch_many)))
+        self.assertEqual(results, [{'a': 'A', 'b': 'B'}] * 5)
+        self.assertEqual(sorted(fetched), ['a', 'b', 'missing'])
+
+    def test_errors(self):
+        flights = SingleFlight()
+        errors = []
+
+        def fetch():
+            time.sleep(0.1)
+            raise ValueError('backend is down')
+
+        def lookup():
+            try:
+                flights.do('t', 'row', 'c', fetch)
+            except ValueError as e:
+                errors.append(e)
+        self._run_concurrently(lookup)
+        self.assertEqual(len(errors), 5)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for i in range(1, 101):
+            histogram.add(i / 1000.)
+        self.assertAlmostEqual(histogram.percentile(0.5), 0.05, delta=0.01)
+        self.assertAlmostEqual(histogram.percentile(0.99), 0.099, delta=0.02)
+
+    def test_record(self):
+        events = []
+        metrics = Metrics([lambda *args: events.append(args)])
+        metrics.record('table', 'ngrams', 0.01, num_bytes=10)
+        with self.assertRaises(ValueError):
+            with metrics.timed('getter', 'get_freq'):
+                raise ValueError()
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['table']['ngrams']['bytes'], 10)
+        self.assertEqual(snapshot['getter']['get_freq']['errors'], 1)
+        self.assertEqual(len(events), 2)
+
+    def test_render_text(self):
+        text = render_text({'table': {'ngrams': {'calls': 2}}, 'cache': {'hits': 1}})
+        self.assertEqual(text, 'kilogram_cache_hits 1\nkilogram_table_calls{name="ngrams"} 2\n')
+        text = render_text({'cache': {'hits': 2**40, 'hit_rate': 0.5, 'misses': 3L, 'healthy': True}})
+        self.assertEqual(text, 'kilogram_cache_healthy 1\nkilogram_cache_hit_rate 0.5\n'
+                               'kilogram_cache_hits 1099511627776\nkilogram_cache_misses 3\n')
+
+
+class _TestGateway(Backend):
+
+    def __init__(self, stall_rows=(), is_down=False):
+        self.stall_rows = stall_rows
+        self.is_down = is_down
+        self.calls = 0
+
+    def get(self, table, row, column):
+        self.calls += 1
+        if self.is_down:
+            raise socket.error('gateway is down')
+        if table == 'missing':
+            raise KeyError(table)
+        time.sleep(0.5 if row in self.stall_rows else 0.001)
+        return row
+
+
+class TestMultiGatewayBackend(unittest.TestCase):
+
+    def test_failover(self):
+        down = _TestGateway(is_down=True)
+        backend = MultiGatewayBackend({'down': down, 'up': _TestGateway()}, failure_threshold=2)
+        for _ in range(10):
+            self.assertEqual(backend.get('t', 'row', 'c'), 'row')
+        # skipped after failure_threshold errors
+        self.assertEqual(down.calls, 2)
+        self.assertFalse(backend.stats()['down']['healthy'])
+
+    def test_application_error(self):
+        for hedge_percentile in (None, 0.9):
+            gateways = {'a': _TestGateway(), 'b': _TestGateway()}
+            backend = MultiGatewayBackend(gateways, hedge_percentile=hedge_percentile, failure_threshold=1)
+            self.assertRaises(KeyError, backend.get, 'missing', 'row', 'c')
+            # neither failed over nor marked as failed
+            self.assertEqual(sum(g.calls for g in gateways.values()), 1)
+            self.assertTrue(all(x['healthy'] and not x['failures'] for x in backend.stats().values()))
+            backend.close()
+
+    def test_all_down(self):
+        backend = MultiGatewayBackend({'a': _TestGateway(is_down=True), 'b': _TestGateway(is_down=True)},
+                                      hedge_percentile=0.9)
+        self.assertRaises(IOError, backend.get, 't', 'row', 'c')
+        backend.close()
+
+    def test_hedging(self):
+        backend = MultiGatewayBackend({'a': _TestGateway(stall_rows=['stall']), 'b': _TestGateway()},
+                                      hedge_percentile=0.9)
+        for _ in range(100):
+            backend.get('t', 'row', 'c')
+        # one of the calls goes to the stalling gateway first
+        for _ in range(2):
+            start = time.time()
+            self.assertEqual(backend.get('t', 'stall', 'c'), 'stall')
+            self.assertLess(time.time() - start, 0.3)
+        self.assertGreaterEqual(backend.stats()['a']['hedges'], 1)
+        backend.close()
+
+
+class TestRecordReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'lookups.rec')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_replay(self):
+        sqlite = SqliteBackend(os.path.join(self.tmp_dir, 'test.sqlite'))
+        sqlite.create_table('ngrams')
+        sqlite.put_many('ngrams', [('a', '1'), ('b', '\x00\x01binary')], 'ngram:value')
+        recorder = RecordingBackend(sqlite, self.path)
+        self.assertEqual(recorder.get('ngrams', 'a', 'ngram:value'), '1')
+        self.assertEqual(recorder.get_many('ngrams', ['b', 'missing'], 'ngram:value'), {'b': '\x00\x01binary'})
+        recorder.close()
+
+        replay = ReplayBackend(self.path, strict=True)
+        self.assertEqual(replay.get('ngrams', 'a', 'ngram:value'), '1')
+        self.assertIsNone(replay.get('ngrams', 'missing', 'ngram:value'))
+        self.assertEqual(replay.get_many('ngrams', ['a', 'b', 'missing'], 'ngram:value'),
+                         {'a': '1', 'b': '\x00\x01binary'})
+        self.assertRaises(KeyError, replay.get, 'ngrams', 'c', 'ngram:value')
+
+    def test_exit_handler(self):
+        recorders = [RecordingBackend(_TestGateway(), self.path) for _ in range(3)]
+        for recorder in recorders[:2]:
+            recorder.get('ngrams', 'a', 'ngram:value')
+        recorders[0].close()
+        # closed and dropped backends are neither saved at exit nor kept alive
+        recorder = weakref.ref(recorders.pop(1))
+        self.assertIsNone(recorder())
+        self.assertEqual(set(replay._open_recorders), set(recorders[1:]))
+        recorders[1].close()
+
+    def test_latency(self):
+        RecordingBackend(_TestGateway(), self.path).close()
+        replay = ReplayBackend(self.path, latency=lambda: 0.05)
+        start = time.time()
+        replay.get('ngrams', 'a', 'ngram:value')
+        self.assertGreaterEqual(time.time() - start, 0.05)
+
+
+class TestWarmStart(unittest.TestCase):
+
+    def test_save_load(self):
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'warm_start')
+        self.assertEqual(load_warm_start(path), {})
+        save_warm_start(path, {'substitution_counts:typogram': [('in', 100), ('on', 50)],
+                               'empty': []})
+        self.assertEqual(load_warm_start(path), {'substitution_counts:typogram': {'in': 100, 'on': 50},
+                                                 'empty': {}})
+        shutil.rmtree(tmp_dir)
+
+    def test_concurrent_save(self):
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'warm_start')
+        pool = multiprocessing.Pool(8)
+        try:
+            pool.map(_save_warm_start, [(path, i) for i in range(64)])
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(len(load_warm_start(path)['counts']), 1)
+        self.assertEqual(os.listdir(tmp_dir), ['warm_start'])
+        shutil.rmtree(tmp_dir)
+
+
+def _save_warm_start(args):
+    path, i = args
+    save_warm_start(path, {'counts': [('in', i)]})
+
+
+if __name__ == '__main__':
+    print('Test Storage')
+    unittest.main()